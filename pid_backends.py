@@ -0,0 +1,655 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本提取后端
+统一的文本记录接口，CLI和GUI共用同一套图纸遍历逻辑
+"""
+
+import array
+import fnmatch
+import logging
+import math
+import os
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pid_progress import ExtractionCancelled
+
+logger = logging.getLogger(__name__)
+
+# 文本记录：文本内容、实体类型、句柄、图层、插入点、方向（度）、字高
+TextRecord = namedtuple('TextRecord', ['text', 'entity_type', 'handle', 'layer', 'insertion_point',
+                                       'rotation', 'height'], defaults=(None, None))
+
+# 几何记录：句柄、图层、顶点坐标((x, y), ...)，闭合多段线的最后一个顶点与第一个相同
+PolylineRecord = namedtuple('PolylineRecord', ['handle', 'layer', 'points'])
+
+# 默认的管道图层（AutoCAD通配符，不区分大小写）
+DEFAULT_PIPE_LAYERS = ("*PIPE*", "*管道*")
+
+# 需要提取文本的实体类型
+TEXT_ENTITY_TYPES = ("AcDbText", "AcDbMText", "AcDbBlockReference")
+
+# 选择集中DXF实体名 -> COM ObjectName
+SELECTION_TEXT_TYPES = {"TEXT": "AcDbText", "MTEXT": "AcDbMText"}
+
+# AutoCAD常量acSelectionSetAll：选择全部实体
+AC_SELECTION_SET_ALL = 5
+
+# 默认的块定义嵌套展开层数，0表示只读取顶层块参照的属性
+DEFAULT_BLOCK_DEPTH = 4
+
+# 表示AutoCAD进程已退出或COM连接已断开的HRESULT（RPC_S_SERVER_UNAVAILABLE、RPC_S_CALL_FAILED、
+# RPC_S_CALL_FAILED_DNE、RPC_E_DISCONNECTED、CO_E_OBJNOTCONNECTED）
+DISCONNECT_HRESULTS = frozenset({0x800706BA, 0x800706BE, 0x800706BF, 0x80010108, 0x800401FD})
+
+# 需要读取插入点、方向和字高的文本：管道号及其拆分片段（pid_spatial的候选片段）都含数字或连字符
+GEOMETRY_TEXT = re.compile(r'[-\d]')
+
+# 遍历时连续多少个实体读取失败视为CAD会话已不可用
+MAX_ENTITY_ERRORS = 500
+
+
+class CadSessionError(OSError):
+    """遍历过程中与AutoCAD的连接断开，或连续多个实体读取失败，当前CAD会话不可再用"""
+
+
+def _is_disconnect(error):
+    """COM错误（comtypes.COMError或pywintypes.com_error）是否表示连接已断开"""
+    hresult = getattr(error, 'hresult', None)
+    if hresult is None and error.args and isinstance(error.args[0], int):
+        hresult = error.args[0]
+    return hresult is not None and (hresult & 0xFFFFFFFF) in DISCONNECT_HRESULTS
+
+
+def _entity_error(error, consecutive):
+    """读取单个实体出错时调用，返回连续出错的实体数；连接断开或连续出错过多时抛出CadSessionError
+
+    单个实体的错误（如代理实体不支持TextString）跳过即可，但AutoCAD退出后每个实体都会出错，
+    不能把不完整的结果当作提取成功，会话也应由会话池回收。
+    """
+    if _is_disconnect(error):
+        raise CadSessionError(f"与AutoCAD的连接已断开: {error}") from error
+    consecutive += 1
+    if consecutive >= MAX_ENTITY_ERRORS:
+        raise CadSessionError(f"连续 {consecutive} 个实体读取失败: {error}") from error
+    return consecutive
+
+
+def _read_record(entity, entity_type, text, metadata=True):
+    """读取实体的句柄及后续阶段使用的插入点、方向和字高，生成文本记录
+
+    metadata为False时只保留文本和类型。插入点、方向和字高只用于拆分标注拼接和管道长度估算，
+    只对可能是管道号或其片段的文本（含数字或连字符，见GEOMETRY_TEXT）读取；图层不被后续阶段
+    使用，不读取。每条文本最多4次、不含数字和连字符的文本1次额外的COM往返。
+    """
+    if not metadata:
+        return TextRecord(text, entity_type, None, None, None)
+    try:
+        handle = entity.Handle
+    except Exception:
+        handle = None
+    if not GEOMETRY_TEXT.search(text):
+        return TextRecord(text, entity_type, handle, None, None)
+    try:
+        insertion_point = tuple(entity.InsertionPoint)
+    except Exception:
+        insertion_point = None
+    try:
+        rotation = math.degrees(entity.Rotation)
+    except Exception:
+        rotation = None
+    try:
+        height = entity.Height
+    except Exception:
+        height = None
+    return TextRecord(text, entity_type, handle, None, insertion_point, rotation, height)
+
+
+class BlockTextCache:
+    """块定义中的静态文本，按块名缓存
+
+    块定义中的TEXT、MTEXT和常量属性定义（Constant为True的AcDbAttributeDefinition）
+    在每个块参照中都相同，每个块名只遍历一次；同一个块插入上千次也只产生一次遍历的
+    COM往返。块定义中嵌套的块参照读取其属性并递归展开其块定义，超过max_depth层的
+    嵌套不再展开。非常量属性的值随块参照变化，仍由块参照的GetAttributes读取。
+    """
+
+    def __init__(self, blocks, max_depth=DEFAULT_BLOCK_DEPTH, metadata=True):
+        self.blocks = blocks
+        self.max_depth = max_depth
+        self.metadata = metadata
+        self.hits = 0
+        self.misses = 0
+        self.truncated = 0
+        self._records = {}  # (块名, 层数) -> 文本记录元组
+
+    def records(self, name, depth=1):
+        """块名对应块定义（第depth层）中的静态文本记录，句柄为块定义中实体的句柄"""
+        key = (name, depth)
+        records = self._records.get(key)
+        if records is not None:
+            self.hits += 1
+            return records
+        self.misses += 1
+
+        records = []
+        try:
+            block = self.blocks.Item(name)
+            count = block.Count
+        except Exception:
+            count = 0
+        for i in range(count):
+            try:
+                entity = block.Item(i)
+                entity_type = entity.ObjectName
+                if entity_type in ("AcDbText", "AcDbMText"):
+                    text_content = entity.TextString
+                    if text_content:
+                        records.append(_read_record(entity, entity_type, text_content, self.metadata))
+                elif entity_type == "AcDbAttributeDefinition":
+                    if entity.Constant:
+                        text_content = entity.TextString
+                        if text_content:
+                            records.append(_read_record(entity, entity_type, text_content, self.metadata))
+                elif entity_type == "AcDbBlockReference":
+                    if depth >= self.max_depth:
+                        self.truncated += 1
+                        continue
+                    for attr in entity.GetAttributes():
+                        records.append(_read_record(attr, "AcDbAttribute", attr.TextString, self.metadata))
+                    records.extend(self.records(entity.Name, depth + 1))
+            except Exception:
+                continue
+
+        records = tuple(records)
+        self._records[key] = records
+        return records
+
+    def instance_records(self, entity):
+        """块参照的块定义中的静态文本，句柄为“块参照句柄/块定义中实体的句柄”，插入点为块参照的插入点
+
+        块定义中文本的实际位置取决于块参照的比例和旋转，不保留方向和字高，不参与拆分标注拼接。
+        """
+        records = self.records(entity.Name)
+        if not records or not self.metadata:
+            return records
+        try:
+            handle = entity.Handle
+        except Exception:
+            handle = None
+        try:
+            insertion_point = tuple(entity.InsertionPoint)
+        except Exception:
+            insertion_point = None
+        return [record._replace(handle=f"{handle}/{record.handle}" if handle and record.handle else handle,
+                                insertion_point=insertion_point, rotation=None, height=None)
+                for record in records]
+
+    def log_stats(self, log=None):
+        """输出块定义缓存的命中率"""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        (log or logger.info)(f"块定义缓存: 命中 {self.hits}, 未命中 {self.misses}, 命中率 {hit_rate:.1f}%, "
+                             f"超过嵌套层数 {self.truncated}")
+
+
+def iter_model_space_records(model_space, log=None, metadata=True, start=0, stop=None, block_cache=None,
+                             progress=None):
+    """逐个遍历ModelSpace实体，返回文本记录
+
+    TEXT/MTEXT返回TextString，块参照返回每个属性的TextString；指定block_cache
+    （BlockTextCache）时还返回块定义中的静态文本。start/stop指定实体索引范围（分片提取时使用）。
+    指定progress（pid_progress.ProgressTracker）时每个实体更新一次进度，取消时抛出ExtractionCancelled。
+    """
+    log = log or logger.info
+    total_entities = model_space.Count
+    stop = total_entities if stop is None else min(stop, total_entities)
+    if progress is not None:
+        progress.begin("读取实体", stop - start)
+    errors = 0
+    for i in range(start, stop):
+        # 显示进度（在try之外，取消不会被下面的异常处理忽略）
+        if progress is not None:
+            progress.update(i - start)
+        elif i % 10000 == 0:
+            log(f"处理进度: {i}/{total_entities} ({i/total_entities*100:.1f}%)")
+        try:
+            entity = model_space.Item(i)
+            entity_type = entity.ObjectName
+            errors = 0
+
+            # 只处理文本相关的实体类型，提高效率
+            if entity_type not in TEXT_ENTITY_TYPES:
+                continue
+
+            if entity_type == "AcDbBlockReference":
+                # 处理块参照中的属性
+                try:
+                    if hasattr(entity, 'GetAttributes'):
+                        for attr in entity.GetAttributes():
+                            if hasattr(attr, 'TextString'):
+                                yield _read_record(attr, "AcDbAttribute", attr.TextString, metadata)
+                except Exception:
+                    pass
+                if block_cache is not None:
+                    yield from block_cache.instance_records(entity)
+            else:
+                text_content = entity.TextString
+                if text_content:
+                    yield _read_record(entity, entity_type, text_content, metadata)
+
+        except Exception as e:
+            errors = _entity_error(e, errors)
+    if progress is not None:
+        progress.finish()
+
+
+def layer_matcher(patterns):
+    """图层名通配符（AutoCAD风格，不区分大小写）的匹配函数，patterns为空时匹配全部图层"""
+    if not patterns:
+        return lambda layer: True
+    regex = re.compile('|'.join(fnmatch.translate(pattern.upper()) for pattern in patterns))
+    return lambda layer: bool(layer) and regex.match(layer.upper()) is not None
+
+
+def _polyline_points(entity):
+    """LINE或LWPOLYLINE实体的顶点，闭合多段线重复第一个顶点"""
+    if entity.ObjectName == "AcDbLine":
+        start, end = entity.StartPoint, entity.EndPoint
+        return ((start[0], start[1]), (end[0], end[1]))
+    coordinates = entity.Coordinates
+    points = tuple(zip(coordinates[0::2], coordinates[1::2]))
+    if points and entity.Closed:
+        points += points[:1]
+    return points
+
+
+def iter_selection_polylines(doc, layers=DEFAULT_PIPE_LAYERS, log=None, progress=None):
+    """通过过滤选择集读取管道图层上的LINE和LWPOLYLINE，返回几何记录，progress同iter_model_space_records"""
+    log = log or logger.info
+    filter_items = [(0, "LINE,LWPOLYLINE")] + ([(8, ",".join(layers))] if layers else [])
+    selection_set = _create_selection_set(doc, "PID_EXTRACTOR_PIPES", filter_items)
+    try:
+        count = selection_set.Count
+        log(f"选择集 管道线 实体数量: {count}")
+        if progress is not None:
+            progress.begin("读取管道线", count)
+        errors = 0
+        for i in range(count):
+            if progress is not None:
+                progress.update(i)
+            try:
+                entity = selection_set.Item(i)
+                points = _polyline_points(entity)
+                errors = 0
+                if len(points) >= 2:
+                    yield PolylineRecord(entity.Handle, entity.Layer, points)
+            except Exception as e:
+                errors = _entity_error(e, errors)
+        if progress is not None:
+            progress.finish()
+    finally:
+        try:
+            selection_set.Delete()
+        except Exception:
+            pass
+
+
+class SelectionFilter:
+    """选择集过滤条件
+
+    entity_types: 需要的DXF实体类型，取值TEXT、MTEXT、INSERT
+    layers: 图层名列表，支持AutoCAD通配符（如PIPE*），None表示不限
+    min_text_height / max_text_height: 文字高度范围，只作用于TEXT和MTEXT
+
+    块参照默认只选择带属性的（组码66=1），属性文字高度不参与过滤。
+    """
+
+    def __init__(self, entity_types=("TEXT", "MTEXT", "INSERT"), layers=None,
+                 min_text_height=None, max_text_height=None):
+        entity_types = [t.upper() for t in entity_types]
+        unknown = set(entity_types) - set(SELECTION_TEXT_TYPES) - {"INSERT"}
+        if unknown:
+            raise ValueError(f"选择集不支持的实体类型: {', '.join(sorted(unknown))}")
+        self.text_types = [t for t in entity_types if t in SELECTION_TEXT_TYPES]
+        self.include_blocks = "INSERT" in entity_types
+        self.layers = list(layers) if layers else None
+        self.min_text_height = min_text_height
+        self.max_text_height = max_text_height
+
+    def __repr__(self):
+        return (f"SelectionFilter(entity_types={self.text_types + (['INSERT'] if self.include_blocks else [])}, "
+                f"layers={self.layers}, min_text_height={self.min_text_height}, "
+                f"max_text_height={self.max_text_height})")
+
+    def _layer_items(self):
+        return [(8, ",".join(self.layers))] if self.layers else []
+
+    def text_filter(self, text_type):
+        """TEXT或MTEXT的过滤条件，返回[(组码, 值), ...]"""
+        items = [(0, text_type)] + self._layer_items()
+        if self.min_text_height is not None:
+            items += [(-4, ">="), (40, float(self.min_text_height))]
+        if self.max_text_height is not None:
+            items += [(-4, "<="), (40, float(self.max_text_height))]
+        return items
+
+    def block_filter(self, attributed_only=True):
+        """块参照的过滤条件，attributed_only为False时包括不带属性的块参照（需要读取块定义时）"""
+        return [(0, "INSERT")] + ([(66, 1)] if attributed_only else []) + self._layer_items()
+
+
+def _create_selection_set(doc, name, filter_items):
+    """创建选择集并按过滤条件选择全部实体
+
+    FilterType需为VT_I2数组，FilterData为VARIANT数组。
+    """
+    selection_sets = doc.SelectionSets
+    try:
+        selection_sets.Item(name).Delete()
+    except Exception:
+        pass
+    selection_set = selection_sets.Add(name)
+    filter_type = array.array('h', [code for code, _ in filter_items])
+    filter_data = tuple(value for _, value in filter_items)
+    selection_set.Select(AC_SELECTION_SET_ALL, None, None, filter_type, filter_data)
+    return selection_set
+
+
+def iter_selection_records(doc, selection_filter=None, log=None, metadata=True, block_cache=None,
+                           progress=None):
+    """通过过滤选择集只读取文本实体，返回文本记录
+
+    由AutoCAD在服务端按类型、图层和文字高度筛选，每种实体类型一个选择集，
+    因此无需逐个读取ObjectName，线、圆弧、填充等实体也不会产生COM往返。
+    指定block_cache时选择全部块参照，并返回块定义中的静态文本。
+    指定progress时每个选择集是一个进度阶段。
+    """
+    log = log or logger.info
+    selection_filter = selection_filter or SelectionFilter()
+
+    groups = [(text_type, selection_filter.text_filter(text_type))
+              for text_type in selection_filter.text_types]
+    if selection_filter.include_blocks:
+        groups.append(("INSERT", selection_filter.block_filter(block_cache is None)))
+
+    for dxf_type, filter_items in groups:
+        selection_set = _create_selection_set(doc, f"PID_EXTRACTOR_{dxf_type}", filter_items)
+        try:
+            count = selection_set.Count
+            log(f"选择集 {dxf_type} 实体数量: {count}")
+            if progress is not None:
+                progress.begin(f"选择集 {dxf_type}", count)
+            errors = 0
+            for i in range(count):
+                if progress is not None:
+                    progress.update(i)
+                try:
+                    entity = selection_set.Item(i)
+                    errors = 0
+                    if dxf_type == "INSERT":
+                        for attr in entity.GetAttributes():
+                            yield _read_record(attr, "AcDbAttribute", attr.TextString, metadata)
+                        if block_cache is not None:
+                            yield from block_cache.instance_records(entity)
+                    else:
+                        text_content = entity.TextString
+                        if text_content:
+                            yield _read_record(entity, SELECTION_TEXT_TYPES[dxf_type],
+                                               text_content, metadata)
+                except Exception as e:
+                    errors = _entity_error(e, errors)
+            if progress is not None:
+                progress.finish()
+        finally:
+            try:
+                selection_set.Delete()
+            except Exception:
+                pass
+
+
+class ExtractionBackend:
+    """文本提取后端基类
+
+    子类实现iter_records(drawing_path, shard=None)，逐条返回TextRecord；
+    支持读取管道几何的后端实现iter_polylines，逐条返回PolylineRecord。
+    支持分片的后端实现plan_shards，返回可在其他进程中传给iter_records的分片描述，
+    各分片结果按顺序拼接后与不分片提取的结果完全一致。
+
+    progress为pid_progress.ProgressTracker，指定时提取循环报告进度并在取消时抛出
+    ExtractionCancelled（已打开的文档照常关闭）。
+    """
+
+    name = None
+
+    def __init__(self, log=None, progress=None):
+        self.log = log or logger.info
+        self.progress = progress
+
+    def iter_records(self, drawing_path, shard=None):
+        raise NotImplementedError
+
+    def iter_polylines(self, drawing_path, layers=DEFAULT_PIPE_LAYERS):
+        """读取图层匹配layers的LINE和LWPOLYLINE（模型空间），默认不支持"""
+        raise NotImplementedError(f"{self.name}后端不支持读取管道几何")
+
+    def plan_shards(self, drawing_path, shard_size=None):
+        """划分提取分片，默认不支持分片"""
+        return [None]
+
+    def cache_key(self):
+        """影响提取结果的后端配置，作为提取缓存键的一部分"""
+        return self.name
+
+    def extract_texts(self, drawing_path):
+        """提取图纸中的全部非空文本"""
+        return [record.text for record in self.iter_records(drawing_path) if record.text]
+
+
+def _default_acad_factory():
+    from pyautocad import Autocad
+    return Autocad(create_if_not_exists=True)
+
+
+class _PrivateAcadSession:
+    """当前进程独占的AutoCAD实例，进程退出时关闭"""
+
+    _instance = None
+
+    def __init__(self):
+        import comtypes.client
+        from multiprocessing.util import Finalize
+
+        self.app = comtypes.client.CreateObject("AutoCAD.Application")
+        self.app.Visible = False
+        # 进程池工作进程退出时不执行atexit，使用Finalize关闭AutoCAD
+        Finalize(self, _quit_application, args=(self.app,), exitpriority=10)
+
+
+def _quit_application(app):
+    try:
+        app.Quit()
+    except Exception:
+        pass
+
+
+def _private_acad_factory():
+    """每个进程只启动一次独立的AutoCAD实例（不连接已运行的实例）"""
+    if _PrivateAcadSession._instance is None:
+        _PrivateAcadSession._instance = _PrivateAcadSession()
+    return _PrivateAcadSession._instance
+
+
+class ComBackend(ExtractionBackend):
+    """通过AutoCAD COM接口遍历ModelSpace
+
+    acad_factory返回与pyautocad.Autocad接口一致的对象（需提供app属性），
+    测试和基准时可替换为pid_fake_com中的FakeAutocad。
+
+    mode: scan=逐实体Item(i)遍历，select=过滤选择集（见SelectionFilter）
+    metadata: 是否读取句柄，以及可能是管道号的文本的插入点、方向和字高（见_read_record）
+    session: shared=连接已运行的AutoCAD，private=每个进程启动独立的AutoCAD（批量并行时使用）
+    read_only: 以只读方式打开图纸（多个进程同时打开同一图纸时使用）
+    block_depth: 块定义中静态文本的嵌套展开层数（见BlockTextCache），0表示只读取块参照的属性
+    session_pool: 会话池（见pid_session.SessionPool），指定时从池中取用CAD会话，处理完归还，
+        出错时（包括遍历中连接断开，见CadSessionError）由池回收；不指定时每次通过acad_factory连接AutoCAD
+
+    分片按ModelSpace实体索引范围划分，只支持scan方式。
+    """
+
+    name = 'com'
+
+    # 默认每个分片的实体数量
+    DEFAULT_SHARD_SIZE = 50000
+
+    def __init__(self, acad_factory=None, mode='scan', selection_filter=None, metadata=True,
+                 session='shared', read_only=False, block_depth=DEFAULT_BLOCK_DEPTH, session_pool=None,
+                 log=None, progress=None):
+        super().__init__(log, progress)
+        if mode not in ('scan', 'select'):
+            raise ValueError(f"未知的遍历方式: {mode}")
+        if acad_factory is None:
+            acad_factory = _private_acad_factory if session == 'private' else _default_acad_factory
+        self.acad_factory = acad_factory
+        self.mode = mode
+        self.selection_filter = selection_filter
+        self.metadata = metadata
+        self.read_only = read_only
+        self.block_depth = block_depth
+        self.session_pool = session_pool
+
+    def cache_key(self):
+        key = f"{self.name}|{self.mode}|metadata={self.metadata}|block_depth={self.block_depth}"
+        if self.mode == 'select':
+            key += f"|{self.selection_filter or SelectionFilter()!r}"
+        return key
+
+    @contextmanager
+    def _document(self, drawing_path):
+        """打开图纸，退出时关闭；使用会话池时归还会话，出错时由池回收（取消不算出错）"""
+        pool = self.session_pool
+        session = pool.acquire() if pool is not None else None
+        failed = False
+        try:
+            # 连接到AutoCAD
+            acad = session.acad if session is not None else self.acad_factory()
+            self.log("成功连接到AutoCAD")
+
+            # 打开文件
+            abs_path = os.path.abspath(drawing_path)
+            self.log(f"打开文件: {abs_path}")
+            doc = acad.app.Documents.Open(abs_path, self.read_only)
+            self.log(f"成功打开文件: {doc.Name}")
+            disconnected = False
+            try:
+                yield doc
+            except CadSessionError:
+                disconnected = True
+                raise
+            finally:
+                # 关闭文档；连接已断开时关闭也会失败，文档随会话一起回收
+                if not disconnected:
+                    doc.Close(False)
+                    self.log("已关闭文档")
+        except ExtractionCancelled:
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if session is not None:
+                pool.release(session, failed)
+
+    def iter_records(self, drawing_path, shard=None):
+        with self._document(drawing_path) as doc:
+            block_cache = None
+            if self.block_depth > 0:
+                block_cache = BlockTextCache(doc.Blocks, self.block_depth, self.metadata)
+            if self.mode == 'select':
+                yield from iter_selection_records(doc, self.selection_filter, self.log, self.metadata,
+                                                  block_cache, self.progress)
+            else:
+                # 获取模型空间
+                model_space = doc.ModelSpace
+                self.log(f"模型空间实体数量: {model_space.Count}")
+                start, stop = shard if shard else (0, None)
+                yield from iter_model_space_records(model_space, self.log, self.metadata, start, stop,
+                                                    block_cache, self.progress)
+            if block_cache is not None:
+                block_cache.log_stats(self.log)
+
+    def iter_polylines(self, drawing_path, layers=DEFAULT_PIPE_LAYERS):
+        with self._document(drawing_path) as doc:
+            yield from iter_selection_polylines(doc, layers, self.log, self.progress)
+
+    def plan_shards(self, drawing_path, shard_size=None):
+        """按实体索引划分分片，返回[(start, stop), ...]"""
+        if self.mode != 'scan':
+            self.log("选择集方式不支持分片，按单个分片提取")
+            return [None]
+        with self._document(drawing_path) as doc:
+            total_entities = doc.ModelSpace.Count
+        shard_size = max(1, shard_size or self.DEFAULT_SHARD_SIZE)
+        return [(start, min(start + shard_size, total_entities))
+                for start in range(0, total_entities, shard_size)] or [None]
+
+
+class DxfBackend(ExtractionBackend):
+    """直接流式读取DXF文件，无需AutoCAD
+
+    分片按ENTITIES段的字节范围划分（shard_size为字节数），只支持ASCII DXF。
+    """
+
+    name = 'dxf'
+
+    # 默认每个分片的字节数
+    DEFAULT_SHARD_SIZE = 32 * 1024 * 1024
+
+    def __init__(self, chunk_size=None, log=None, progress=None):
+        super().__init__(log, progress)
+        self.chunk_size = chunk_size
+
+    def iter_records(self, drawing_path, shard=None):
+        from pid_dxf import iter_dxf_texts, DEFAULT_CHUNK_SIZE
+
+        abs_path = os.path.abspath(drawing_path)
+        self.log(f"读取DXF文件: {abs_path}")
+        yield from iter_dxf_texts(abs_path, self.chunk_size or DEFAULT_CHUNK_SIZE, shard, self.progress)
+
+    def iter_polylines(self, drawing_path, layers=DEFAULT_PIPE_LAYERS):
+        from pid_dxf import iter_dxf_polylines, DEFAULT_CHUNK_SIZE
+
+        yield from iter_dxf_polylines(os.path.abspath(drawing_path), layers,
+                                      self.chunk_size or DEFAULT_CHUNK_SIZE, self.progress)
+
+    def plan_shards(self, drawing_path, shard_size=None):
+        from pid_dxf import plan_dxf_shards
+
+        return plan_dxf_shards(drawing_path, shard_size or self.DEFAULT_SHARD_SIZE)
+
+
+BACKENDS = {
+    'com': ComBackend,
+    'dxf': DxfBackend,
+}
+
+
+def resolve_backend(drawing_path, backend='auto'):
+    """确定提取后端：auto时按扩展名选择，.dxf使用DXF后端，其余使用AutoCAD COM"""
+    if backend == 'auto':
+        return 'dxf' if drawing_path.lower().endswith('.dxf') else 'com'
+    return backend
+
+
+def get_backend(name, **options):
+    """按名称创建提取后端，fake为pid_fake_com中的模拟COM后端"""
+    if name == 'fake':
+        from pid_fake_com import FakeComBackend
+        return FakeComBackend(**options)
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的提取后端: {name}")
+    return backend_class(**options)
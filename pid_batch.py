@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+P&ID管道数据提取工具 - 批量模式
+并行处理整个文件夹（或清单文件）中的图纸，汇总为一个Excel报告
+
+用法:
+    python pid_batch.py drawings/ -c code.xlsx -o project_lines.xlsx -j 4
+    python pid_batch.py manifest.txt -c code.xlsx
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from pid_backends import DEFAULT_BLOCK_DEPTH, DEFAULT_PIPE_LAYERS, get_backend, resolve_backend
+from pid_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ExtractionCache, stream_records
+from pid_export import write_report_workbook
+from pid_geometry import TagCollector, measure_pipe_lengths
+from pid_grammar import load_recognizer
+from pid_phase import load_classifier
+from pid_session import SessionPool
+from pid_store import LineStore
+from pid_extractor import (REPORT_COLUMN_WIDTHS, PipelineIndex, build_report_frame,
+                           get_resource_path, load_medium_codes, stream_pipeline_records)
+
+logger = logging.getLogger(__name__)
+
+# 支持的图纸扩展名
+DRAWING_EXTENSIONS = ('.dwg', '.dxf')
+
+# 处理统计表列宽
+SUMMARY_COLUMN_WIDTHS = {'A': 40, 'B': 8, 'C': 10, 'D': 10, 'E': 10, 'F': 50}
+
+# 当前工作进程的CAD会话池（见_worker_session_pool）
+_session_pool = None
+
+
+def collect_drawings(source, recursive=False):
+    """收集待处理图纸
+
+    source为文件夹时按文件名排序返回其中的DWG/DXF文件；
+    为文件时视为清单，每行一个图纸路径（相对路径相对于清单所在目录），#开头为注释。
+    """
+    if os.path.isdir(source):
+        drawings = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            drawings.extend(os.path.join(root, name) for name in sorted(files)
+                            if name.lower().endswith(DRAWING_EXTENSIONS))
+            if not recursive:
+                break
+        return drawings
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    drawings = []
+    with open(source, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                drawings.append(os.path.normpath(os.path.join(base_dir, line)))
+    return drawings
+
+
+def _worker_session_pool():
+    """当前工作进程的CAD会话池，首次调用时创建
+
+    每个进程使用独立的AutoCAD实例；AutoCAD崩溃或连接断开时会话由池回收，
+    下一张图纸重新启动，不影响同一进程中后续的图纸。
+    """
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = SessionPool(session='private')
+    return _session_pool
+
+
+def process_drawing(job):
+    """在工作进程中处理一张图纸，返回解析结果、耗时、缓存命中统计和错误信息"""
+    drawing = job['drawing']
+    start = time.perf_counter()
+    result = {'drawing': drawing, 'pipeline_data': [], 'texts': 0, 'error': None,
+              'cache_hits': 0, 'cache_misses': 0, 'cache_evictions': 0}
+    cache = None
+    try:
+        backend = resolve_backend(drawing, job['backend'])
+        options = {}
+        if backend == 'com':
+            # COM后端参数只作用于DWG；每个工作进程使用独立的AutoCAD实例（会话池）
+            options = dict(job.get('backend_options') or {})
+            options.setdefault('session_pool', _worker_session_pool())
+        extractor = get_backend(backend, **options)
+
+        if job.get('cache_dir'):
+            cache = ExtractionCache(job['cache_dir'], job.get('cache_max_bytes', DEFAULT_MAX_BYTES))
+        text_entities = (record for record in stream_records(extractor, drawing, cache) if record.text)
+        pipeline_index = PipelineIndex()
+        recognizer = load_recognizer(job.get('grammars'))
+        pipe_layers = job.get('pipe_layers')
+        tags = TagCollector(recognizer.prefilter) if pipe_layers else None
+        result['pipeline_data'] = list(stream_pipeline_records(
+            text_entities, job['medium_codes'], pipeline_index,
+            recognizer, load_classifier(job.get('phase_rules')),
+            merge=job.get('merge', True), tags=tags))
+        result['texts'] = pipeline_index.text_count()
+        if tags is not None:
+            try:
+                measure_pipe_lengths(result['pipeline_data'], extractor.iter_polylines(drawing, pipe_layers), tags)
+            except Exception as e:
+                logger.error(f"{os.path.basename(drawing)} 估算管道长度失败: {e}")
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    if cache is not None:
+        result.update(cache_hits=cache.hits, cache_misses=cache.misses, cache_evictions=cache.evictions)
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(drawings, medium_codes, backend='auto', backend_options=None, workers=None,
+              cache_dir=None, grammars=None, phase_rules=None, merge=True, pipe_layers=None,
+              cache_max_bytes=DEFAULT_MAX_BYTES):
+    """用进程池并行处理图纸，按输入顺序返回每张图纸的结果
+
+    grammars为编号规则配置文件路径，phase_rules为相态规则文件路径，默认均使用内置规则。
+    merge为False时不拼接拆分的管道号标注。pipe_layers为管道图层通配符列表时估算管道长度。
+    cache_max_bytes为缓存容量上限，各工作进程共用同一缓存目录，结束后汇总输出命中统计。
+    """
+    jobs = [{
+        'drawing': drawing,
+        'backend': backend,
+        'backend_options': backend_options,
+        'medium_codes': medium_codes,
+        'cache_dir': cache_dir,
+        'cache_max_bytes': cache_max_bytes,
+        'grammars': grammars,
+        'phase_rules': phase_rules,
+        'merge': merge,
+        'pipe_layers': pipe_layers,
+    } for drawing in drawings]
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    logger.info(f"批量处理 {len(jobs)} 张图纸，工作进程数: {workers}")
+
+    results = []
+    if workers == 1:
+        iterator = map(process_drawing, jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        iterator = executor.map(process_drawing, jobs)
+    try:
+        for index, result in enumerate(iterator, 1):
+            name = os.path.basename(result['drawing'])
+            if result['error']:
+                logger.error(f"[{index}/{len(jobs)}] {name} 失败: {result['error']}")
+            elif not result['texts']:
+                logger.warning(f"[{index}/{len(jobs)}] {name}: 未提取到任何文本, "
+                               f"耗时 {result['elapsed']:.2f} s")
+            else:
+                logger.info(f"[{index}/{len(jobs)}] {name}: {len(result['pipeline_data'])} 个管道号, "
+                            f"耗时 {result['elapsed']:.2f} s")
+            results.append(result)
+    finally:
+        if workers > 1:
+            executor.shutdown()
+    if cache_dir:
+        log_cache_stats(results, cache_dir, cache_max_bytes)
+    return results
+
+
+def log_cache_stats(results, cache_dir, cache_max_bytes=DEFAULT_MAX_BYTES):
+    """汇总各工作进程的缓存命中统计并输出"""
+    cache = ExtractionCache(cache_dir, cache_max_bytes)
+    for result in results:
+        cache.hits += result['cache_hits']
+        cache.misses += result['cache_misses']
+        cache.evictions += result['cache_evictions']
+    cache.log_stats()
+
+
+def drawing_status(result):
+    """处理统计表中的状态：失败、无文本（未报错但没有提取到文本）或成功"""
+    if result['error']:
+        return '失败'
+    return '成功' if result['texts'] else '无文本'
+
+
+def build_batch_frames(results):
+    """汇总各图纸结果，返回(管道数据表, 处理统计表)"""
+    frames = []
+    for result in results:
+        df = build_report_frame(result['pipeline_data'])
+        df.insert(0, '图纸', os.path.basename(result['drawing']))
+        frames.append(df)
+    if frames:
+        lines = pd.concat(frames, ignore_index=True)
+    else:
+        lines = pd.DataFrame(columns=['图纸'] + list(build_report_frame([]).columns))
+    lines = lines.sort_values(['管道号', '图纸'], kind='stable').reset_index(drop=True)
+
+    summary = pd.DataFrame([{
+        '图纸': result['drawing'],
+        '状态': drawing_status(result),
+        '文本数': result['texts'],
+        '管道号数': len(result['pipeline_data']),
+        '耗时(秒)': round(result['elapsed'], 2),
+        '错误信息': result['error'] or '',
+    } for result in results], columns=['图纸', '状态', '文本数', '管道号数', '耗时(秒)', '错误信息'])
+    return lines, summary
+
+
+def create_batch_output(results, output_path):
+    """保存汇总Excel：管道数据表（带来源图纸列）和处理统计表"""
+    lines, summary = build_batch_frames(results)
+
+    # 第一列为图纸名，其余列宽与单图报告一致
+    column_widths = {'A': 25}
+    for col, width in REPORT_COLUMN_WIDTHS.items():
+        column_widths[chr(ord(col) + 1)] = width
+
+    write_report_workbook(output_path, [
+        ('管道数据表', list(lines.columns), column_widths, lines.itertuples(index=False, name=None)),
+        ('处理统计', list(summary.columns), SUMMARY_COLUMN_WIDTHS,
+         summary.itertuples(index=False, name=None)),
+    ])
+
+    logger.info(f"成功保存Excel文件: {output_path}")
+    return lines, summary
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="P&ID管道数据提取工具 - 批量模式")
+    parser.add_argument('source', help="图纸文件夹，或每行一个图纸路径的清单文件")
+    parser.add_argument('-c', '--codes', default=get_resource_path("test/code.xlsx"),
+                        help="介质代码Excel文件（默认: test/code.xlsx）")
+    parser.add_argument('--all-code-sheets', action='store_true',
+                        help="合并介质代码文件的所有工作表（默认只读取第一个）")
+    parser.add_argument('-o', '--output', default="pipeline_data_batch.xlsx",
+                        help="汇总Excel文件（默认: pipeline_data_batch.xlsx）")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="工作进程数（默认: CPU核数）")
+    parser.add_argument('-r', '--recursive', action='store_true', help="递归处理子文件夹")
+    parser.add_argument('--backend', choices=['auto', 'com', 'dxf'], default='auto',
+                        help="文本提取后端: com=AutoCAD COM, dxf=直接读取DXF文件, auto=按扩展名选择")
+    parser.add_argument('--mode', choices=['scan', 'select'], default='scan',
+                        help="COM遍历方式: scan=逐实体遍历, select=过滤选择集")
+    parser.add_argument('--block-depth', type=int, default=DEFAULT_BLOCK_DEPTH,
+                        help=f"块定义中静态文本的嵌套展开层数（COM，默认{DEFAULT_BLOCK_DEPTH}，0=只读取块属性）")
+    parser.add_argument('-g', '--grammars', help="编号规则配置文件（JSON），默认使用内置的标准规则")
+    parser.add_argument('--phase-rules', help="相态规则文件（JSON），默认使用内置规则")
+    parser.add_argument('--no-merge', action='store_true', help="不拼接拆分的管道号标注")
+    parser.add_argument('--pipe-lengths', action='store_true', help="估算每个管道号的管道长度")
+    parser.add_argument('--pipe-layers', nargs='+', default=list(DEFAULT_PIPE_LAYERS),
+                        help=f"管道图层（支持通配符，默认: {' '.join(DEFAULT_PIPE_LAYERS)}）")
+    parser.add_argument('--store', help="同时写入管道号数据库（SQLite，见pid_store.py）")
+    parser.add_argument('--project', help="写入数据库时的项目名称（默认保留原有名称）")
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help="提取结果缓存目录")
+    parser.add_argument('--cache-size', type=int, default=500, help="缓存容量上限（MB，默认500）")
+    parser.add_argument('--no-cache', action='store_true', help="不使用提取结果缓存")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """批量处理主函数"""
+    args = parse_args(argv)
+
+    drawings = collect_drawings(args.source, args.recursive)
+    if not drawings:
+        logger.error(f"未找到图纸: {args.source}")
+        return 1
+
+    medium_codes = load_medium_codes(args.codes, None if args.all_code_sheets else 0)
+    # 提前加载编号规则和相态规则，配置无效时在开始处理前报错
+    load_recognizer(args.grammars)
+    load_classifier(args.phase_rules)
+    backend_options = {'mode': args.mode, 'block_depth': args.block_depth}
+
+    start = time.perf_counter()
+    results = run_batch(drawings, medium_codes, args.backend, backend_options, args.workers,
+                        None if args.no_cache else args.cache_dir, args.grammars, args.phase_rules,
+                        not args.no_merge, args.pipe_layers if args.pipe_lengths else None,
+                        args.cache_size * 1024 * 1024)
+    elapsed = time.perf_counter() - start
+
+    if args.store:
+        with LineStore(args.store) as store:
+            for result in results:
+                if not result['error']:
+                    store.upsert_drawing(result['drawing'], result['pipeline_data'], args.project)
+
+    lines, summary = create_batch_output(results, args.output)
+    failed = [result for result in results if result['error']]
+    empty = [result for result in results if drawing_status(result) == '无文本']
+
+    print("\n批量处理完成！")
+    print(f"图纸: {len(results)} 张（失败 {len(failed)} 张，无文本 {len(empty)} 张），管道号: {len(lines)} 条")
+    print(f"总耗时: {elapsed:.1f} 秒，平均 {elapsed / len(results):.2f} 秒/张")
+    for result in failed:
+        print(f"  失败: {result['drawing']} - {result['error']}")
+    for result in empty:
+        print(f"  无文本: {result['drawing']}")
+    print(f"结果已保存到: {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
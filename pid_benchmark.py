@@ -0,0 +1,1553 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+P&ID管道数据提取工具 - 性能基准
+使用模拟COM模型和合成数据，在无AutoCAD的环境中测量各处理阶段的耗时
+
+用法:
+    python pid_benchmark.py traversal --entities 1000000 --latency 0.00002
+    python pid_benchmark.py selection --entities 400000 --latency 0.00002
+    python pid_benchmark.py shards --entities 200000 --latency 0.00002 --workers 1 2 4 8
+    python pid_benchmark.py dedup --counts 10000 20000 40000 80000
+    python pid_benchmark.py normalize --texts 1000000
+    python pid_benchmark.py prefilter --texts 1000000 --noise 0.95
+    python pid_benchmark.py grammars --counts 1 2 4 8 16
+    python pid_benchmark.py codes --rows 50000 --sheets 4
+    python pid_benchmark.py phase --rows 1000000 --names 300
+    python pid_benchmark.py records --lines 200000
+    python pid_benchmark.py stream --entities 300000 --latency 0.000002
+    python pid_benchmark.py excel --rows 10000 100000 1000000
+    python pid_benchmark.py formats --rows 100000 1000000
+    python pid_benchmark.py store --drawings 200 --lines 10000
+    python pid_benchmark.py diff --lines 100000 --changes 0.05
+    python pid_benchmark.py incremental --entities 500000 --changes 0.01
+    python pid_benchmark.py blocks --entities 100000 --latency 0.00002 --depth 4
+    python pid_benchmark.py labels --sites 25000 50000 100000 --split-ratio 0.1
+    python pid_benchmark.py pipes --runs 50000 --com-entities 100000
+    python pid_benchmark.py sessions --runs 12 --startup 1.0 --max-documents 5 --crash-at 7 --idle-crash-at 10
+    python pid_benchmark.py logsink --messages 200000 --max-lines 2000
+    python pid_benchmark.py progress --entities 200000 --cancel-at 0.5
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import logging
+import math
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import unicodedata
+from collections import Counter, deque
+from datetime import datetime
+
+from pid_backends import BlockTextCache, ComBackend, SelectionFilter, TextRecord, iter_model_space_records
+from pid_cache import ExtractionCache
+from pid_diff import diff_records, load_report_records
+from pid_extractor import (REPORT_COLUMN_WIDTHS, REPORT_COLUMNS, PipelineIndex, _normalize_unicode,
+                           build_report_frame, clean_medium_codes, create_excel_output,
+                           export_report, find_pipeline_numbers, format_sources, iter_pipeline_numbers,
+                           iter_text_records, load_medium_codes, normalize_text, parse_pipeline_index,
+                           stream_pipeline_records)
+from pid_grammar import DEFAULT_GRAMMAR, DEFAULT_RECOGNIZER, Grammar, LineRecognizer, TextPrefilter
+from pid_incremental import MatchState
+from pid_phase import DEFAULT_CLASSIFIER, DEFAULT_PHASE_RULES, PhaseClassifier
+from pid_records import PipelineRecord
+from pid_dxf import iter_dxf_polylines, iter_dxf_texts
+from pid_export import EXPORTERS, available_formats
+from pid_fake_com import CURVE_TYPES, NOISE_TEXTS, FakeAutocad, FakeComModel, fake_pipeline_number
+from pid_geometry import TagCollector, measure_pipe_lengths
+from pid_logsink import LogSink, verbose_log
+from pid_progress import ExtractionCancelled, ProgressLine, ProgressTracker, format_progress
+from pid_daemon import DaemonClient, ExtractionDaemon
+from pid_session import SessionPool
+from pid_shard import extract_sharded
+from pid_spatial import LabelMerger
+from pid_store import LineStore
+from pid_stream import StageMeter
+
+
+def _quiet(message):
+    pass
+
+
+def bench_traversal(args):
+    """逐实体Item(i)遍历：区分COM往返耗时和Python自身耗时"""
+    model = FakeComModel(entity_count=args.entities, latency=args.latency, seed=args.seed)
+    backend = ComBackend(acad_factory=lambda: FakeAutocad(model), log=_quiet)
+
+    start = time.perf_counter()
+    texts = backend.extract_texts("benchmark.dwg")
+    elapsed = time.perf_counter() - start
+
+    expected = [t for t in model.expected_texts() if t]
+    status = "一致" if texts == expected else "不一致"
+
+    print(f"实体数量:     {args.entities}")
+    print(f"提取文本:     {len(texts)} (与模型{status})")
+    print(f"COM调用次数:  {model.calls}")
+    print(f"总耗时:       {elapsed:.3f} s")
+    print(f"模拟COM耗时:  {model.com_time:.3f} s")
+    print(f"Python耗时:   {elapsed - model.com_time:.3f} s")
+    print(f"吞吐量:       {args.entities / elapsed:,.0f} 实体/秒")
+
+
+def bench_selection(args):
+    """过滤选择集与逐实体遍历的COM往返次数和耗时对比"""
+    selection_filter = SelectionFilter(layers=args.layers, min_text_height=args.min_height)
+    results = {}
+    for mode in ('scan', 'select'):
+        model = FakeComModel(entity_count=args.entities, latency=args.latency, seed=args.seed)
+        backend = ComBackend(acad_factory=lambda: FakeAutocad(model), mode=mode,
+                             selection_filter=selection_filter, metadata=not args.no_metadata, log=_quiet)
+        start = time.perf_counter()
+        texts = backend.extract_texts("benchmark.dwg")
+        elapsed = time.perf_counter() - start
+        results[mode] = (texts, model.calls, elapsed, model.server_time)
+
+    # 模拟模型在Python中执行服务端筛选，客户端耗时扣除这部分
+    print(f"实体数量: {args.entities}, COM延迟: {args.latency * 1e6:.0f} us")
+    print(f"{'方式':<8}{'文本数':>10}{'COM调用':>12}{'客户端耗时(s)':>16}{'模拟筛选(s)':>14}")
+    for mode, (texts, calls, elapsed, server_time) in results.items():
+        print(f"{mode:<8}{len(texts):>10}{calls:>12}{elapsed - server_time:>16.3f}{server_time:>14.3f}")
+
+    scan, select = results['scan'], results['select']
+    print(f"COM调用减少: {scan[1] / max(select[1], 1):.1f}x, "
+          f"客户端耗时加速: {(scan[2] - scan[3]) / max(select[2] - select[3], 1e-9):.1f}x")
+    if not args.layers and args.min_height is None:
+        same = Counter(results['scan'][0]) == Counter(results['select'][0])
+        print(f"提取结果一致: {same}")
+
+
+def bench_shards(args):
+    """单张图纸按实体范围分片、多进程并行提取的加速比"""
+    model_options = {'entity_count': args.entities, 'latency': args.latency, 'seed': args.seed}
+    expected = [t for t in FakeComModel(**model_options).expected_texts() if t]
+
+    print(f"实体数量: {args.entities}, COM延迟: {args.latency * 1e6:.0f} us, "
+          f"分片大小: {args.shard_size}")
+    print(f"{'进程数':<8}{'文本数':>10}{'耗时(s)':>10}{'加速比':>8}  结果")
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        records = extract_sharded("benchmark.dwg", 'fake', model_options, workers,
+                                  args.shard_size, log=_quiet)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        texts = [record.text for record in records if record.text]
+        status = "一致" if texts == expected else "不一致"
+        print(f"{workers:<8}{len(texts):>10}{elapsed:>10.3f}{baseline / elapsed:>8.2f}  {status}")
+
+
+# 改进前硬编码的管道号模式
+_LEGACY_PATTERN = r'(\d{4}[A-Z0-9]{1,4})-([A-Z0-9]{4,6})-(\d{2,3})-(\d{2}[A-Z0-9]{3,6})-([A-Z]{1,2})'
+
+
+def _legacy_find_pipeline_numbers(text_entities):
+    """改进前的实现：每个文本重新解析模式字符串，在列表中线性查找去重"""
+    pipeline_numbers = []
+    for text in text_entities:
+        for match in re.findall(_LEGACY_PATTERN, normalize_text(text)):
+            pipeline_number = '-'.join(match)
+            if pipeline_number not in pipeline_numbers:
+                pipeline_numbers.append(pipeline_number)
+    return pipeline_numbers
+
+
+def bench_dedup(args):
+    """管道号查找去重：不同管道号数量翻倍时耗时应线性增长"""
+    print(f"{'管道号数':>10}{'文本数':>10}{'索引(s)':>10}{'us/文本':>10}{'原实现(s)':>12}  结果")
+    for count in args.counts:
+        # 每个管道号出现repeat次，另有同样数量的非管道号文本
+        texts = [fake_pipeline_number(n) for n in range(count)] * args.repeat
+        texts += [NOISE_TEXTS[n % len(NOISE_TEXTS)] for n in range(count)]
+
+        start = time.perf_counter()
+        pipeline_index = find_pipeline_numbers(texts, log=_quiet)
+        elapsed = time.perf_counter() - start
+
+        legacy = status = "-"
+        if count <= args.legacy_max:
+            start = time.perf_counter()
+            expected = _legacy_find_pipeline_numbers(texts)
+            legacy = f"{time.perf_counter() - start:.3f}"
+            same = list(pipeline_index) == expected
+            status = "一致" if same and all(pipeline_index.count(n) == args.repeat for n in expected) else "不一致"
+        print(f"{count:>10}{len(texts):>10}{elapsed:>10.3f}{elapsed / len(texts) * 1e6:>10.2f}"
+              f"{legacy:>12}  {status}")
+
+
+def _legacy_normalize_text(s):
+    """改进前的文本标准化实现，作为一致性校验的参照"""
+    s = str(s).strip()
+    s = unicodedata.normalize('NFKC', s)
+    s = s.replace('\x00', '')
+    s = re.sub(r'[\u2010-\u2015]', '-', s)
+    s = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', s)
+    return s
+
+
+# 随机文本的字符来源：ASCII、控制字符、各种连字符和空白、全角字符、组合字符、中文等
+_NORMALIZE_ALPHABET = (
+    [chr(c) for c in range(0x00, 0xA0)]
+    + [chr(c) for c in range(0x2000, 0x2030)]
+    + [chr(c) for c in range(0xFF01, 0xFF5F)]
+    + ['\u0301', '\u0308', '\u00A0', '\u00B2', '\u00BD', '\u2122', '\u3000', '\uFE63',
+       '\u212B', '\u00C5', '\u1E9B', '\uFB01', '锅', '炉', '水', '\u3300']
+)
+
+
+def _random_text(rng):
+    length = rng.randint(0, 30)
+    if rng.random() < 0.5:
+        # 一半样本以管道号为基础插入随机字符
+        base = list(fake_pipeline_number(rng.randrange(100000)))
+        for _ in range(rng.randint(0, 3)):
+            base.insert(rng.randint(0, len(base)), rng.choice(_NORMALIZE_ALPHABET))
+        return ''.join(base)
+    return ''.join(rng.choice(_NORMALIZE_ALPHABET) for _ in range(length))
+
+
+def bench_normalize(args):
+    """文本标准化：随机样本一致性校验，以及百万级文本的耗时对比"""
+    rng = random.Random(args.seed)
+    mismatches = [text for text in (_random_text(rng) for _ in range(args.samples))
+                  if normalize_text(text) != _legacy_normalize_text(text)]
+    print(f"随机样本一致性校验: {args.samples} 个样本, 不一致 {len(mismatches)} 个")
+    for text in mismatches[:5]:
+        print(f"  {text!r}: {normalize_text(text)!r} != {_legacy_normalize_text(text)!r}")
+
+    # 语料：管道号、噪声文本和少量非ASCII文本，不同文本数量为总数的distinct比例
+    distinct = max(1, int(args.texts * args.distinct))
+    pool = []
+    for n in range(distinct):
+        if n % 10 == 0:
+            pool.append(f"４１０１BRR\u2013{n:05d}-200-03CBMB1-H")
+        elif n % 3 == 0:
+            pool.append(fake_pipeline_number(n))
+        else:
+            pool.append(f" {NOISE_TEXTS[n % len(NOISE_TEXTS)]} {n}\x00")
+    corpus = [pool[rng.randrange(distinct)] for _ in range(args.texts)]
+
+    start = time.perf_counter()
+    expected = [_legacy_normalize_text(text) for text in corpus]
+    legacy = time.perf_counter() - start
+
+    _normalize_unicode.cache_clear()
+    start = time.perf_counter()
+    result = [normalize_text(text) for text in corpus]
+    elapsed = time.perf_counter() - start
+    info = _normalize_unicode.cache_info()
+
+    print(f"语料: {args.texts} 个文本, 不同文本 {distinct} 个")
+    print(f"原实现:   {legacy:.3f} s")
+    print(f"新实现:   {elapsed:.3f} s（加速 {legacy / elapsed:.1f}x，非ASCII缓存命中 {info.hits}, 未命中 {info.misses}）")
+    print(f"结果一致: {result == expected}")
+
+
+# 预筛选基准使用的噪声文本：短位号、长说明文字、含连字符但不是管道号的文本
+_PREFILTER_NOISE = (
+    "P-101A", "FV-2001", "DN200", "VALVE", "1:50", "EL+12.500",
+    "SEE NOTE 3 FOR INSULATION DETAILS", "TIE-IN POINT BY OTHERS",
+    "DRAIN TO CLOSED DRAIN HEADER", "4101-P-1001A/B-SUCTION",
+    "LO-CS-FV2001-TYP-A", "2\"-150#-RF-GATE-VALVE-TYP",
+)
+
+
+def _prefilter_corpus(rng, texts, noise):
+    corpus = []
+    for n in range(texts):
+        if rng.random() < noise:
+            corpus.append(f"{rng.choice(_PREFILTER_NOISE)} {n % 1000}")
+        else:
+            corpus.append(fake_pipeline_number(rng.randrange(50000)))
+    return corpus
+
+
+def bench_prefilter(args):
+    """预筛选：95%为噪声文本的语料上与不做预筛选的耗时和结果对比"""
+    rng = random.Random(args.seed)
+
+    # 随机文本（控制字符、Unicode连字符、全角字符等）上的一致性校验
+    samples = [_random_text(rng) for _ in range(args.samples)]
+    same_random = (list(find_pipeline_numbers(samples, log=_quiet))
+                   == list(find_pipeline_numbers(samples, log=_quiet, prefilter=None)))
+    print(f"随机样本一致性校验: {args.samples} 个样本, 结果一致: {same_random}")
+
+    corpus = _prefilter_corpus(rng, args.texts, args.noise)
+    results = {}
+    for name, prefilter in (('不预筛选', None), ('预筛选', True)):
+        _normalize_unicode.cache_clear()
+        start = time.perf_counter()
+        pipeline_index = find_pipeline_numbers(corpus, log=_quiet, prefilter=prefilter)
+        results[name] = (pipeline_index, time.perf_counter() - start)
+
+    print(f"语料: {args.texts} 个文本, 噪声比例 {args.noise:.0%}")
+    for name, (pipeline_index, elapsed) in results.items():
+        print(f"{name:<8}{elapsed:>8.3f} s  管道号 {len(pipeline_index)}")
+    for stage, stage_name in TextPrefilter.STAGE_NAMES.items():
+        print(f"  {stage_name:<12}{results['预筛选'][0].stage_counts[stage]:>10}")
+
+    (plain, plain_time), (filtered, filtered_time) = results.values()
+    same = list(plain) == list(filtered) and all(
+        plain.count(n) == filtered.count(n) and plain.sources(n) == filtered.sources(n) for n in plain)
+    print(f"加速: {plain_time / filtered_time:.1f}x, 结果一致: {same}")
+
+
+def _variant_grammar(i):
+    """第i个模拟编号规则：以L<i>开头的介质代码-管道号-管径"""
+    return Grammar(f"规则{i}", rf"L{i}(?P<medium_code>[A-Z]{{1,3}})-(?P<pipe_number>\d{{4,6}})-"
+                              rf"(?P<nominal_diameter>\d{{2,3}})", example=f"L{i}CW-12345-100")
+
+
+def bench_grammars(args):
+    """多编号规则：合并扫描与逐规则扫描的吞吐量随规则数量的变化"""
+    rng = random.Random(args.seed)
+    noise = _prefilter_corpus(rng, args.texts, args.noise)
+    print(f"语料: {args.texts} 个文本 + 各规则管道号, 噪声比例 {args.noise:.0%}（不预筛选）")
+    print(f"{'规则数':>6}{'文本数':>10}{'管道号':>8}{'合并扫描(s)':>14}{'文本/秒':>12}{'逐规则(s)':>12}  结果")
+    for count in args.counts:
+        grammars = [DEFAULT_GRAMMAR] + [_variant_grammar(i) for i in range(1, count)]
+        recognizer = LineRecognizer(grammars)
+        corpus = noise + [f"L{i % count}CW-{i:05d}-100" for i in range(1, args.texts // 20)]
+
+        start = time.perf_counter()
+        pipeline_index = find_pipeline_numbers(corpus, log=_quiet, prefilter=None, recognizer=recognizer)
+        elapsed = time.perf_counter() - start
+
+        # 对照：每个规则单独扫描一遍
+        start = time.perf_counter()
+        separate = {}
+        for text in corpus:
+            text = normalize_text(text)
+            for grammar in grammars:
+                for match in re.finditer(grammar.pattern, text):
+                    separate.setdefault(match.group(0), grammar)
+        separate_time = time.perf_counter() - start
+
+        same = {n: pipeline_index.grammar(n) for n in pipeline_index} == separate
+        print(f"{count:>6}{len(corpus):>10}{len(pipeline_index):>8}{elapsed:>14.3f}"
+              f"{len(corpus) / elapsed:>12,.0f}{separate_time:>12.3f}  {'一致' if same else '不一致'}")
+
+
+def _legacy_clean_medium_codes(df):
+    """改进前的逐行清洗实现，作为一致性校验的参照"""
+    import pandas as pd
+
+    medium_codes = {}
+    for i, row in df.iterrows():
+        code = row.iloc[0]
+        name = row.iloc[1]
+        if pd.isna(code):
+            if not pd.isna(name) and "氢氧化钠溶液" in str(name):
+                code = "NA"
+            else:
+                continue
+        else:
+            code = str(code).strip()
+        if pd.isna(name):
+            continue
+        name = str(name).strip()
+        if code and name and code != 'nan' and name != 'nan':
+            medium_codes[code] = name
+    return medium_codes
+
+
+# 随机介质代码表的单元格取值
+_CODE_CELLS = (None, float('nan'), '', '  ', 'nan', 'NA', ' BRR ', 'CL', 'S18', 7, 12.5, 3.0, True)
+_NAME_CELLS = (None, float('nan'), '', 'nan', ' 锅炉水 ', '氯气', '32%氢氧化钠溶液', '氢氧化钠溶液 ', 42)
+
+
+def _random_code_frame(rng, rows):
+    import pandas as pd
+
+    data = [[rng.choice(_CODE_CELLS), rng.choice(_NAME_CELLS)] for _ in range(rows)]
+    return pd.DataFrame(data)
+
+
+def _write_code_workbook(path, rows, sheets):
+    """生成rows行、分布在sheets个工作表中的介质代码表"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    per_sheet = rows // sheets
+    for sheet in range(sheets):
+        worksheet = workbook.create_sheet(f"Sheet{sheet + 1}")
+        for n in range(sheet * per_sheet, (sheet + 1) * per_sheet):
+            if n % 50 == 0:
+                worksheet.append([None, f"{n % 40}%氢氧化钠溶液"])
+            else:
+                worksheet.append([f"C{n:05d}", f"介质{n}"])
+    workbook.save(path)
+
+
+def bench_codes(args):
+    """介质代码加载：逐行与按列清洗的一致性和耗时，以及sidecar缓存的加载耗时"""
+    import pandas as pd
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    for _ in range(args.samples):
+        df = _random_code_frame(rng, rng.randint(0, 40))
+        expected = _legacy_clean_medium_codes(df)
+        result = clean_medium_codes(df)
+        if list(result.items()) != list(expected.items()):
+            mismatches += 1
+    print(f"随机代码表一致性校验: {args.samples} 个表, 不一致 {mismatches} 个")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "codes.xlsx")
+        _write_code_workbook(path, args.rows, args.sheets)
+        print(f"代码表: {args.rows} 行, {args.sheets} 个工作表")
+
+        start = time.perf_counter()
+        sheets = pd.read_excel(path, header=None, sheet_name=None)
+        read_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = {}
+        for df in sheets.values():
+            expected.update(_legacy_clean_medium_codes(df))
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = {}
+        for df in sheets.values():
+            result.update(clean_medium_codes(df))
+        clean_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cold = load_medium_codes(path, sheet_name=None)
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        warm = load_medium_codes(path, sheet_name=None)
+        warm_time = time.perf_counter() - start
+
+        print(f"读取Excel:        {read_time:.3f} s")
+        print(f"逐行清洗:         {legacy_time:.3f} s")
+        print(f"按列清洗:         {clean_time:.3f} s（加速 {legacy_time / clean_time:.1f}x）")
+        print(f"首次加载:         {cold_time:.3f} s")
+        print(f"缓存加载:         {warm_time * 1000:.1f} ms")
+        print(f"结果一致: {result == expected and cold == expected and warm == expected}，"
+              f"介质代码 {len(expected)} 个")
+
+
+def _legacy_determine_phase(medium_name):
+    """改进前的相态判断实现，作为一致性校验的参照"""
+    gas_keywords = ['蒸汽', '气', '空气', '氢气', '氮气', '氧气', '二氧化碳', '天然气', '废气']
+    liquid_keywords = ['水', '油', '液', '溶液', '酸', '碱', '汽油', '柴油', '凝结']
+    for keyword in gas_keywords:
+        if keyword in medium_name:
+            return '气相'
+    for keyword in liquid_keywords:
+        if keyword in medium_name:
+            return '液相'
+    return '未知相态'
+
+
+def _random_medium_name(rng):
+    keywords = [keyword for rule in DEFAULT_PHASE_RULES['rules'] for keyword in rule['keywords']]
+    parts = [rng.choice(keywords) if rng.random() < 0.3 else rng.choice("盐氯钠二次汽粗精%36化\n ")
+             for _ in range(rng.randint(0, 6))]
+    return ''.join(parts)
+
+
+def bench_phase(args):
+    """相态判断：逐行关键词扫描与编译规则+按名称缓存的一致性和耗时"""
+    rng = random.Random(args.seed)
+    samples = [_random_medium_name(rng) for _ in range(args.samples)]
+    mismatches = sum(PhaseClassifier.from_dict(DEFAULT_PHASE_RULES).classify_name(name)
+                     != _legacy_determine_phase(name) for name in samples)
+    print(f"随机名称一致性校验: {args.samples} 个名称, 不一致 {mismatches} 个")
+
+    names = [_random_medium_name(rng) for _ in range(args.names)]
+    rows = [names[rng.randrange(args.names)] for _ in range(args.rows)]
+    codes = [f"C{rng.randrange(args.names)}" for _ in range(args.rows)]
+
+    start = time.perf_counter()
+    expected = [_legacy_determine_phase(name) for name in rows]
+    legacy_time = time.perf_counter() - start
+
+    classifier = PhaseClassifier.from_dict(DEFAULT_PHASE_RULES)
+    start = time.perf_counter()
+    phases = [classifier.classify(name, code) for name, code in zip(rows, codes)]
+    batch_time = time.perf_counter() - start
+
+    print(f"{args.rows} 行, {args.names} 个不同介质名称")
+    print(f"逐行判断: {legacy_time:.3f} s")
+    print(f"按名称缓存: {batch_time:.3f} s（加速 {legacy_time / batch_time:.1f}x）")
+    print(f"结果一致: {phases == expected}")
+
+
+def _legacy_parse_pipeline_index(pipeline_index, medium_codes):
+    """改进前的实现：每个管道号一个字典"""
+    pipeline_data = []
+    for pipeline_number in pipeline_index:
+        grammar = pipeline_index.grammar(pipeline_number)
+        fields = pipeline_index.fields(pipeline_number)
+        medium_code = fields.get('medium_code', '')
+        medium_name = medium_codes.get(medium_code, f"未知介质({medium_code})")
+        pipeline_data.append({
+            'pipeline_number': pipeline_number,
+            'display_number': grammar.format_display(fields),
+            'grammar': grammar.name,
+            'unit_number': fields.get('unit_number', ''),
+            'pipe_number': fields.get('pipe_number', ''),
+            'nominal_diameter': fields.get('nominal_diameter', ''),
+            'pipe_grade': fields.get('pipe_grade', ''),
+            'insulation_grade': fields.get('insulation_grade', ''),
+            'medium_code': medium_code,
+            'medium_name': medium_name,
+            'phase': DEFAULT_CLASSIFIER.classify(medium_name, medium_code),
+            'occurrences': pipeline_index.count(pipeline_number),
+            'sources': pipeline_index.sources(pipeline_number),
+        })
+    return pipeline_data
+
+
+def _legacy_build_report_frame(pipeline_data):
+    """改进前的实现：先复制为行列表再生成DataFrame"""
+    import pandas as pd
+
+    df_data = [[data['display_number'], data['nominal_diameter'], data['pipe_grade'],
+                data['insulation_grade'], data['medium_name'], data['phase'], data['occurrences'],
+                format_sources(data['sources']), data['grammar'], '', None] for data in pipeline_data]
+    df = pd.DataFrame(df_data, columns=REPORT_COLUMNS)
+    return df.sort_values('管道号').reset_index(drop=True)
+
+
+# 合成管道号使用的介质代码，最后两个不在代码表中
+_RECORD_MEDIUM_CODES = ['BRR', 'P', 'CWS', 'CWR', 'LS', 'N', 'IA', 'D', 'X9', 'Q7']
+
+
+def _record_index(lines):
+    """生成包含lines个不同管道号的索引，每个管道号出现1~3次"""
+    pipeline_index = PipelineIndex()
+    for n in range(lines):
+        code = _RECORD_MEDIUM_CODES[n % len(_RECORD_MEDIUM_CODES)]
+        number = (f"{4101 + n % 7}{code}-{n:06d}-{(50, 80, 100, 150, 200)[n % 5]}-"
+                  f"03CB{'MAB'[n % 3]}{n % 4}-{'HCP'[n % 3]}")
+        grammar, fields = DEFAULT_RECOGNIZER.match(number)
+        for i in range(n % 3 + 1):
+            pipeline_index.add(number, f"{n * 3 + i:X}", grammar, fields)
+    return pipeline_index
+
+
+def _measure_peak(func, *args):
+    """调用func，返回(结果, 耗时, tracemalloc峰值字节数)，结果在测量峰值时仍然存活"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_records(args):
+    """管道数据：每行字典+行列表与slots记录+按列生成DataFrame的内存峰值"""
+    medium_codes = {code: name for code, name in zip(
+        _RECORD_MEDIUM_CODES[:-2], ['原料气', '工艺物料', '循环水给水', '循环水回水', '低压蒸汽',
+                                    '氮气', '仪表空气', '导淋'])}
+    pipeline_index = _record_index(args.lines)
+
+    def legacy():
+        data = _legacy_parse_pipeline_index(pipeline_index, medium_codes)
+        return data, _legacy_build_report_frame(data)
+
+    def columnar():
+        data = parse_pipeline_index(pipeline_index, medium_codes)
+        return data, build_report_frame(data)
+
+    (_, expected), legacy_time, legacy_peak = _measure_peak(legacy)
+    (_, df), columnar_time, columnar_peak = _measure_peak(columnar)
+
+    print(f"{args.lines} 个管道号（解析 + 生成报告DataFrame）")
+    print(f"{'':<14}{'耗时(s)':>10}{'峰值(MB)':>12}")
+    print(f"{'字典+行列表':<14}{legacy_time:>10.3f}{legacy_peak / 2 ** 20:>12.1f}")
+    print(f"{'slots记录':<14}{columnar_time:>10.3f}{columnar_peak / 2 ** 20:>12.1f}")
+    print(f"峰值减少: {1 - columnar_peak / legacy_peak:.0%}")
+    print(f"结果一致: {df.equals(expected)}")
+
+
+def bench_stream(args):
+    """流式处理与逐阶段生成完整列表的对比：首个结果时间、总耗时和内存峰值"""
+    model_options = {'entity_count': args.entities, 'latency': args.latency, 'seed': args.seed}
+    medium_codes = {'BRR': '原料气', 'P': '工艺物料', 'CWS': '循环水给水', 'LS': '低压蒸汽'}
+
+    def staged(first):
+        records = list(iter_text_records("benchmark.dwg", 'fake', log=_quiet, **model_options))
+        pipeline_index = find_pipeline_numbers(records, log=_quiet)
+        data = parse_pipeline_index(pipeline_index, medium_codes)
+        first.append(time.perf_counter())
+        return data
+
+    def streamed(first, meter=None, drawing="benchmark.dwg", cache=None):
+        data = []
+        texts = iter_text_records(drawing, 'fake', cache, log=_quiet, **model_options)
+        for record in stream_pipeline_records(texts, medium_codes, meter=meter, log=_quiet):
+            if not data:
+                first.append(time.perf_counter())
+            data.append(record)
+        return data
+
+    print(f"实体数量: {args.entities}, COM延迟: {args.latency * 1e6:.1f} us")
+    print(f"{'方式':<10}{'首个结果(s)':>12}{'总耗时(s)':>12}{'峰值(MB)':>10}")
+    results = {}
+    for name, func in (('逐阶段', staged), ('流式', streamed)):
+        first = []
+        start = time.perf_counter()
+        data = func(first)
+        elapsed = time.perf_counter() - start
+        _, _, peak = _measure_peak(func, [])
+        results[name] = data
+        print(f"{name:<10}{first[0] - start:>12.3f}{elapsed:>12.3f}{peak / 2 ** 20:>10.1f}")
+    print(f"结果一致: {results['流式'] == results['逐阶段']}")
+
+    # 提取缓存默认启用：未命中时边提取边写入缓存文件，命中时逐条读取，峰值不随图纸大小增长
+    with tempfile.TemporaryDirectory() as tmp:
+        drawing = os.path.join(tmp, "benchmark.dwg")
+        with open(drawing, 'wb') as f:
+            f.write(b"benchmark")
+        cache_dirs = (os.path.join(tmp, f"cache{n}") for n in itertools.count())
+
+        def cache_miss(first):
+            return streamed(first, drawing=drawing, cache=ExtractionCache(next(cache_dirs), log=_quiet))
+
+        def cache_hit(first):
+            return streamed(first, drawing=drawing, cache=ExtractionCache(hit_dir, log=_quiet))
+
+        hit_dir = next(cache_dirs)
+        streamed([], drawing=drawing, cache=ExtractionCache(hit_dir, log=_quiet))
+        same = True
+        for name, func in (('缓存未命中', cache_miss), ('缓存命中', cache_hit)):
+            first = []
+            start = time.perf_counter()
+            data = func(first)
+            elapsed = time.perf_counter() - start
+            _, _, peak = _measure_peak(func, [])
+            same = same and data == results['流式']
+            print(f"{name:<10}{first[0] - start:>12.3f}{elapsed:>12.3f}{peak / 2 ** 20:>10.1f}")
+    print(f"缓存结果一致: {same}")
+
+    meter = StageMeter()
+    streamed([], meter)
+    print("流式各阶段:")
+    for name, inputs, items, elapsed in meter.stages():
+        rate = f"{inputs / elapsed:,.0f}/s" if elapsed > 0 else "-"
+        print(f"  {name:<6}输入 {inputs:>9}  产出 {items:>9}  耗时 {elapsed:>7.3f} s  吞吐 {rate}")
+
+
+def _legacy_create_excel_output(pipeline_data, output_path):
+    """改进前的实现：生成完整DataFrame，以普通模式写入后再设置表头样式"""
+    import pandas as pd
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    df = build_report_frame(pipeline_data)
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='管道数据表', index=False)
+        worksheet = writer.sheets['管道数据表']
+        for col, width in REPORT_COLUMN_WIDTHS.items():
+            worksheet.column_dimensions[col].width = width
+        for cell in worksheet[1]:
+            cell.font = Font(bold=True, color='FFFFFF')
+            cell.fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+    return len(df)
+
+
+def _synthetic_records(count, offset=0):
+    """直接生成count条管道记录（编号从offset开始，按编号倒序）"""
+    names = ['原料气', '工艺物料', '循环水给水', '低压蒸汽', '氮气']
+    phases = ['气相', '液相', '液相', '气相', '气相']
+    return [PipelineRecord(
+        f"{4101 + n % 7}P-{n:07d}-{(50, 100, 200)[n % 3]}-03CBMB1-H",
+        display_number=f"{4101 + n % 7}P-{n:07d}", grammar='标准', unit_number=str(4101 + n % 7),
+        pipe_number=f"{n:07d}", nominal_diameter=('50', '100', '200')[n % 3], pipe_grade='03CBMB1',
+        insulation_grade='H', medium_code='P', medium_name=names[n % 5], phase=phases[n % 5],
+        occurrences=n % 3 + 1, sources=[f"{n * 3 + i:X}" for i in range(n % 3 + 1)],
+    ) for n in range(offset + count - 1, offset - 1, -1)]
+
+
+def bench_excel(args):
+    """Excel报告：普通模式DataFrame写入与只写模式流式写入的耗时和内存峰值"""
+    print(f"{'行数':>10}{'原实现(s)':>12}{'峰值(MB)':>10}{'流式(s)':>10}{'峰值(MB)':>10}  结果")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.xlsx')
+        stream_path = os.path.join(tmp, 'stream.xlsx')
+        for rows in args.rows:
+            records = _synthetic_records(rows)
+            columns = []
+            for path, func in ((legacy_path, _legacy_create_excel_output),
+                               (stream_path, create_excel_output)):
+                if func is _legacy_create_excel_output and rows > args.legacy_max:
+                    columns += ["-", "-"]
+                    continue
+                start = time.perf_counter()
+                func(records, path)
+                columns.append(f"{time.perf_counter() - start:.2f}")
+                if not args.no_memory:
+                    _, _, peak = _measure_peak(func, records, path)
+                    columns.append(f"{peak / 2 ** 20:.1f}")
+                else:
+                    columns.append("-")
+
+            status = "-"
+            if rows <= args.legacy_max and rows <= args.compare_max:
+                import pandas as pd
+                same = pd.read_excel(legacy_path).equals(pd.read_excel(stream_path))
+                status = "一致" if same else "不一致"
+            print(f"{rows:>10}" + "".join(f"{c:>{w}}" for c, w in zip(columns, (12, 10, 10, 10)))
+                  + f"  {status}")
+
+
+def bench_formats(args):
+    """各导出格式的写出耗时和文件大小"""
+    formats = available_formats()
+    missing = [name for name in EXPORTERS if name not in formats]
+    if missing:
+        print(f"未安装依赖，跳过: {', '.join(missing)}")
+    print(f"{'行数':>10}{'格式':>10}{'耗时(s)':>10}{'行/秒':>12}{'大小(MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            records = _synthetic_records(rows)
+            for name in formats:
+                path = os.path.join(tmp, f"report{EXPORTERS[name].extension}")
+                start = time.perf_counter()
+                export_report(records, path, name)
+                elapsed = time.perf_counter() - start
+                print(f"{rows:>10}{name:>10}{elapsed:>10.2f}{rows / elapsed:>12,.0f}"
+                      f"{os.path.getsize(path) / 2 ** 20:>10.1f}")
+
+
+def bench_store(args):
+    """管道号数据库：批量写入吞吐量和各类查询的耗时"""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'lines.db')
+        with LineStore(path, log=_quiet) as store:
+            # 相邻图纸的管道号有一半重叠
+            start = time.perf_counter()
+            for d in range(args.drawings):
+                store.upsert_drawing(os.path.join(tmp, f"drawing{d:04d}.dwg"),
+                                     _synthetic_records(args.lines, d * args.lines // 2),
+                                     project=f"P{d % 4}")
+            elapsed = time.perf_counter() - start
+            drawings, rows, distinct = store.stats()
+            print(f"写入: {drawings} 张图纸, {rows} 行（{distinct} 个不同管道号）, 耗时 {elapsed:.1f} s, "
+                  f"{rows / elapsed:,.0f} 行/秒, 数据库 {os.path.getsize(path) / 2 ** 20:.0f} MB")
+
+            total = (args.drawings + 1) * args.lines // 2
+            queries = [
+                ('管道号', lambda: store.query(
+                    line=f"{4101 + (n := rng.randrange(total)) % 7}P-{n:07d}")),
+                ('管道号前缀', lambda: store.query(line=f"4101P-{rng.randrange(total // 1000):04d}*")),
+                ('装置号+介质', lambda: store.query(unit='4103', medium_code='P', limit=100)),
+                ('图纸', lambda: store.query(drawing=f"drawing{rng.randrange(args.drawings):04d}.dwg")),
+            ]
+            print(f"{'查询':<12}{'次数':>6}{'平均(ms)':>10}{'平均行数':>10}")
+            for name, query in queries:
+                found = 0
+                start = time.perf_counter()
+                for _ in range(args.queries):
+                    found += sum(1 for _ in query())
+                elapsed = time.perf_counter() - start
+                print(f"{name:<12}{args.queries:>6}{elapsed / args.queries * 1000:>10.2f}"
+                      f"{found / args.queries:>10.1f}")
+
+
+def bench_diff(args):
+    """版本对比：注入新增、删除和变更后，对比记录和读回报告文件的耗时，并校验变更数量"""
+    rng = random.Random(args.seed)
+    old = _synthetic_records(args.lines)
+    changed = int(args.lines * args.changes)
+    indexes = rng.sample(range(args.lines), changed * 3)
+    removed, modified = set(indexes[:changed]), indexes[changed:]
+    # 变更的记录复制后修改管径或管道等级，旧版本的记录保持不变
+    updates = {i: {'nominal_diameter': '999'} for i in modified[:changed]}
+    updates.update({i: {'pipe_grade': '09XXX'} for i in modified[changed:]})
+    new = [PipelineRecord(**{**record.to_dict(), **updates[i]}) if i in updates else record
+           for i, record in enumerate(old) if i not in removed]
+    new += _synthetic_records(changed, offset=args.lines)
+    expected = {'新增': changed, '删除': changed, '变更': len(modified)}
+
+    print(f"{'输入':<10}{'读取(s)':>10}{'对比(s)':>10}  结果")
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = [('记录', None)] + [(name, EXPORTERS[name].extension)
+                                     for name in args.formats if name in available_formats()]
+        for name, extension in inputs:
+            versions = [old, new]
+            elapsed = 0.0
+            if extension:
+                paths = [os.path.join(tmp, f"{version}{extension}") for version in ('old', 'new')]
+                for records, path in zip(versions, paths):
+                    export_report(records, path, name)
+                start = time.perf_counter()
+                versions = [load_report_records(path) for path in paths]
+                elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            _, stats = diff_records(*versions)
+            diff_elapsed = time.perf_counter() - start
+            status = "一致" if all(stats[kind] == count for kind, count in expected.items()) else \
+                f"不一致 {dict(stats)}"
+            print(f"{name:<10}{elapsed:>10.2f}{diff_elapsed:>10.3f}  {status}")
+
+
+def _revision_records(args, revision):
+    """模拟图纸的文本记录：revision为1时在第0版基础上修改、删除和新增部分实体"""
+    rng = random.Random(args.seed)
+    records = []
+    for i in range(args.entities):
+        if i % 10 == 0:
+            text = fake_pipeline_number(i // 10)
+        elif i % 10 == 1:
+            # 非ASCII说明文字不做预筛选，需要标准化和匹配
+            text = f"见图号 4101-PID-{i:06d}-A，管道 {fake_pipeline_number(i)[:12]}"
+        else:
+            text = f"{rng.choice(NOISE_TEXTS)} {i}"
+        records.append(TextRecord(text, 'AcDbText', f"{i + 0x100:X}", 'TXT', None))
+    if revision:
+        count = int(args.entities * args.changes)
+        changed = rng.sample(range(len(records)), count * 2)
+        for i in changed[:count]:
+            records[i] = records[i]._replace(text=records[i].text.replace('-03CBMB1-', '-03ABRC1-') + ' ')
+        removed = set(changed[count:])
+        records = [record for i, record in enumerate(records) if i not in removed]
+        records += [TextRecord(fake_pipeline_number(args.entities + i), 'AcDbText', f"N{i:X}", 'TXT', None)
+                    for i in range(count)]
+    return records
+
+
+def _index_snapshot(pipeline_index):
+    return [(number, pipeline_index.sources(number), pipeline_index.count(number),
+             pipeline_index.grammar(number), pipeline_index.fields(number)) for number in pipeline_index]
+
+
+def bench_incremental(args):
+    """增量匹配：完整匹配与复用上次结果的耗时对比，并校验管道号索引一致"""
+    revisions = [_revision_records(args, 0), _revision_records(args, 1)]
+    print(f"实体数量: {args.entities}, 修改/删除/新增比例: {args.changes:.1%}")
+    print(f"{'方式':<14}{'耗时(s)':>10}{'复用':>10}{'重新处理':>10}  结果")
+    with tempfile.TemporaryDirectory() as tmp:
+        def match(records, incremental):
+            pipeline_index = PipelineIndex()
+            state = MatchState("benchmark.dwg", DEFAULT_RECOGNIZER.cache_key(), tmp) if incremental else None
+            start = time.perf_counter()
+            for _ in iter_pipeline_numbers(records, pipeline_index, DEFAULT_RECOGNIZER,
+                                           DEFAULT_RECOGNIZER.prefilter, _quiet, state):
+                pass
+            elapsed = time.perf_counter() - start
+            if state is not None:
+                state.save()
+            return pipeline_index, elapsed, state
+
+        # 第0版建立匹配状态
+        match(revisions[0], True)
+        for name, records in (('未修改', revisions[0]), ('修改后', revisions[1])):
+            expected, full, _ = match(records, False)
+            pipeline_index, elapsed, state = match(records, True)
+            status = "一致" if _index_snapshot(pipeline_index) == _index_snapshot(expected) else "不一致"
+            print(f"{name + '完整匹配':<14}{full:>10.3f}{'-':>10}{'-':>10}")
+            print(f"{name + '增量匹配':<14}{elapsed:>10.3f}{state.reused:>10}{state.reprocessed:>10}  {status}")
+
+
+class _UncachedBlockTextCache(BlockTextCache):
+    """不缓存的块定义遍历：每个块参照（含嵌套）都重新遍历块定义"""
+
+    def records(self, name, depth=1):
+        records = super().records(name, depth)
+        self._records.clear()
+        return records
+
+
+def bench_blocks(args):
+    """嵌套块定义：每个块参照重新遍历与按块名缓存的COM往返次数和耗时"""
+    model_options = {'entity_count': args.entities, 'block_ratio': args.block_ratio,
+                     'block_count': args.block_count, 'definition_texts': args.definition_texts,
+                     'nested_ratio': args.nested_ratio, 'latency': args.latency, 'seed': args.seed}
+    model = FakeComModel(**model_options)
+    expected = model.expected_texts(args.depth)
+    print(f"实体数量: {args.entities}, 块定义: {args.block_count}, 嵌套层数: {args.depth}, "
+          f"COM延迟: {args.latency * 1e6:.1f} us")
+    print(f"{'方式':<10}{'文本数':>10}{'COM往返':>12}{'耗时(s)':>10}{'命中率':>10}  结果")
+    for name, cache_class in (('仅属性', None), ('逐个遍历', _UncachedBlockTextCache),
+                              ('按块名缓存', BlockTextCache)):
+        model.reset_stats()
+        doc = FakeAutocad(model).app.Documents.Open("benchmark.dwg")
+        block_cache = cache_class(doc.Blocks, args.depth) if cache_class else None
+        start = time.perf_counter()
+        texts = [record.text for record in
+                 iter_model_space_records(doc.ModelSpace, _quiet, block_cache=block_cache)]
+        elapsed = time.perf_counter() - start
+        lookups = block_cache.hits + block_cache.misses if block_cache else 0
+        hit_rate = f"{block_cache.hits / lookups:.1%}" if lookups else "-"
+        status = "-" if block_cache is None else ("一致" if texts == expected else "不一致")
+        print(f"{name:<10}{len(texts):>10}{model.calls:>12}{elapsed:>10.2f}{hit_rate:>10}  {status}")
+
+
+def _label_number(n):
+    """拼接基准使用的第n个管道号（编号不重复）"""
+    return (f"{4101 + n % 5}{_RECORD_MEDIUM_CODES[n % 8]}-{n:06d}-{(50, 80, 100, 150, 200)[n % 5]}-"
+            f"03CB{'MAB'[n % 3]}{n % 4}-{'HCP'[n % 3]}")
+
+
+def _label_records(sites, split_ratio, rng):
+    """生成拼接基准的文本记录，返回(记录列表, 拆分的管道号集合, 完整的管道号集合)
+
+    每个位点间隔200个单位，方向为0°、90°或任意角度。拆分位点的管道号在1~2个连字符处
+    拆成并排的TEXT；完整位点的管道号前后紧贴DN200和NOTE 3（不应被拼接）；其余位点为
+    相邻的非管道号文本。
+    """
+    records = []
+    split, complete = set(), set()
+    side = int(sites ** 0.5) + 1
+    for n in range(sites):
+        height = rng.choice((2.5, 3.0, 3.5))
+        rotation = rng.choice((0.0, 90.0, rng.uniform(0.0, 360.0)))
+        ux, uy = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+        kind = rng.random()
+        if kind < split_ratio:
+            number = _label_number(n)
+            hyphens = [i for i, c in enumerate(number) if c == '-']
+            cuts = sorted(rng.sample(hyphens, rng.choice((1, 2))))
+            pieces = [number[a:b] for a, b in zip([0] + cuts, cuts + [len(number)])]
+            split.add(number)
+        elif kind < split_ratio + 0.2:
+            number = _label_number(n)
+            pieces = ['DN200', number, 'NOTE 3']
+            complete.add(number)
+        else:
+            pieces = rng.sample(NOISE_TEXTS, 2)
+        along = 0.0
+        for piece in pieces:
+            perp = rng.uniform(-0.1, 0.1) * height
+            point = ((n % side) * 200.0 + along * ux - perp * uy, (n // side) * 200.0 + along * uy + perp * ux,
+                     0.0)
+            records.append(TextRecord(piece, 'AcDbText', f"{len(records) + 0x100:X}", 'TEXT', point,
+                                      rotation, height))
+            along += len(piece) * height * rng.uniform(0.6, 0.9) + rng.uniform(0.0, 0.8) * height
+    return records, split, complete
+
+
+def bench_labels(args):
+    """拆分标注拼接：找到的拆分管道号、误拼接和耗时随文本数量的变化"""
+    print(f"{'位点':>10}{'文本数':>10}{'拼接(s)':>10}{'us/文本':>10}{'拆分':>8}{'找到':>8}{'误拼接':>8}  结果")
+    for sites in args.sites:
+        rng = random.Random(args.seed)
+        records, split, complete = _label_records(sites, args.split_ratio, rng)
+
+        merger = LabelMerger(normalize=normalize_text, log=_quiet)
+        start = time.perf_counter()
+        merged_records = list(merger.merge(records))[len(records):]
+        elapsed = time.perf_counter() - start
+
+        data = list(stream_pipeline_records(records, {}, log=_quiet))
+        baseline = {record.pipeline_number for record in
+                    stream_pipeline_records(records, {}, log=_quiet, merge=False)}
+        merged = {record.pipeline_number for record in data if record.merged}
+        found = {record.pipeline_number for record in data}
+        false_merges = merged - split
+        ok = merged == split and found == split | complete and baseline == complete
+        print(f"{sites:>10}{len(records):>10}{elapsed:>10.3f}{elapsed / len(records) * 1e6:>10.2f}"
+              f"{len(split):>8}{len(merged):>8}{len(false_merges):>8}  {'一致' if ok else '不一致'}"
+              f"（拼接文本 {len(merged_records)}）")
+
+
+def _pipe_runs_dxf(path, runs, rng):
+    """生成管道长度基准的DXF文件，返回{管道号: 期望长度}
+
+    每条管道占一个1000单位的网格，由2~8段交替向右、向上的线段组成，随机写成一条
+    LWPOLYLINE或首尾相连的多个LINE；管道号标注在第一段上方，部分管道在最后一段旁重复
+    标注。另有不标注的管道、DIM图层上的尺寸线和远离管道的标注（长度应为空）。
+    """
+    expected = {}
+    side = int(runs ** 0.5) + 1
+    handle = 0x100
+
+    def next_handle():
+        nonlocal handle
+        handle += 1
+        return f"{handle:X}"
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("  0\nSECTION\n  2\nENTITIES\n")
+        for n in range(runs):
+            x, y = (n % side) * 1000.0, (n // side) * 1000.0
+            points = [(x, y)]
+            for k in range(rng.randint(2, 8)):
+                step = float(rng.randint(60, 120) if k == 0 else rng.randint(10, 60))
+                x, y = (x + step, y) if k % 2 == 0 else (x, y + step)
+                points.append((x, y))
+            if rng.random() < 0.5:
+                f.write(f"  0\nLWPOLYLINE\n  5\n{next_handle()}\n  8\nPIPE\n 90\n{len(points)}\n 70\n0\n")
+                f.write("".join(f" 10\n{px}\n 20\n{py}\n" for px, py in points))
+            else:
+                for (ax, ay), (bx, by) in zip(points, points[1:]):
+                    f.write(f"  0\nLINE\n  5\n{next_handle()}\n  8\nPIPE\n 10\n{ax}\n 20\n{ay}\n 30\n0.0\n"
+                            f" 11\n{bx}\n 21\n{by}\n 31\n0.0\n")
+            kind = rng.random()
+            if kind < 0.1:
+                continue  # 不标注的管道
+            number = _label_number(n)
+            x0, y0 = points[0]
+            length = sum(math.hypot(bx - ax, by - ay) for (ax, ay), (bx, by) in zip(points, points[1:]))
+            labels = [(x0 + 4.0, y0 + 1.0, 0.0)]
+            if kind < 0.3:
+                # 在最后一段旁再标注一次（同一管道号，总长度不变），竖直段上的标注旋转90°
+                (ax, ay), (bx, by) = points[-2], points[-1]
+                labels.append((ax - 1.0, ay, 90.0) if ax == bx else (ax + 4.0, ay + 1.0, 0.0))
+            elif kind < 0.35:
+                labels = [(x0 + 500.0, y0 + 900.0, 0.0)]  # 远离管道，不吸附
+                length = None
+            expected[number] = length
+            for lx, ly, rotation in labels:
+                f.write(f"  0\nTEXT\n  5\n{next_handle()}\n  8\nLINE-NO\n 10\n{lx}\n 20\n{ly}\n 30\n0.0\n"
+                        f" 40\n2.5\n 50\n{rotation}\n  1\n{number}\n")
+            # 尺寸线：不在管道图层，不应计入
+            f.write(f"  0\nLINE\n  5\n{next_handle()}\n  8\nDIM\n 10\n{x0}\n 20\n{y0 - 5.0}\n 30\n0.0\n"
+                    f" 11\n{x0 + 100.0}\n 21\n{y0 - 5.0}\n 31\n0.0\n")
+        f.write("  0\nENDSEC\n  0\nEOF\n")
+    return expected
+
+
+def bench_pipes(args):
+    """管道长度估算：合成DXF的读取、建索引、吸附和分配耗时及结果校验，模拟COM的管道线读取"""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pipes.dxf")
+        expected = _pipe_runs_dxf(path, args.runs, rng)
+        print(f"管道: {args.runs}, DXF大小: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        polylines = list(iter_dxf_polylines(path))
+        read_time = time.perf_counter() - start
+        tags = TagCollector(DEFAULT_RECOGNIZER.prefilter)
+        start = time.perf_counter()
+        data = list(stream_pipeline_records(tags.collect(iter_dxf_texts(path)), {}, log=_quiet, merge=False))
+        text_time = time.perf_counter() - start
+
+    messages = []
+    start = time.perf_counter()
+    measure_pipe_lengths(data, polylines, tags, log=messages.append)
+    measure_time = time.perf_counter() - start
+    print(f"读取管道线: {len(polylines)} 条多段线（{read_time:.2f} s）, 读取并匹配文本: {len(data)} 个管道号"
+          f"（{text_time:.2f} s）")
+    print(f"{messages[0]}，合计 {measure_time:.2f} s")
+
+    lengths = {record.pipeline_number: record.pipe_length for record in data}
+    wrong = [number for number, length in expected.items()
+             if (length is None) != (lengths.get(number) is None)
+             or (length is not None and abs(lengths[number] - length) > 1e-6)]
+    blank = sum(1 for length in expected.values() if length is None)
+    print(f"管道号: {len(expected)}, 应为空: {blank}, 结果不符: {len(wrong)}  "
+          f"{'一致' if not wrong and set(lengths) == set(expected) else '不一致'}")
+
+    model = FakeComModel(entity_count=args.com_entities, latency=args.latency, seed=args.seed)
+    backend = ComBackend(acad_factory=lambda: FakeAutocad(model), log=_quiet)
+    start = time.perf_counter()
+    com_polylines = list(backend.iter_polylines("benchmark.dwg"))
+    elapsed = time.perf_counter() - start
+    # 模拟的每条曲线长度均为1
+    curves = sum(1 for i in range(args.com_entities) if model.entity_type(i) in CURVE_TYPES)
+    total = sum(math.hypot(bx - ax, by - ay) for polyline in com_polylines
+                for (ax, ay), (bx, by) in zip(polyline.points, polyline.points[1:]))
+    ok = len(com_polylines) == curves and abs(total - curves) < 1e-6
+    print(f"模拟COM: 实体 {args.com_entities}, 管道线 {len(com_polylines)}, 总长度 {total:.1f}, "
+          f"COM往返 {model.calls}（{elapsed:.2f} s）  {'一致' if ok else '不一致'}")
+
+
+def _expected_starts(runs, max_documents, crash_at=0, idle_crash_at=0):
+    """按回收策略推算会话池应启动的次数"""
+    starts, documents, alive = 0, 0, False
+    for run in range(1, runs + 1):
+        if not alive or run == idle_crash_at:
+            starts, documents, alive = starts + 1, 0, True
+        documents += 1
+        if run == crash_at or documents >= max_documents:
+            alive = False
+    return starts
+
+
+def bench_sessions(args):
+    """CAD会话池：每次连接与复用会话的耗时、崩溃后的回收，以及经常驻服务提交任务"""
+    model = FakeComModel(entity_count=args.entities, latency=args.latency, seed=args.seed)
+    expected = [t for t in model.expected_texts() if t]
+    print(f"提取次数: {args.runs}, 实体数量: {args.entities}, 模拟启动耗时: {args.startup:.1f} s, "
+          f"每个会话最多 {args.max_documents} 张图纸, 第 {args.crash_at} 次提取时AutoCAD崩溃, "
+          f"第 {args.idle_crash_at} 次提取前空闲的AutoCAD退出")
+
+    start = time.perf_counter()
+    backend = ComBackend(acad_factory=lambda: FakeAutocad(model, args.startup), log=_quiet)
+    same = all(backend.extract_texts("benchmark.dwg") == expected for _ in range(args.runs))
+    direct_time = time.perf_counter() - start
+
+    applications = []
+
+    def factory():
+        applications.append(FakeAutocad(model, args.startup))
+        return applications[-1]
+
+    pool = SessionPool(factory, session='private', max_documents=args.max_documents, log=_quiet)
+    backend = ComBackend(session_pool=pool, log=_quiet)
+    failed = 0
+    start = time.perf_counter()
+    for run in range(1, args.runs + 1):
+        texts = []
+        if run == args.idle_crash_at:
+            applications[-1].app.running = False  # 空闲时AutoCAD退出，取用前的健康检查发现
+        try:
+            for record in backend.iter_records("benchmark.dwg"):
+                if run == args.crash_at and not texts:
+                    applications[-1].app.running = False  # 提取过程中AutoCAD退出，遍历中断，会话由池回收
+                if record.text:
+                    texts.append(record.text)
+        except OSError:
+            failed += 1
+            continue
+        same = same and texts == expected
+    pool_time = time.perf_counter() - start
+    pool.close()
+    starts = _expected_starts(args.runs, args.max_documents, args.crash_at, args.idle_crash_at)
+    crashed = 1 if 1 <= args.crash_at <= args.runs else 0
+    ok = same and pool.started == starts and failed == crashed and not any(
+        application.app.running for application in applications)
+
+    print(f"{'方式':<10}{'耗时(s)':>10}{'启动次数':>10}{'回收次数':>10}")
+    print(f"{'每次连接':<10}{direct_time:>10.2f}{args.runs:>10}{'-':>10}")
+    print(f"{'会话池':<10}{pool_time:>10.2f}{pool.started:>10}{pool.recycled:>10}  "
+          f"{'一致' if ok else '不一致'}（失败 {failed} 次，应启动 {starts} 次）")
+
+    # 常驻服务：客户端通过本机连接提交与命令行相同的参数
+    pool = SessionPool(lambda: FakeAutocad(model, args.startup), session='private',
+                       max_documents=args.max_documents, log=_quiet)
+    daemon = ExtractionDaemon(pool, connection_file=None, log=_quiet)
+    server = threading.Thread(target=daemon.serve_forever)
+    server.start()
+    client = DaemonClient(address=daemon.address, authkey=daemon.authkey)
+    # pid_extractor.main结束时print处理结果，不混入基准输出
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        codes = os.path.join(tmp, "code.xlsx")
+        _write_code_workbook(codes, 100, 1)
+        times = []
+        results = []
+        for run in range(args.daemon_runs):
+            output = os.path.join(tmp, f"lines{run}.csv")
+            start = time.perf_counter()
+            results.append(client.submit(["benchmark.dwg", "-c", codes, "-o", output, "--no-cache"],
+                                         log=_quiet))
+            times.append(time.perf_counter() - start)
+        reports = {open(os.path.join(tmp, f"lines{run}.csv"), encoding='utf-8-sig').read()
+                   for run in range(args.daemon_runs)}
+    status = client.status()
+    client.stop()
+    server.join()
+    ok = (all(not result['error'] and result['code'] == 0 for result in results) and len(reports) == 1
+          and status['pool']['started'] == _expected_starts(args.daemon_runs, args.max_documents))
+    print(f"常驻服务: {args.daemon_runs} 个任务, 首个 {times[0]:.2f} s, 其余平均 "
+          f"{sum(times[1:]) / max(len(times) - 1, 1):.2f} s, 启动 {status['pool']['started']} 次  "
+          f"{'一致' if ok else '不一致'}")
+
+
+def _legacy_log_ui(messages, events):
+    """原GUI日志：每条日志向Tk事件队列投递插入和滚动两个回调，文本框不限行数"""
+    widget = []
+    for message in messages:
+        events.put(lambda message=message: widget.append(
+            f"{datetime.now().strftime('%H:%M:%S')} - {message}\n"))
+        events.put(lambda: None)  # result_text.see(tk.END)
+    return widget
+
+
+def bench_logsink(args):
+    """GUI日志：每条投递回调与日志队列定时批量显示的界面回调次数、积压和保留行数"""
+    messages = [f"找到管道号: {fake_pipeline_number(n)}（介质{n % 50}）" for n in range(args.messages)]
+    print(f"日志条数: {args.messages}, 界面最多保留 {args.max_lines} 行, 刷新间隔 {args.tick * 1000:.0f} ms")
+    print(f"{'方式':<10}{'工作线程(s)':>12}{'界面回调':>10}{'最大积压':>10}{'保留行数':>10}  结果")
+
+    # 原实现：模拟Tk事件队列，界面线程逐个执行回调
+    events = queue.Queue()
+    backlog = 0
+
+    def run_events():
+        nonlocal backlog
+        while True:
+            callback = events.get()
+            if callback is None:
+                break
+            backlog = max(backlog, events.qsize())
+            callback()
+
+    ui = threading.Thread(target=run_events)
+    ui.start()
+    start = time.perf_counter()
+    widget = _legacy_log_ui(messages, events)
+    producer_time = time.perf_counter() - start
+    events.put(None)
+    ui.join()
+    print(f"{'逐条回调':<10}{producer_time:>12.3f}{2 * args.messages:>10}{backlog:>10}{len(widget):>10}  -")
+
+    # 日志队列：界面线程每tick秒取出一批
+    sink = LogSink(args.max_lines)
+    widget = deque(maxlen=args.max_lines)
+    done = threading.Event()
+    ticks = backlog = 0
+
+    def run_ticks():
+        nonlocal ticks, backlog
+        while True:
+            finished = done.is_set()
+            lines, dropped = sink.drain()
+            ticks += 1
+            backlog = max(backlog, len(lines))
+            if dropped:
+                widget.append(f"…… 省略 {dropped} 行")
+            widget.extend(lines)
+            if finished:
+                break
+            time.sleep(args.tick)
+
+    ui = threading.Thread(target=run_ticks)
+    ui.start()
+    start = time.perf_counter()
+    for message in messages:
+        sink(message)
+    producer_time = time.perf_counter() - start
+    done.set()
+    ui.join()
+    tail = [line.split(' - ', 1)[1] for line in widget if ' - ' in line][-args.max_lines // 2:]
+    ok = tail == messages[-len(tail):] and sink.received == args.messages and len(widget) <= args.max_lines
+    print(f"{'日志队列':<10}{producer_time:>12.3f}{ticks:>10}{backlog:>10}{len(widget):>10}  "
+          f"{'一致' if ok else '不一致'}（丢弃 {sink.dropped} 行）")
+
+    # 逐个管道号的匹配记录写入详细日志文件，控制台不输出
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "verbose.log")
+        records = [fake_pipeline_number(n) for n in range(args.messages // 10)]
+        records += [NOISE_TEXTS[n % len(NOISE_TEXTS)] for n in range(len(records))]
+        with verbose_log(path):
+            start = time.perf_counter()
+            pipeline_index = find_pipeline_numbers(records, log=_quiet)
+            elapsed = time.perf_counter() - start
+        with open(path, encoding='utf-8') as f:
+            matches = sum(1 for line in f if '找到管道号' in line)
+    ok = matches == len(pipeline_index)
+    print(f"详细日志: {len(records)} 个文本, 匹配记录 {matches} 行写入文件（{elapsed:.2f} s）  "
+          f"{'一致' if ok else '不一致'}")
+
+
+def _events_ok(events, total):
+    """进度事件：已完成数量不减少，最后一个事件完成全部数量"""
+    return (bool(events) and all(a.done <= b.done for a, b in zip(events, events[1:]))
+            and events[-1].done == events[-1].total == total)
+
+
+def bench_progress(args):
+    """提取进度与取消：进度事件的开销、预计剩余时间，取消后图纸是否关闭、会话能否复用"""
+    model_options = {'entity_count': args.entities, 'latency': args.latency, 'seed': args.seed}
+    model = FakeComModel(**model_options)
+    expected = [t for t in model.expected_texts() if t]
+    cancel_at = int(args.entities * args.cancel_at)
+    print(f"实体数量: {args.entities}, COM延迟: {args.latency * 1e6:.0f} us, 在第 {cancel_at} 个实体处取消")
+    print(f"{'方式':<10}{'耗时(s)':>10}{'进度事件':>10}  结果")
+
+    start = time.perf_counter()
+    same = ComBackend(acad_factory=lambda: FakeAutocad(model), log=_quiet).extract_texts("benchmark.dwg") == expected
+    base_time = time.perf_counter() - start
+    print(f"{'无进度':<10}{base_time:>10.2f}{'-':>10}  {'一致' if same else '不一致'}")
+
+    timeline = []
+    tracker = ProgressTracker(lambda event: timeline.append((time.perf_counter(), event)))
+    start = time.perf_counter()
+    texts = ComBackend(acad_factory=lambda: FakeAutocad(model), progress=tracker,
+                       log=_quiet).extract_texts("benchmark.dwg")
+    progress_time = time.perf_counter() - start
+    events = [event for _, event in timeline]
+    ok = texts == expected and _events_ok(events, args.entities)
+    print(f"{'进度事件':<10}{progress_time:>10.2f}{len(events):>10}  {'一致' if ok else '不一致'}"
+          f"（开销 {(progress_time / base_time - 1) * 100:+.1f}%）")
+
+    # 预计剩余时间与实际剩余时间
+    end = timeline[-1][0]
+    estimates = []
+    for fraction in (0.25, 0.5, 0.75):
+        found = next(((t, e) for t, e in timeline if e.fraction >= fraction and e.eta is not None), None)
+        if found:
+            estimates.append(f"{fraction:.0%}处 预计 {found[1].eta:.2f} s/实际 {end - found[0]:.2f} s")
+    if estimates:
+        print("剩余时间: " + ", ".join(estimates))
+
+    # 取消：提取停在指定实体，图纸照常关闭，会话归还后可直接复用
+    applications = []
+
+    def factory():
+        applications.append(FakeAutocad(model))
+        return applications[-1]
+
+    def cancel_when_reached(event):
+        if event.done >= cancel_at:
+            tracker.cancel()
+
+    pool = SessionPool(factory, session='private', log=_quiet)
+    tracker = ProgressTracker(cancel_when_reached, interval=0)
+    cancelled = False
+    start = time.perf_counter()
+    try:
+        for _ in ComBackend(session_pool=pool, progress=tracker, log=_quiet).iter_records("benchmark.dwg"):
+            pass
+    except ExtractionCancelled:
+        cancelled = True
+    cancel_time = time.perf_counter() - start
+    texts = ComBackend(session_pool=pool, log=_quiet).extract_texts("benchmark.dwg")
+    pool.close()
+    documents = applications[0].app.Documents.opened
+    ok = (cancelled and tracker.done == cancel_at and texts == expected and len(documents) == 2
+          and all(doc.closed for doc in documents) and pool.started == 1 and pool.recycled == 1)
+    print(f"{'取消':<10}{cancel_time:>10.2f}{'-':>10}  {'一致' if ok else '不一致'}"
+          f"（停在第 {tracker.done} 个实体, 关闭 {sum(doc.closed for doc in documents)}/{len(documents)} 张图纸, "
+          f"会话启动 {pool.started} 次）")
+
+    # DXF按字节数报告进度
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pipes.dxf")
+        _pipe_runs_dxf(path, args.dxf_runs, random.Random(args.seed))
+        events = []
+        tracker = ProgressTracker(events.append, interval=0)
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_dxf_texts(path, 1 << 16, progress=tracker))
+        elapsed = time.perf_counter() - start
+        ok = count == len(list(iter_dxf_texts(path))) and _events_ok(events, os.path.getsize(path))
+        print(f"{'DXF':<10}{elapsed:>10.2f}{len(events):>10}  {'一致' if ok else '不一致'}"
+              f"（{os.path.getsize(path) / 1e6:.1f} MB, {count} 个文本）")
+
+    # 分片并行：按完成的分片数报告进度
+    events = []
+    start = time.perf_counter()
+    records = extract_sharded("benchmark.dwg", 'fake', model_options, args.workers,
+                              max(1, args.entities // 8), log=_quiet, progress=ProgressTracker(events.append))
+    elapsed = time.perf_counter() - start
+    ok = [r.text for r in records if r.text] == expected and _events_ok(events, 8)
+    print(f"{'分片':<10}{elapsed:>10.2f}{len(events):>10}  {'一致' if ok else '不一致'}"
+          f"（{args.workers} 个进程, 8 个分片）")
+
+    # 常驻服务：进度事件发回客户端，客户端请求取消后服务继续接受任务，复用同一会话。
+    # 取消请求在服务端读取到第cancel_at个实体时发出，返回时任务已标记取消，与提取速度无关
+    daemon_model = FakeComModel(**model_options)
+    read_entity = daemon_model.entity
+
+    def cancel_at_entity(i):
+        if i == cancel_at and not requested:
+            requested.append(client.cancel())
+        return read_entity(i)
+
+    daemon_model.entity = cancel_at_entity
+    pool = SessionPool(lambda: FakeAutocad(daemon_model), session='private', log=_quiet)
+    daemon = ExtractionDaemon(pool, connection_file=None, log=_quiet)
+    server = threading.Thread(target=daemon.serve_forever)
+    server.start()
+    client = DaemonClient(address=daemon.address, authkey=daemon.authkey)
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        codes = os.path.join(tmp, "code.xlsx")
+        _write_code_workbook(codes, 100, 1)
+        argv = ["benchmark.dwg", "-c", codes, "-o", os.path.join(tmp, "lines.csv"), "--no-cache"]
+        requested = []
+        cancel_events = []
+        cancelled = client.submit(argv, log=_quiet, progress=cancel_events.append)
+        events = []
+        finished = client.submit(argv, log=_quiet, progress=events.append)
+    sessions = client.status()['pool']
+    client.stop()
+    server.join()
+    ok = (requested and requested[0]['cancelled'] and cancelled['cancelled']
+          and all(event.done <= cancel_at for event in cancel_events)
+          and not finished['cancelled'] and not finished['error'] and _events_ok(events, args.entities)
+          and sessions['started'] == 1 and sessions['reused'] == 1 and sessions['recycled'] == 0)
+    print(f"{'常驻服务':<10}{cancelled['elapsed']:>10.2f}{len(events):>10}  {'一致' if ok else '不一致'}"
+          f"（取消后下一个任务 {finished['elapsed']:.2f} s, 会话启动 {sessions['started']} 次, "
+          f"复用 {sessions['reused']} 次）")
+
+    # 命令行进度行
+    stream = io.StringIO()
+    line = ProgressLine(stream)
+    for event in events:
+        line(event)
+    print(f"命令行进度行: {len(events)} 次刷新, {stream.getvalue().count(chr(10))} 行, "
+          f"例: {format_progress(events[len(events) // 2])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="P&ID管道数据提取工具性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('traversal', help="ModelSpace逐实体遍历")
+    p.add_argument('--entities', type=int, default=200000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.0, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_traversal)
+
+    p = subparsers.add_parser('selection', help="过滤选择集 vs 逐实体遍历")
+    p.add_argument('--entities', type=int, default=400000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.00002, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--layers', nargs='*', help="图层过滤（支持通配符）")
+    p.add_argument('--min-height', type=float, help="最小文字高度")
+    p.add_argument('--no-metadata', action='store_true',
+                   help="只读取文本（默认与提取工具一致，同时读取句柄和可能是管道号的文本的位置）")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_selection)
+
+    p = subparsers.add_parser('shards', help="单图分片并行提取")
+    p.add_argument('--entities', type=int, default=200000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.00002, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--shard-size', type=int, default=25000, help="每个分片的实体数量")
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="工作进程数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_shards)
+
+    p = subparsers.add_parser('dedup', help="管道号查找去重的伸缩性")
+    p.add_argument('--counts', type=int, nargs='+', default=[10000, 20000, 40000, 80000],
+                   help="不同管道号的数量")
+    p.add_argument('--repeat', type=int, default=2, help="每个管道号出现的次数")
+    p.add_argument('--legacy-max', type=int, default=20000, help="对比原实现的最大管道号数量")
+    p.set_defaults(func=bench_dedup)
+
+    p = subparsers.add_parser('normalize', help="文本标准化一致性与耗时")
+    p.add_argument('--texts', type=int, default=1000000, help="语料文本数量")
+    p.add_argument('--distinct', type=float, default=0.3, help="不同文本所占比例")
+    p.add_argument('--samples', type=int, default=200000, help="随机一致性校验样本数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_normalize)
+
+    p = subparsers.add_parser('prefilter', help="管道号预筛选")
+    p.add_argument('--texts', type=int, default=1000000, help="语料文本数量")
+    p.add_argument('--noise', type=float, default=0.95, help="噪声文本比例")
+    p.add_argument('--samples', type=int, default=200000, help="随机一致性校验样本数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_prefilter)
+
+    p = subparsers.add_parser('grammars', help="多编号规则合并扫描")
+    p.add_argument('--counts', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="编号规则数量")
+    p.add_argument('--texts', type=int, default=200000, help="噪声语料文本数量")
+    p.add_argument('--noise', type=float, default=0.95, help="噪声文本比例")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_grammars)
+
+    p = subparsers.add_parser('codes', help="介质代码加载")
+    p.add_argument('--rows', type=int, default=50000, help="代码表行数")
+    p.add_argument('--sheets', type=int, default=4, help="工作表数量")
+    p.add_argument('--samples', type=int, default=2000, help="随机一致性校验的代码表数量")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_codes)
+
+    p = subparsers.add_parser('phase', help="相态判断")
+    p.add_argument('--rows', type=int, default=1000000, help="管道行数")
+    p.add_argument('--names', type=int, default=300, help="不同介质名称数量")
+    p.add_argument('--samples', type=int, default=100000, help="随机一致性校验样本数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_phase)
+
+    p = subparsers.add_parser('records', help="管道数据记录内存峰值")
+    p.add_argument('--lines', type=int, default=200000, help="不同管道号数量")
+    p.set_defaults(func=bench_records)
+
+    p = subparsers.add_parser('stream', help="流式处理")
+    p.add_argument('--entities', type=int, default=300000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.000002, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_stream)
+
+    p = subparsers.add_parser('excel', help="Excel报告写入")
+    p.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000], help="报告行数")
+    p.add_argument('--legacy-max', type=int, default=100000, help="对比原实现的最大行数")
+    p.add_argument('--compare-max', type=int, default=100000, help="读回比较内容的最大行数")
+    p.add_argument('--no-memory', action='store_true', help="不测量内存峰值（tracemalloc会再执行一遍）")
+    p.set_defaults(func=bench_excel)
+
+    p = subparsers.add_parser('formats', help="导出格式对比")
+    p.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000], help="报告行数")
+    p.set_defaults(func=bench_formats)
+
+    p = subparsers.add_parser('store', help="管道号数据库")
+    p.add_argument('--drawings', type=int, default=200, help="图纸数量")
+    p.add_argument('--lines', type=int, default=10000, help="每张图纸的管道号数量")
+    p.add_argument('--queries', type=int, default=200, help="每类查询的次数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_store)
+
+    p = subparsers.add_parser('diff', help="版本对比")
+    p.add_argument('--lines', type=int, default=100000, help="旧版本的管道号数量")
+    p.add_argument('--changes', type=float, default=0.05, help="新增、删除和各类变更所占比例")
+    p.add_argument('--formats', nargs='*', default=['csv', 'ndjson', 'xlsx'],
+                   help="同时测试读回的报告格式")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_diff)
+
+    p = subparsers.add_parser('incremental', help="增量匹配")
+    p.add_argument('--entities', type=int, default=500000, help="模拟文本实体数量")
+    p.add_argument('--changes', type=float, default=0.01, help="修改、删除和新增实体各占的比例")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_incremental)
+
+    p = subparsers.add_parser('blocks', help="嵌套块定义遍历")
+    p.add_argument('--entities', type=int, default=100000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.00002, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--block-ratio', type=float, default=0.03, help="块参照占实体的比例")
+    p.add_argument('--block-count', type=int, default=50, help="块定义数量")
+    p.add_argument('--definition-texts', type=int, default=4, help="每个块定义中的静态文本数量")
+    p.add_argument('--nested-ratio', type=float, default=0.5, help="块定义中嵌套块参照的比例")
+    p.add_argument('--depth', type=int, default=4, help="嵌套展开层数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_blocks)
+
+    p = subparsers.add_parser('labels', help="拆分标注拼接")
+    p.add_argument('--sites', type=int, nargs='+', default=[25000, 50000, 100000], help="标注位点数量")
+    p.add_argument('--split-ratio', type=float, default=0.1, help="拆分标注位点的比例")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_labels)
+
+    p = subparsers.add_parser('pipes', help="管道长度估算")
+    p.add_argument('--runs', type=int, default=50000, help="合成DXF中的管道数量")
+    p.add_argument('--com-entities', type=int, default=100000, help="模拟COM实体数量")
+    p.add_argument('--latency', type=float, default=0.0, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_pipes)
+
+    p = subparsers.add_parser('sessions', help="CAD会话池与常驻服务")
+    p.add_argument('--runs', type=int, default=12, help="提取次数")
+    p.add_argument('--entities', type=int, default=20000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.0, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--startup', type=float, default=1.0, help="模拟的AutoCAD启动耗时（秒）")
+    p.add_argument('--max-documents', type=int, default=5, help="每个会话处理多少张图纸后回收")
+    p.add_argument('--crash-at', type=int, default=7, help="第几次提取时模拟AutoCAD崩溃（0=不崩溃）")
+    p.add_argument('--idle-crash-at', type=int, default=10, help="第几次提取前模拟空闲的AutoCAD退出（0=不退出）")
+    p.add_argument('--daemon-runs', type=int, default=4, help="通过常驻服务提交的任务数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_sessions)
+
+    p = subparsers.add_parser('logsink', help="GUI日志队列")
+    p.add_argument('--messages', type=int, default=200000, help="日志条数")
+    p.add_argument('--max-lines', type=int, default=2000, help="界面最多保留的行数")
+    p.add_argument('--tick', type=float, default=0.05, help="界面刷新间隔（秒）")
+    p.set_defaults(func=bench_logsink)
+
+    p = subparsers.add_parser('progress', help="提取进度与取消")
+    p.add_argument('--entities', type=int, default=200000, help="模拟实体数量")
+    p.add_argument('--latency', type=float, default=0.0, help="每次COM往返的模拟延迟（秒）")
+    p.add_argument('--cancel-at', type=float, default=0.5, help="在完成多少比例时取消")
+    p.add_argument('--dxf-runs', type=int, default=20000, help="合成DXF中的管道数量")
+    p.add_argument('--workers', type=int, default=2, help="分片提取的工作进程数")
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_progress)
+
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取结果缓存
+按图纸文件内容哈希和后端配置缓存文本记录，未修改的图纸无需再次打开AutoCAD。
+条目为gzip压缩的JSON Lines（每行一条记录），读写都逐条进行，内存占用与图纸大小无关。
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from pid_backends import TextRecord
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本，提取逻辑或记录结构变化时递增，旧缓存自动失效
+CACHE_VERSION = 4
+
+# 默认缓存目录和容量上限
+DEFAULT_CACHE_DIR = Path.home() / ".pid_extractor_cache"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+# 计算文件哈希时的读取块大小
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _file_lock(path):
+    """进程间互斥的文件锁（Windows为msvcrt.locking，其余平台为fcntl.flock）"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK重试10次（约10秒）后仍未取得时抛出，继续等待
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ExtractionCache:
+    """持久化的提取结果缓存
+
+    缓存键 = 文件内容哈希 + 后端配置（ExtractionBackend.cache_key）+ 缓存格式版本。
+    每个条目保存为一个gzip压缩的JSON Lines文件，index.json记录大小和最近使用时间，
+    总大小超过max_bytes时按最近最少使用（LRU）淘汰。
+
+    多个进程（如批量模式的工作进程）可以同时使用同一缓存目录：修改索引时持有index.lock，
+    重新读取index.json后在最新内容上修改再写回，不会覆盖其他进程写入的条目。
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, log=None):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.log = log or logger.info
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.cache_dir / self.INDEX_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        # 先写临时文件再替换，避免中断时损坏索引
+        tmp_path = self.cache_dir / f"{self.INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_dir / self.INDEX_FILE)
+
+    @contextmanager
+    def _update_index(self):
+        """加锁读取最新的索引，with块内修改self._index，退出时写回"""
+        with _file_lock(self.cache_dir / self.LOCK_FILE):
+            self._index = self._load_index()
+            yield self._index
+            self._save_index()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.json.gz"
+
+    def make_key(self, digest, backend_key):
+        raw = f"{CACHE_VERSION}|{backend_key}|{digest}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, drawing_path, backend_key, digest=None):
+        """查找缓存，命中时返回TextRecord列表，否则返回None"""
+        records = self.iter_records(drawing_path, backend_key, digest)
+        return None if records is None else list(records)
+
+    def iter_records(self, drawing_path, backend_key, digest=None):
+        """查找缓存，命中时返回逐条读取TextRecord的迭代器，否则返回None"""
+        digest = digest or file_digest(drawing_path)
+        key = self.make_key(digest, backend_key)
+        entry_path = self._entry_path(key)
+        f = _open_entry(entry_path)
+        if f is None:
+            self.misses += 1
+            self.log(f"缓存未命中: {os.path.basename(drawing_path)}")
+            return None
+
+        with self._update_index() as index:
+            entry = index.setdefault(key, {'size': entry_path.stat().st_size})
+            entry['path'] = os.path.abspath(drawing_path)
+            entry['last_used'] = time.time()
+            count = entry.get('records')
+        self.hits += 1
+        self.log(f"缓存命中: {os.path.basename(drawing_path)}"
+                 + (f"（{count} 条文本记录）" if count is not None else ""))
+        return _read_entry(f)
+
+    def put(self, drawing_path, backend_key, records, digest=None):
+        """保存提取结果，并在超出容量时淘汰最久未使用的条目"""
+        with self.writer(drawing_path, backend_key, digest) as write:
+            for record in records:
+                write(record)
+
+    @contextmanager
+    def writer(self, drawing_path, backend_key, digest=None):
+        """逐条写入提取结果：with块内调用write(record)，正常退出时才写入缓存并淘汰超出容量的条目
+
+        记录先写入临时文件，with块内出错（包括提取中途停止）时删除临时文件，不留下不完整的条目。
+        """
+        digest = digest or file_digest(drawing_path)
+        key = self.make_key(digest, backend_key)
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        count = 0
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                dumps = json.dumps
+
+                def write(record):
+                    nonlocal count
+                    f.write(dumps(list(record), ensure_ascii=False))
+                    f.write('\n')
+                    count += 1
+
+                yield write
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+
+        with self._update_index() as index:
+            index[key] = {
+                'size': entry_path.stat().st_size,
+                'path': os.path.abspath(drawing_path),
+                'last_used': time.time(),
+                'records': count,
+            }
+            self._evict()
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]['size']
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        self._index.pop(key, None)
+        try:
+            self._entry_path(key).unlink()
+        except OSError:
+            pass
+
+    def invalidate(self, drawing_path):
+        """删除某个图纸的全部缓存条目（所有后端配置），返回删除数量"""
+        abs_path = os.path.abspath(drawing_path)
+        with self._update_index() as index:
+            keys = [key for key, entry in index.items() if entry.get('path') == abs_path]
+            for key in keys:
+                self._remove(key)
+        self.log(f"已清除 {len(keys)} 个缓存条目: {abs_path}")
+        return len(keys)
+
+    def clear(self):
+        """清空缓存目录"""
+        with self._update_index() as index:
+            for entry_path in self.cache_dir.glob("*.json.gz"):
+                try:
+                    entry_path.unlink()
+                except OSError:
+                    pass
+            index.clear()
+        self.log(f"已清空缓存: {self.cache_dir}")
+
+    def total_bytes(self):
+        """缓存占用的字节数（按最新的索引计算）"""
+        self._index = self._load_index()
+        return sum(entry['size'] for entry in self._index.values())
+
+    def log_stats(self):
+        """输出命中/未命中统计"""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        self.log(f"缓存统计: 命中 {self.hits}, 未命中 {self.misses}, 命中率 {hit_rate:.1f}%, "
+                 f"淘汰 {self.evictions}, 占用 {self.total_bytes() / 1024 / 1024:.1f} MB")
+
+
+def _open_entry(path):
+    """打开缓存条目，文件不存在或不是gzip格式时返回None"""
+    try:
+        f = gzip.open(path, 'rb')
+    except OSError:
+        return None
+    try:
+        f.peek(1)
+    except (OSError, EOFError):
+        f.close()
+        return None
+    return io.TextIOWrapper(f, encoding='utf-8')
+
+
+def _read_entry(f):
+    """逐行读取缓存条目中的TextRecord，读完后关闭文件"""
+    with f:
+        for line in f:
+            text, entity_type, handle, layer, point, rotation, height = json.loads(line)
+            yield TextRecord(text, entity_type, handle, layer,
+                             tuple(point) if point is not None else None, rotation, height)
+
+
+def extract_records(extractor, drawing_path, cache=None, extract=None):
+    """通过提取后端获取文本记录，指定cache时优先使用缓存
+
+    extract为实际执行提取的无参函数（如分片并行提取），默认调用extractor.iter_records。
+    """
+    if extract is None:
+        extract = lambda: list(extractor.iter_records(drawing_path))
+    if cache is None:
+        return extract()
+
+    digest = file_digest(drawing_path)
+    records = cache.get(drawing_path, extractor.cache_key(), digest)
+    if records is None:
+        records = extract()
+        cache.put(drawing_path, extractor.cache_key(), records, digest)
+    return records
+
+
+def stream_records(extractor, drawing_path, cache=None):
+    """逐条产出文本记录，与CAD遍历同步进行
+
+    指定cache时命中则从缓存逐条读取；未命中时边提取边写入缓存的临时文件，全部提取完成后
+    才放入缓存（中途停止不会写入不完整的结果），两种情况都不在内存中保留全部记录。
+    """
+    if cache is None:
+        yield from extractor.iter_records(drawing_path)
+        return
+
+    digest = file_digest(drawing_path)
+    records = cache.iter_records(drawing_path, extractor.cache_key(), digest)
+    if records is not None:
+        yield from records
+        return
+
+    with cache.writer(drawing_path, extractor.cache_key(), digest) as write:
+        for record in extractor.iter_records(drawing_path):
+            write(record)
+            yield record
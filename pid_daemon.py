@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+P&ID管道数据提取工具 - 常驻提取服务
+在后台保持CAD会话（见pid_session），命令行和GUI通过本机连接提交提取任务，不必每次启动AutoCAD。
+任务按提交顺序在同一个工作线程中执行（COM对象只能在创建它的线程中使用），执行期间的日志
+和进度事件实时发回提交任务的客户端，客户端可以请求取消正在执行的任务。
+
+用法:
+    python pid_daemon.py serve --max-documents 50
+    python pid_extractor.py drawing.dwg -c code.xlsx -o lines.xlsx --daemon
+    python pid_daemon.py status
+    python pid_daemon.py cancel
+    python pid_daemon.py stop
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+from pid_extractor import main as run_extraction
+from pid_progress import ProgressTracker, format_progress
+from pid_session import DEFAULT_MAX_DOCUMENTS, SessionPool
+
+logger = logging.getLogger(__name__)
+
+# 连接信息文件：服务监听的地址和认证密钥（只有当前用户可读）
+CONNECTION_FILE = Path.home() / ".pid_extractor_daemon.json"
+
+DEFAULT_HOST = '127.0.0.1'
+
+
+class DaemonUnavailable(ConnectionError):
+    """没有运行中的提取服务"""
+
+
+class _ForwardHandler(logging.Handler):
+    """把工作线程中INFO及以上的日志发给提交任务的客户端"""
+
+    def __init__(self, send, thread_id):
+        super().__init__(logging.INFO)
+        self.send = send
+        self.thread_id = thread_id
+
+    def emit(self, record):
+        if record.thread != self.thread_id:
+            return
+        self.send(('log', record.levelno, record.getMessage()))
+
+
+def write_connection_file(path, address, authkey):
+    """写入连接信息文件（权限0600）"""
+    info = {'host': address[0], 'port': address[1], 'authkey': authkey.hex(), 'pid': os.getpid()}
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+
+
+def read_connection_file(path=CONNECTION_FILE):
+    """读取连接信息文件，返回(地址, 认证密钥, 进程号)，文件不存在时抛出DaemonUnavailable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except FileNotFoundError:
+        raise DaemonUnavailable("提取服务未启动（python pid_daemon.py serve）")
+    return (info['host'], info['port']), bytes.fromhex(info['authkey']), info.get('pid')
+
+
+class ExtractionDaemon:
+    """常驻提取服务
+
+    每个请求是一个字典：op为extract（argv为pid_extractor.py的命令行参数，cwd为客户端的
+    工作目录）、cancel、status或stop。extract任务放入队列由工作线程依次执行，执行期间发送
+    ('log', 级别, 消息)和('progress', ProgressEvent)，结束时发送('result', 统计)；
+    cancel取消正在执行的任务（图纸照常关闭）；stop在已提交的任务完成后停止服务。
+
+    pool为SessionPool，默认连接已运行的AutoCAD；address的端口为0时由系统分配，
+    connection_file为None时不写连接信息文件。
+    """
+
+    def __init__(self, pool=None, address=(DEFAULT_HOST, 0), connection_file=CONNECTION_FILE, log=None):
+        self.pool = pool or SessionPool()
+        self.log = log or logger.info
+        self.authkey = secrets.token_bytes(16)
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.connection_file = connection_file
+        self.jobs = queue.Queue()
+        self.completed = 0
+        self.started = time.time()
+        self._progress = None  # 正在执行的任务的ProgressTracker
+        self._worker = threading.Thread(target=self._work, name="pid-daemon-worker", daemon=True)
+
+    def serve_forever(self):
+        """接受请求直到收到stop"""
+        if self.connection_file:
+            write_connection_file(self.connection_file, self.address, self.authkey)
+        self._worker.start()
+        self.log(f"提取服务已启动: {self.address[0]}:{self.address[1]}")
+        try:
+            while self._handle_next():
+                pass
+        finally:
+            self.jobs.put(None)
+            self._worker.join()
+            self.listener.close()
+            if self.connection_file:
+                self._remove_connection_file()
+            self.log("提取服务已停止")
+
+    def _handle_next(self):
+        """处理一个连接，收到stop时返回False"""
+        try:
+            conn = self.listener.accept()
+        except AuthenticationError:
+            logger.warning("拒绝了认证失败的连接")
+            return True
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            return True
+        op = request.get('op')
+        if op == 'extract':
+            self.log(f"收到提取任务（排队 {self.jobs.qsize()}）: {' '.join(request.get('argv', []))}")
+            self.jobs.put((request, conn))  # 连接交给工作线程，任务结束时关闭
+            return True
+        try:
+            if op == 'status':
+                conn.send(('result', self.status()))
+            elif op == 'cancel':
+                progress = self._progress
+                if progress is not None:
+                    progress.cancel()
+                    self.log("已请求取消当前提取任务")
+                conn.send(('result', {'cancelled': progress is not None}))
+            elif op == 'stop':
+                conn.send(('result', {'stopping': True, 'queued': self.jobs.qsize()}))
+                return False
+            else:
+                conn.send(('error', f"未知的请求: {op}"))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        return True
+
+    def _work(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            request, conn = item
+            try:
+                self._run(request, conn)
+            finally:
+                conn.close()
+        # 会话在工作线程中创建，也在工作线程中回收
+        self.pool.close()
+        self.pool.log_stats(self.log)
+
+    def _run(self, request, conn):
+        def send(message):
+            try:
+                conn.send(message)
+            except OSError:
+                pass  # 客户端已断开，任务继续执行
+
+        handler = _ForwardHandler(send, threading.get_ident())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        progress = ProgressTracker(lambda event: send(('progress', event)))
+        self._progress = progress
+        cwd = os.getcwd()
+        error = None
+        code = 1
+        start = time.perf_counter()
+        try:
+            os.chdir(request.get('cwd') or cwd)
+            code = run_extraction(request['argv'], session_pool=self.pool, progress=progress)
+        except SystemExit as e:
+            error = f"参数错误（退出码 {e.code}）"
+        except Exception as e:
+            logger.exception("提取任务失败")
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._progress = None
+            os.chdir(cwd)
+            root.removeHandler(handler)
+        elapsed = time.perf_counter() - start
+        self.completed += 1
+        self.log(f"提取任务{'已取消' if progress.cancelled else '完成'}（{elapsed:.2f} s）")
+        send(('result', {'error': error, 'code': code, 'elapsed': elapsed,
+                         'cancelled': progress.cancelled}))
+
+    def status(self):
+        """服务状态：进程号、运行时间、已完成和排队的任务数、当前任务的进度、会话池统计"""
+        progress = self._progress
+        return {'pid': os.getpid(), 'uptime': time.time() - self.started, 'completed': self.completed,
+                'queued': self.jobs.qsize(), 'progress': progress.last_event if progress else None,
+                'pool': self.pool.stats()}
+
+    def _remove_connection_file(self):
+        try:
+            if read_connection_file(self.connection_file)[2] == os.getpid():
+                os.remove(self.connection_file)
+        except (DaemonUnavailable, OSError, ValueError, KeyError):
+            pass
+
+
+class DaemonClient:
+    """提取服务客户端，address和authkey为None时从连接信息文件读取"""
+
+    def __init__(self, connection_file=CONNECTION_FILE, address=None, authkey=None):
+        self.connection_file = connection_file
+        self.address = address
+        self.authkey = authkey
+
+    def _connect(self):
+        address, authkey = self.address, self.authkey
+        if address is None:
+            address, authkey, _ = read_connection_file(self.connection_file)
+        try:
+            return Client(tuple(address), authkey=authkey)
+        except OSError as e:
+            raise DaemonUnavailable(f"无法连接提取服务: {e}")
+
+    def _request(self, request, log=None, progress=None):
+        with self._connect() as conn:
+            conn.send(request)
+            while True:
+                try:
+                    kind, *payload = conn.recv()
+                except (EOFError, OSError):
+                    raise DaemonUnavailable("提取服务连接中断")
+                if kind == 'log':
+                    levelno, message = payload
+                    if log is not None:
+                        log(message)
+                    else:
+                        logger.log(levelno, message)
+                elif kind == 'progress':
+                    if progress is not None:
+                        progress(payload[0])
+                elif kind == 'result':
+                    return payload[0]
+                else:
+                    raise RuntimeError(payload[0])
+
+    def available(self):
+        """是否有运行中的提取服务"""
+        try:
+            self.status()
+            return True
+        except DaemonUnavailable:
+            return False
+
+    def submit(self, argv, cwd=None, log=None, progress=None):
+        """提交提取任务并等待完成，返回{'error', 'code', 'elapsed', 'cancelled'}
+
+        argv为pid_extractor.py的命令行参数，相对路径按cwd（默认当前目录）解析；
+        log为None时按原级别写入本进程的日志，否则以消息字符串调用log；
+        progress为接收进度事件（pid_progress.ProgressEvent）的回调。
+        code为pid_extractor.main的退出码（成功为0，出错或取消为1），error为未处理的异常或参数错误。
+        """
+        return self._request({'op': 'extract', 'argv': list(argv), 'cwd': cwd or os.getcwd()}, log, progress)
+
+    def cancel(self):
+        """取消服务正在执行的提取任务，返回{'cancelled': 是否有正在执行的任务}"""
+        return self._request({'op': 'cancel'})
+
+    def status(self):
+        return self._request({'op': 'status'})
+
+    def stop(self):
+        return self._request({'op': 'stop'})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="P&ID管道数据提取工具 - 常驻提取服务")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    p = subparsers.add_parser('serve', help="启动服务")
+    p.add_argument('--session', choices=['shared', 'private'], default='shared',
+                   help="shared=连接已运行的AutoCAD（没有时启动），private=启动独立的AutoCAD实例")
+    p.add_argument('--max-documents', type=int, default=DEFAULT_MAX_DOCUMENTS,
+                   help=f"每个CAD会话处理多少张图纸后回收（默认{DEFAULT_MAX_DOCUMENTS}）")
+    p.add_argument('--port', type=int, default=0, help="监听端口（默认由系统分配）")
+    subparsers.add_parser('status', help="查看服务状态")
+    subparsers.add_parser('cancel', help="取消正在执行的提取任务")
+    subparsers.add_parser('stop', help="完成已提交的任务后停止服务")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'serve':
+        pool = SessionPool(session=args.session, max_documents=args.max_documents)
+        ExtractionDaemon(pool, (DEFAULT_HOST, args.port)).serve_forever()
+        return 0
+
+    client = DaemonClient()
+    try:
+        if args.command == 'status':
+            status = client.status()
+            pool = status['pool']
+            print(f"进程: {status['pid']}, 运行 {status['uptime'] / 60:.1f} 分钟, "
+                  f"已完成 {status['completed']} 个任务, 排队 {status['queued']} 个")
+            if status['progress'] is not None:
+                print(f"当前任务: {format_progress(status['progress'])}")
+            print(f"CAD会话（{pool['session']}）: 空闲 {pool['idle']}, 使用中 {pool['busy']}, "
+                  f"启动 {pool['started']} 次, 复用 {pool['reused']} 次, 回收 {pool['recycled']} 次")
+        elif args.command == 'cancel':
+            result = client.cancel()
+            print("已请求取消当前提取任务" if result['cancelled'] else "没有正在执行的提取任务")
+        else:
+            result = client.stop()
+            print(f"提取服务将在 {result['queued']} 个排队任务完成后停止")
+    except DaemonUnavailable as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
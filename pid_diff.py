@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图纸版本对比
+比较两次提取结果（报告文件或图纸），按报告管道号做哈希连接，输出新增、删除和
+属性变更（管径、管道等级、保温等级、介质名称、相态）的管道号
+
+用法:
+    python pid_diff.py rev_a.xlsx rev_b.xlsx -o diff.xlsx
+    python pid_diff.py rev_a.dwg rev_b.dwg -c code.xlsx -o diff.csv
+"""
+
+import argparse
+import json
+import logging
+import operator
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+
+import pandas as pd
+
+from pid_cache import DEFAULT_CACHE_DIR, ExtractionCache
+from pid_export import EXPORTERS, get_exporter, resolve_format
+from pid_extractor import (get_resource_path, iter_text_records, load_medium_codes,
+                           stream_pipeline_records)
+from pid_grammar import load_recognizer
+from pid_phase import load_classifier
+from pid_records import PipelineRecord
+
+logger = logging.getLogger(__name__)
+
+# 图纸扩展名，其余文件按报告读取
+DRAWING_EXTENSIONS = ('.dwg', '.dxf')
+
+# 比较的属性：记录字段 -> 报告列名
+DIFF_FIELDS = {
+    'nominal_diameter': '管径',
+    'pipe_grade': '管道等级',
+    'insulation_grade': '保温等级',
+    'medium_name': '介质名称',
+    'phase': '相态',
+}
+
+# 报告列名 -> 记录字段（读取报告时使用，管道号和比较的属性为必需列）
+_REPORT_FIELDS = {'管道号': 'display_number', **{column: field for field, column in DIFF_FIELDS.items()},
+                  '编号规则': 'grammar', '出现次数': 'occurrences', '来源实体': 'sources'}
+_REQUIRED_COLUMNS = ['管道号', *DIFF_FIELDS.values()]
+
+# 变更类型及其在报告中的顺序
+CHANGE_KINDS = ('新增', '删除', '变更')
+
+# 变更报告列和列宽
+DIFF_COLUMNS = ['变更类型', '管道号', '变更字段'] + [f"{prefix}{column}" for column in DIFF_FIELDS.values()
+                                              for prefix in ('原', '新')]
+DIFF_COLUMN_WIDTHS = {'A': 10, 'B': 20, 'C': 24, 'D': 8, 'E': 8, 'F': 15, 'G': 15, 'H': 10, 'I': 10,
+                      'J': 15, 'K': 15, 'L': 8, 'M': 8}
+
+# 一个管道号的变更：kind为变更类型，fields为变化的字段，old/new为两个版本中的记录列表
+LineChange = namedtuple('LineChange', ['kind', 'display_number', 'fields', 'old', 'new'])
+
+
+def _frame_records(df, path):
+    """报告DataFrame（各列均为字符串）转换为管道记录"""
+    missing = [column for column in _REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"报告缺少列: {', '.join(missing)}（{path}）")
+    columns = [column for column in _REPORT_FIELDS if column in df.columns]
+    records = []
+    for values in zip(*(df[column].tolist() for column in columns)):
+        fields = {_REPORT_FIELDS[column]: value for column, value in zip(columns, values)}
+        if not fields['display_number']:
+            continue
+        fields['occurrences'] = int(fields['occurrences']) if fields.get('occurrences') else 1
+        fields['sources'] = fields['sources'].split(', ') if fields.get('sources') else []
+        records.append(PipelineRecord('', **fields))
+    return records
+
+
+def load_report_records(path):
+    """读取报告文件（xlsx/csv/ndjson/parquet，列同pid_extractor的报告）中的管道记录"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        df = pd.DataFrame(rows, dtype=object).fillna('').astype(str)
+    elif extension == '.csv':
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    elif extension == '.parquet':
+        df = pd.read_parquet(path).fillna('').astype(str)
+    else:
+        df = pd.read_excel(path, sheet_name=0, dtype=str, keep_default_na=False)
+    return _frame_records(df, path)
+
+
+def extract_drawing_records(drawing_path, medium_codes, backend='auto', cache=None, recognizer=None,
+                            classifier=None):
+    """提取并解析一张图纸的管道记录"""
+    texts = iter_text_records(drawing_path, backend, cache)
+    return list(stream_pipeline_records(texts, medium_codes, recognizer=recognizer,
+                                        classifier=classifier))
+
+
+def _group(records):
+    """按报告管道号分组（哈希表），同一管道号可能对应多条记录（如变径管段）"""
+    groups = {}
+    for record in records:
+        group = groups.get(record.display_number)
+        if group is None:
+            groups[record.display_number] = [record]
+        else:
+            group.append(record)
+    return groups
+
+
+# 一条记录全部比较属性的取值
+_diff_values = operator.attrgetter(*DIFF_FIELDS)
+
+
+def field_value(records, field):
+    """一组记录的字段值，多条记录的不同取值以/连接"""
+    if len(records) == 1:
+        return getattr(records[0], field)
+    return '/'.join(sorted({getattr(record, field) for record in records}))
+
+
+def diff_records(old_records, new_records):
+    """比较两个版本的管道记录，返回(变更列表, 各变更类型和各字段的变更数量)
+
+    两个版本各按报告管道号建一次哈希表后逐个查找，耗时与管道号数量成线性关系。
+    变更列表按变更类型（新增、删除、变更）和管道号排序，未变化的管道号计入统计。
+    """
+    old_groups = _group(old_records)
+    new_groups = _group(new_records)
+    changes = []
+    stats = Counter()
+    for number, new in new_groups.items():
+        old = old_groups.get(number)
+        if old is None:
+            changes.append(LineChange('新增', number, (), [], new))
+            continue
+        if len(old) == 1 and len(new) == 1:
+            old_values, new_values = _diff_values(old[0]), _diff_values(new[0])
+            if old_values == new_values:
+                stats['未变'] += 1
+                continue
+            fields = tuple(field for field, a, b in zip(DIFF_FIELDS, old_values, new_values) if a != b)
+        else:
+            fields = tuple(field for field in DIFF_FIELDS
+                           if field_value(old, field) != field_value(new, field))
+        if fields:
+            changes.append(LineChange('变更', number, fields, old, new))
+            stats.update(fields)
+        else:
+            stats['未变'] += 1
+    for number, old in old_groups.items():
+        if number not in new_groups:
+            changes.append(LineChange('删除', number, (), old, []))
+
+    order = {kind: i for i, kind in enumerate(CHANGE_KINDS)}
+    changes.sort(key=lambda change: (order[change.kind], change.display_number))
+    stats.update(change.kind for change in changes)
+    return changes, stats
+
+
+def diff_rows(changes):
+    """变更列表转换为报告行（列同DIFF_COLUMNS）"""
+    for change in changes:
+        row = [change.kind, change.display_number,
+               ', '.join(DIFF_FIELDS[field] for field in change.fields)]
+        for field in DIFF_FIELDS:
+            row.append(field_value(change.old, field) if change.old else '')
+            row.append(field_value(change.new, field) if change.new else '')
+        yield row
+
+
+def export_diff(changes, output_path, fmt='auto'):
+    """导出变更报告（格式见pid_export），返回写出的行数"""
+    exporter = get_exporter(resolve_format(output_path, fmt))
+    count = exporter.write(output_path, ('变更', DIFF_COLUMNS, DIFF_COLUMN_WIDTHS, diff_rows(changes)))
+    logger.info(f"成功保存{exporter.description}: {output_path}")
+    return count
+
+
+def format_stats(stats):
+    """变更统计的文字说明"""
+    text = ", ".join(f"{kind} {stats[kind]}" for kind in (*CHANGE_KINDS, '未变'))
+    fields = [f"{column} {stats[field]}" for field, column in DIFF_FIELDS.items() if stats[field]]
+    if fields:
+        text += f"（变更字段: {', '.join(fields)}）"
+    return text
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="P&ID管道数据提取工具 - 版本对比")
+    parser.add_argument('old', help="旧版本：报告文件（xlsx/csv/ndjson/parquet）或图纸（dwg/dxf）")
+    parser.add_argument('new', help="新版本：报告文件或图纸")
+    parser.add_argument('-o', '--output', default="pipeline_diff.xlsx",
+                        help="变更报告文件（默认: pipeline_diff.xlsx）")
+    parser.add_argument('-f', '--format', choices=['auto'] + list(EXPORTERS), default='auto',
+                        help="变更报告格式，auto=按输出文件扩展名选择")
+    parser.add_argument('-c', '--codes', default=get_resource_path("test/code.xlsx"),
+                        help="介质代码Excel文件，对比图纸时使用（默认: test/code.xlsx）")
+    parser.add_argument('--backend', choices=['auto', 'com', 'dxf'], default='auto',
+                        help="文本提取后端: com=AutoCAD COM, dxf=直接读取DXF文件, auto=按扩展名选择")
+    parser.add_argument('-g', '--grammars', help="编号规则配置文件（JSON），默认使用内置的标准规则")
+    parser.add_argument('--phase-rules', help="相态规则文件（JSON），默认使用内置规则")
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help="提取结果缓存目录")
+    parser.add_argument('--no-cache', action='store_true', help="不使用提取结果缓存")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """版本对比主函数"""
+    args = parse_args(argv)
+    inputs = [args.old, args.new]
+
+    medium_codes = recognizer = classifier = cache = None
+    if any(path.lower().endswith(DRAWING_EXTENSIONS) for path in inputs):
+        medium_codes = load_medium_codes(args.codes)
+        recognizer = load_recognizer(args.grammars)
+        classifier = load_classifier(args.phase_rules)
+        cache = None if args.no_cache else ExtractionCache(args.cache_dir)
+
+    versions = []
+    for path in inputs:
+        start = time.perf_counter()
+        try:
+            if path.lower().endswith(DRAWING_EXTENSIONS):
+                records = extract_drawing_records(path, medium_codes, args.backend, cache, recognizer,
+                                                  classifier)
+            else:
+                records = load_report_records(path)
+        except Exception as e:
+            logger.error(f"读取失败: {path}: {e}")
+            return 1
+        logger.info(f"读取 {os.path.basename(path)}: {len(records)} 个管道号, "
+                    f"耗时 {time.perf_counter() - start:.2f} s")
+        versions.append(records)
+
+    start = time.perf_counter()
+    changes, stats = diff_records(*versions)
+    logger.info(f"对比耗时 {time.perf_counter() - start:.3f} s")
+    export_diff(changes, args.output, args.format)
+
+    print(f"\n对比完成: {format_stats(stats)}")
+    print(f"变更报告已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
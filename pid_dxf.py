@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DXF流式文本读取
+无需AutoCAD，直接按组码流读取ASCII/二进制DXF文件中的文本实体
+"""
+
+import logging
+import math
+import os
+import re
+import struct
+
+from pid_backends import DEFAULT_PIPE_LAYERS, PolylineRecord, TextRecord, layer_matcher
+from pid_progress import UNIT_BYTES
+
+logger = logging.getLogger(__name__)
+
+# 二进制DXF文件头标记
+BINARY_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+
+# 默认读取块大小（1MB），内存占用与文件大小无关
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# DXF实体类型 -> AutoCAD COM ObjectName，保持与COM后端一致
+ENTITY_TYPE_NAMES = {
+    b'TEXT': 'AcDbText',
+    b'MTEXT': 'AcDbMText',
+    b'ATTRIB': 'AcDbAttribute',
+}
+
+# 二进制DXF组码值类型
+_BIN_STR, _BIN_DOUBLE, _BIN_INT16, _BIN_INT32, _BIN_INT64, _BIN_BOOL, _BIN_CHUNK = range(7)
+
+# $DWGCODEPAGE中\M+n转义的代码页编号
+_MBCS_CODEPAGES = {'1': 'cp932', '2': 'cp950', '3': 'cp949', '4': 'johab', '5': 'cp936'}
+
+# ASCII DXF中段标记和文本实体的起始位置（组码0行 + 实体名行）
+_ASCII_MARKER = re.compile(rb'\n *0\r?\n(SECTION|ENDSEC|TEXT|MTEXT|ATTRIB)\r?(?=\n)')
+# ASCII DXF中段标记和管道几何实体（LINE、LWPOLYLINE）的起始位置
+_ASCII_GEOMETRY_MARKER = re.compile(rb'\n *0\r?\n(SECTION|ENDSEC|LINE|LWPOLYLINE)\r?(?=\n)')
+# 任意实体的起始位置，实体名不会以数字或空格开头
+_ASCII_CODE0 = re.compile(rb'\n *0\r?\n[^\r\n0-9 ]')
+# ENTITIES段头和段结束标记（分片划分使用）
+_ASCII_ENTITIES_SECTION = re.compile(rb'\n *0\r?\nSECTION\r?\n *2\r?\nENTITIES\r?\n')
+_ASCII_ENDSEC = re.compile(rb'\n *0\r?\nENDSEC\r?\n')
+
+_UNICODE_ESCAPE = re.compile(r'\\U\+([0-9A-Fa-f]{4})')
+_MBCS_ESCAPE = re.compile(r'\\M\+([1-5])([0-9A-Fa-f]{4})')
+
+
+def _binary_value_type(code):
+    """根据组码范围确定二进制DXF中值的存储类型"""
+    if (10 <= code <= 59 or 110 <= code <= 149 or 210 <= code <= 239
+            or 460 <= code <= 469 or 1010 <= code <= 1059):
+        return _BIN_DOUBLE
+    if (60 <= code <= 79 or 170 <= code <= 179 or 270 <= code <= 289
+            or 370 <= code <= 389 or 400 <= code <= 409 or 1060 <= code <= 1070):
+        return _BIN_INT16
+    if 90 <= code <= 99 or 420 <= code <= 429 or 440 <= code <= 459 or code == 1071:
+        return _BIN_INT32
+    if 160 <= code <= 169:
+        return _BIN_INT64
+    if 290 <= code <= 299:
+        return _BIN_BOOL
+    if 310 <= code <= 319 or code == 1004:
+        return _BIN_CHUNK
+    return _BIN_STR
+
+
+_BINARY_TYPES = [_binary_value_type(code) for code in range(1072)]
+
+
+def _parse_ascii_tags(body):
+    """将ASCII DXF中一个实体的组码/值行解析为(组码, 值)列表
+
+    body以实体名行末尾的换行符开头。
+    """
+    lines = body.split(b'\n')
+    return [(int(lines[i]), lines[i + 1].rstrip(b'\r')) for i in range(1, len(lines) - 1, 2)]
+
+
+def _iter_ascii_entities(f, chunk_size, start=0, stop=None, marker=_ASCII_MARKER):
+    """分块扫描ASCII DXF，只解析段标记和文本实体（marker为其他实体的标记正则时解析对应实体）
+
+    组码0行之后紧跟的一定是实体名（组码行只能是数字），因此可以直接用正则
+    在整块数据上定位需要的实体，LINE、ARC、HATCH等实体无需逐行解析。
+    同样的原因，从任意字节位置开始扫描都能正确对齐，start/stop为实体标记
+    （组码0行之前的换行符）的文件偏移范围，用于分片读取。
+    """
+    f.seek(start)
+    buf = b'' if start else b'\n'
+    base = start - len(buf)     # buf[0]对应的文件偏移
+    pos = 0
+    eof = False
+    first = not start
+    while True:
+        m = marker.search(buf, pos)
+        if m is not None and stop is not None and base + m.start() >= stop:
+            return
+        end = _ASCII_CODE0.search(buf, m.end()) if m else None
+        if end is None:
+            if eof:
+                if m is not None:
+                    yield m.group(1), _parse_ascii_tags(buf[m.end():].rstrip(b'\r\n'))
+                return
+            # 读取下一块，保留尚未处理完的实体（或可能跨块的标记）
+            keep_from = m.start() if m else max(pos, len(buf) - 64)
+            if stop is not None and base + keep_from >= stop:
+                # 之后的标记都在分片范围之外，分片末尾没有文本实体时不再读到文件末尾
+                return
+            more = f.read(chunk_size)
+            if first:
+                more = more.lstrip(b'\xef\xbb\xbf')
+                first = False
+            eof = not more
+            buf = buf[keep_from:] + more
+            base += keep_from
+            pos = 0
+            continue
+        yield m.group(1), _parse_ascii_tags(buf[m.end():end.start()])
+        pos = end.start()
+
+
+def _iter_binary_tags(f, chunk_size):
+    """分块读取二进制DXF（R13及以上，2字节组码）的组码和值"""
+    types = _BINARY_TYPES
+    unpack_from = struct.unpack_from
+    buf = f.read(chunk_size)
+    pos = 0
+    eof = not buf
+    while True:
+        # 保证缓冲区中至少有一个完整的定长组（最长为2字节组码+256字节数据块）
+        # （chunk_size可能小于512，需连续读取多块）
+        if len(buf) - pos < 512 and not eof:
+            buf = buf[pos:]
+            pos = 0
+            while len(buf) < 512 and not eof:
+                more = f.read(chunk_size)
+                eof = not more
+                buf += more
+        if len(buf) - pos < 2:
+            return
+
+        code = buf[pos] | (buf[pos + 1] << 8)
+        pos += 2
+        kind = types[code] if code < 1072 else _BIN_STR
+
+        if kind == _BIN_STR:
+            end = buf.find(b'\x00', pos)
+            while end < 0 and not eof:
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                end = buf.find(b'\x00')
+            if end < 0:
+                logger.warning("二进制DXF文件被截断")
+                return
+            value = buf[pos:end]
+            pos = end + 1
+        elif kind == _BIN_DOUBLE:
+            value = unpack_from('<d', buf, pos)[0]
+            pos += 8
+        elif kind == _BIN_INT16:
+            value = unpack_from('<h', buf, pos)[0]
+            pos += 2
+        elif kind == _BIN_INT32:
+            value = unpack_from('<i', buf, pos)[0]
+            pos += 4
+        elif kind == _BIN_INT64:
+            value = unpack_from('<q', buf, pos)[0]
+            pos += 8
+        elif kind == _BIN_BOOL:
+            value = buf[pos]
+            pos += 1
+        else:
+            length = buf[pos]
+            value = buf[pos + 1:pos + 1 + length]
+            pos += 1 + length
+
+        yield code, value
+
+
+def _track_progress(entities, f, progress, stage, start=0, stop=None):
+    """按已读取的字节数报告进度（每个实体更新一次，读取块大小即为进度粒度）"""
+    if progress is None:
+        yield from entities
+        return
+    if stop is None:
+        stop = os.fstat(f.fileno()).st_size
+    progress.begin(stage, stop - start, UNIT_BYTES)
+    tell = f.tell
+    for entity in entities:
+        progress.update(min(tell(), stop) - start)
+        yield entity
+    progress.finish()
+
+
+def _codepage_to_encoding(codepage):
+    """将$DWGCODEPAGE（如ANSI_936）转换为Python编码名"""
+    codepage = codepage.strip().upper()
+    if codepage.startswith('ANSI_'):
+        return 'cp' + codepage[5:]
+    if codepage in ('DOS932', 'BIG5', 'GB2312'):
+        return {'DOS932': 'cp932', 'BIG5': 'cp950', 'GB2312': 'cp936'}[codepage]
+    return 'cp1252'
+
+
+def decode_dxf_string(raw, encoding='utf-8'):
+    """解码DXF字符串值，并还原\\U+XXXX和\\M+nXXXX转义"""
+    s = raw.decode(encoding, 'replace')
+    if '\\U+' in s:
+        s = _UNICODE_ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), s)
+    if '\\M+' in s:
+        s = _MBCS_ESCAPE.sub(
+            lambda m: bytes.fromhex(m.group(2)).decode(_MBCS_CODEPAGES[m.group(1)], 'replace'), s)
+    return s
+
+
+def _iter_binary_entities(f, chunk_size):
+    """将二进制DXF的组码流按组码0分组为(实体名, 组码列表)"""
+    name = None
+    tags = []
+    for code, value in _iter_binary_tags(f, chunk_size):
+        if code == 0:
+            if name is not None:
+                yield name, tags
+            name = value
+            tags = []
+        else:
+            tags.append((code, value))
+    if name is not None:
+        yield name, tags
+
+
+def _read_header_encoding(tags):
+    """从HEADER段变量中确定字符串编码"""
+    encoding = 'cp1252'
+    header_var = None
+    for code, value in tags:
+        if code == 9:
+            header_var = value
+        elif header_var == b'$ACADVER' and code == 1:
+            # AC1021（2007版）及以上使用UTF-8
+            if value.decode('ascii', 'replace') >= 'AC1021':
+                return 'utf-8'
+        elif header_var == b'$DWGCODEPAGE' and code == 3:
+            encoding = _codepage_to_encoding(value.decode('ascii', 'replace'))
+    return encoding
+
+
+def _iter_texts_from_entities(entities, section=None, encoding='cp1252'):
+    """从实体流中提取模型空间的TEXT、MTEXT和ATTRIB文本
+
+    section/encoding为起始状态，分片从ENTITIES段中间开始读取时使用。
+    """
+    wanted = ENTITY_TYPE_NAMES
+
+    for name, tags in entities:
+        if name == b'SECTION':
+            section = tags[0][1] if tags and tags[0][0] == 2 else None
+            if section == b'HEADER':
+                encoding = _read_header_encoding(tags)
+            continue
+        if name == b'ENDSEC':
+            section = None
+            continue
+        if section != b'ENTITIES' or name not in wanted:
+            continue
+
+        parts = []
+        text = handle = layer = height = None
+        x = y = z = rotation = 0.0
+        direction = None
+        paper_space = False
+        for code, value in tags:
+            if code == 1:
+                text = value
+            elif code == 3:
+                parts.append(value)
+            elif code == 5:
+                handle = value
+            elif code == 8:
+                layer = value
+            elif code == 10:
+                x = float(value)
+            elif code == 20:
+                y = float(value)
+            elif code == 30:
+                z = float(value)
+            elif code == 40:
+                height = float(value)
+            elif code == 50:
+                rotation = float(value)
+            elif code == 11 and name == b'MTEXT':
+                direction = [float(value), 0.0]
+            elif code == 21 and direction is not None:
+                direction[1] = float(value)
+            elif code == 67:
+                paper_space = int(value) == 1
+
+        # 图纸空间实体不属于ModelSpace，跳过
+        if paper_space or (text is None and not parts):
+            continue
+        # TEXT/ATTRIB的旋转角单位为度；MTEXT为弧度，指定了X轴方向向量（组码11/21）时以向量为准
+        if name == b'MTEXT':
+            rotation = math.degrees(math.atan2(direction[1], direction[0]) if direction else rotation)
+        yield TextRecord(
+            decode_dxf_string(b''.join(parts) + (text or b''), encoding),
+            wanted[name],
+            handle.decode('ascii', 'replace') if handle else None,
+            decode_dxf_string(layer, encoding) if layer else None,
+            (x, y, z),
+            rotation,
+            height,
+        )
+
+
+def _find_pattern(f, pattern, start, chunk_size):
+    """从文件偏移start开始分块查找正则，返回匹配的(起始偏移, 结束偏移)或None"""
+    f.seek(start)
+    buf = b''
+    base = start
+    while True:
+        more = f.read(chunk_size)
+        buf += more
+        m = pattern.search(buf)
+        if m:
+            return base + m.start(), base + m.end()
+        if not more:
+            return None
+        # 保留末尾一小段，防止匹配跨块
+        keep = max(0, len(buf) - 256)
+        buf = buf[keep:]
+        base += keep
+
+
+def _read_ascii_encoding(f, chunk_size):
+    """读取ASCII DXF的HEADER段确定字符串编码"""
+    for name, tags in _iter_ascii_entities(f, chunk_size):
+        if name == b'SECTION':
+            if tags and tags[0] == (2, b'HEADER'):
+                return _read_header_encoding(tags)
+            break
+    return 'cp1252'
+
+
+def plan_dxf_shards(dxf_path, shard_bytes, chunk_size=DEFAULT_CHUNK_SIZE):
+    """将ASCII DXF的ENTITIES段按字节数划分为分片
+
+    返回[{'start', 'stop', 'encoding'}, ...]，分片边界都对齐到实体起始位置，
+    按顺序拼接各分片的结果与整体读取完全一致。
+    二进制DXF无法从中间对齐，返回[None]表示整体读取。
+    """
+    with open(dxf_path, 'rb') as f:
+        if f.read(len(BINARY_SENTINEL)) == BINARY_SENTINEL:
+            logger.info("二进制DXF不支持分片，按单个分片读取")
+            return [None]
+
+        encoding = _read_ascii_encoding(f, chunk_size)
+        found = _find_pattern(f, _ASCII_ENTITIES_SECTION, 0, chunk_size)
+        if found is None:
+            return [None]
+        # 段头最后一个换行符即为第一个实体的标记位置
+        entities_start = found[1] - 1
+        found = _find_pattern(f, _ASCII_ENDSEC, entities_start, chunk_size)
+        entities_stop = found[0] if found else os.path.getsize(dxf_path)
+
+        boundaries = [entities_start]
+        target = entities_start + shard_bytes
+        while target < entities_stop:
+            found = _find_pattern(f, _ASCII_CODE0, target, 1 << 16)
+            if found is None or found[0] >= entities_stop:
+                break
+            if found[0] > boundaries[-1]:
+                boundaries.append(found[0])
+            target = max(target, found[0]) + shard_bytes
+        boundaries.append(entities_stop)
+
+    return [{'start': start, 'stop': stop, 'encoding': encoding}
+            for start, stop in zip(boundaries, boundaries[1:])]
+
+
+def iter_dxf_texts(dxf_path, chunk_size=DEFAULT_CHUNK_SIZE, shard=None, progress=None):
+    """流式读取DXF文件中的文本实体
+
+    支持ASCII和二进制DXF（R13及以上），按块读取文件，内存占用与文件大小无关。
+    只返回模型空间中的TEXT、MTEXT及块参照的ATTRIB属性值，
+    与COM后端遍历ModelSpace的结果保持一致。
+    shard为plan_dxf_shards返回的分片时只读取该分片内的实体。
+    progress为pid_progress.ProgressTracker，按已读取的字节数报告进度。
+    """
+    with open(dxf_path, 'rb') as f:
+        if shard:
+            entities = _iter_ascii_entities(f, chunk_size, shard['start'], shard['stop'])
+            entities = _track_progress(entities, f, progress, "读取DXF", shard['start'], shard['stop'])
+            yield from _iter_texts_from_entities(entities, b'ENTITIES', shard['encoding'])
+            return
+
+        if f.read(len(BINARY_SENTINEL)) == BINARY_SENTINEL:
+            logger.info("检测到二进制DXF格式")
+            entities = _iter_binary_entities(f, chunk_size)
+        else:
+            f.seek(0)
+            entities = _iter_ascii_entities(f, chunk_size)
+        yield from _iter_texts_from_entities(_track_progress(entities, f, progress, "读取DXF"))
+
+
+def _iter_polylines_from_entities(entities, layers):
+    """从实体流中提取模型空间中图层匹配的LINE和LWPOLYLINE"""
+    section = None
+    encoding = 'cp1252'
+    match_layer = layer_matcher(layers)
+
+    for name, tags in entities:
+        if name == b'SECTION':
+            section = tags[0][1] if tags and tags[0][0] == 2 else None
+            if section == b'HEADER':
+                encoding = _read_header_encoding(tags)
+            continue
+        if name == b'ENDSEC':
+            section = None
+            continue
+        if section != b'ENTITIES' or name not in (b'LINE', b'LWPOLYLINE'):
+            continue
+
+        handle = layer = None
+        xs, ys = [], []
+        closed = paper_space = False
+        for code, value in tags:
+            if code in (10, 11):
+                xs.append(float(value))
+            elif code in (20, 21):
+                ys.append(float(value))
+            elif code == 5:
+                handle = value
+            elif code == 8:
+                layer = value
+            elif code == 70:
+                closed = bool(int(value) & 1)
+            elif code == 67:
+                paper_space = int(value) == 1
+
+        if paper_space or layer is None:
+            continue
+        layer = decode_dxf_string(layer, encoding)
+        if not match_layer(layer):
+            continue
+        # LINE的起点和终点分别为组码10/20和11/21；LWPOLYLINE的每个顶点为一组10/20
+        points = tuple(zip(xs, ys))
+        if closed and name == b'LWPOLYLINE' and points:
+            points += points[:1]
+        if len(points) >= 2:
+            yield PolylineRecord(handle.decode('ascii', 'replace') if handle else None, layer, points)
+
+
+def iter_dxf_polylines(dxf_path, layers=DEFAULT_PIPE_LAYERS, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """流式读取DXF文件中管道图层上的LINE和LWPOLYLINE，返回PolylineRecord
+
+    layers为图层名通配符（不区分大小写），为空时读取全部图层。多段线的凸度（圆弧段）
+    按直线段处理。progress同iter_dxf_texts。
+    """
+    with open(dxf_path, 'rb') as f:
+        if f.read(len(BINARY_SENTINEL)) == BINARY_SENTINEL:
+            entities = _iter_binary_entities(f, chunk_size)
+        else:
+            f.seek(0)
+            entities = _iter_ascii_entities(f, chunk_size, marker=_ASCII_GEOMETRY_MARKER)
+        yield from _iter_polylines_from_entities(_track_progress(entities, f, progress, "读取管道线"), layers)
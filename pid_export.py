@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告导出格式
+Excel之外提供CSV、JSON Lines和Parquet（需要pyarrow）格式，各格式都逐行写出，
+不生成完整的DataFrame；不需要带样式工作表的下游程序可以直接读取这些格式。
+报告按管道号排序，因此各格式都在全部管道记录解析完成后才开始写出。
+"""
+
+import csv
+import importlib.util
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Parquet中的数值列（按列名），其余列为字符串
+PARQUET_COLUMN_TYPES = {
+    '出现次数': 'int64',
+    '管道长度': 'float64',
+}
+
+# 报告表头的命名样式
+REPORT_HEADER_STYLE = 'pid_header'
+
+
+def _report_header_style():
+    """表头样式：白色粗体、蓝色填充、居中"""
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+    return NamedStyle(
+        name=REPORT_HEADER_STYLE,
+        font=Font(bold=True, color='FFFFFF'),
+        fill=PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+        alignment=Alignment(horizontal='center', vertical='center'),
+    )
+
+
+def write_report_workbook(output_path, sheets):
+    """以openpyxl只写模式流式写入Excel，返回各工作表写入的数据行数
+
+    sheets为(工作表名, 列名, 列宽, 行)的可迭代对象。列宽和表头样式在写入数据前设置，
+    行可以是生成器，逐行追加，内存占用不随行数增长。
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    workbook.add_named_style(_report_header_style())
+    counts = []
+    for sheet_name, columns, column_widths, rows in sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        for col, width in column_widths.items():
+            worksheet.column_dimensions[col].width = width
+
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(worksheet, value=name)
+            cell.style = REPORT_HEADER_STYLE
+            header.append(cell)
+        worksheet.append(header)
+
+        count = 0
+        for row in rows:
+            worksheet.append(row)
+            count += 1
+        counts.append(count)
+    workbook.save(output_path)
+    return counts
+
+
+class Exporter:
+    """报告导出格式
+
+    write()写出一张表，sheet为(表名, 列名, 列宽, 行)，行可以是生成器，逐行写出；
+    返回写出的数据行数。表名和列宽只对Excel有效。
+    """
+
+    name = None
+    extension = None
+    description = None
+
+    @classmethod
+    def available(cls):
+        """所需的依赖是否已安装"""
+        return True
+
+    def write(self, output_path, sheet):
+        raise NotImplementedError
+
+
+class ExcelExporter(Exporter):
+    """带表头样式和列宽的Excel工作表（openpyxl只写模式）"""
+
+    name = 'xlsx'
+    extension = '.xlsx'
+    description = 'Excel文件'
+
+    def write(self, output_path, sheet):
+        return write_report_workbook(output_path, [sheet])[0]
+
+
+class CsvExporter(Exporter):
+    """CSV，UTF-8带BOM，Excel可直接打开"""
+
+    name = 'csv'
+    extension = '.csv'
+    description = 'CSV文件'
+
+    def write(self, output_path, sheet):
+        _, columns, _, rows = sheet
+        count = 0
+        with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+
+
+class NdjsonExporter(Exporter):
+    """JSON Lines，每行一个以列名为键的对象"""
+
+    name = 'ndjson'
+    extension = '.ndjson'
+    description = 'JSON Lines文件'
+
+    def write(self, output_path, sheet):
+        _, columns, _, rows = sheet
+        count = 0
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                f.write('\n')
+                count += 1
+        return count
+
+
+class ParquetExporter(Exporter):
+    """Parquet，按BATCH_ROWS行一批写出（需要pyarrow）"""
+
+    name = 'parquet'
+    extension = '.parquet'
+    description = 'Parquet文件'
+
+    # 每批写出的行数
+    BATCH_ROWS = 65536
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec('pyarrow') is not None
+
+    def write(self, output_path, sheet):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("导出Parquet需要安装pyarrow")
+
+        _, columns, _, rows = sheet
+        writer = None
+        count = 0
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.BATCH_ROWS:
+                    writer = self._write_batch(pa, pq, writer, output_path, columns, batch)
+                    count += len(batch)
+                    batch = []
+            if batch or writer is None:
+                writer = self._write_batch(pa, pq, writer, output_path, columns, batch)
+                count += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        return count
+
+    @staticmethod
+    def schema(pa, columns):
+        """按列名确定表结构（见PARQUET_COLUMN_TYPES），不从首批数据推断：
+        首批中全为空值的列（如未估算的管道长度）推断为null类型，之后的批次无法写入"""
+        return pa.schema([(name, getattr(pa, PARQUET_COLUMN_TYPES.get(name, 'string'))())
+                          for name in columns])
+
+    def _write_batch(self, pa, pq, writer, output_path, columns, batch):
+        """写出一批行，首批写出前按列名创建文件"""
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, self.schema(pa, columns))
+        data = {name: [row[i] for row in batch] for i, name in enumerate(columns)}
+        writer.write_table(pa.table(data, schema=writer.schema))
+        return writer
+
+
+EXPORTERS = {
+    'xlsx': ExcelExporter,
+    'csv': CsvExporter,
+    'ndjson': NdjsonExporter,
+    'parquet': ParquetExporter,
+}
+
+# 按扩展名识别格式（.jsonl同为JSON Lines）
+_EXTENSION_FORMATS = {cls.extension: name for name, cls in EXPORTERS.items()}
+_EXTENSION_FORMATS['.jsonl'] = 'ndjson'
+
+
+def available_formats():
+    """依赖已安装的导出格式名称"""
+    return [name for name, cls in EXPORTERS.items() if cls.available()]
+
+
+def resolve_format(output_path, fmt='auto'):
+    """确定导出格式：auto时按扩展名选择，无法识别时使用Excel"""
+    if fmt == 'auto':
+        extension = os.path.splitext(output_path)[1].lower()
+        return _EXTENSION_FORMATS.get(extension, 'xlsx')
+    return fmt
+
+
+def get_exporter(name):
+    """按名称创建导出格式"""
+    try:
+        exporter_class = EXPORTERS[name]
+    except KeyError:
+        raise ValueError(f"未知的导出格式: {name}")
+    return exporter_class()
@@ -5,153 +5,381 @@ P&ID管道数据提取工具
 从P&ID图纸中提取管道号并生成Excel报告
 """
 
-import re
+import functools
+import marshal
+import operator
+from collections import Counter
+from contextlib import nullcontext
+import unicodedata
 import pandas as pd
 import logging
 import os
 import sys
+import argparse
+
+from pid_backends import (DEFAULT_BLOCK_DEPTH, DEFAULT_PIPE_LAYERS, SelectionFilter, TextRecord,
+                          get_backend, resolve_backend)
+from pid_cache import (DEFAULT_CACHE_DIR, ExtractionCache, extract_records, file_digest,
+                       stream_records)
+from pid_export import EXPORTERS, get_exporter, resolve_format
+from pid_geometry import TagCollector, measure_pipe_lengths
+from pid_grammar import DEFAULT_GRAMMAR, DEFAULT_RECOGNIZER, TextPrefilter, load_recognizer
+from pid_incremental import MatchState, text_digest
+from pid_logsink import verbose_log
+from pid_phase import DEFAULT_CLASSIFIER, load_classifier
+from pid_progress import ExtractionCancelled, ProgressTracker, progress_line
+from pid_records import PipelineRecord
+from pid_shard import extract_sharded
+from pid_spatial import MERGED_ENTITY_TYPE, LabelMerger
+from pid_stream import StageMeter
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def extract_text_from_dwg(dwg_path):
-    """从DWG文件中提取文本"""
+def iter_text_records(drawing_path, backend='auto', cache=None, workers=1, shard_size=None,
+                      log=None, progress=None, **backend_options):
+    """按指定后端逐条产出图纸中非空的文本记录（TextRecord），backend_options传给后端构造函数
+
+    单进程提取时与CAD遍历同步产出，后续阶段无需等待提取完成；workers大于1时
+    按分片并行提取（见pid_shard），全部分片完成后再依次产出。提取失败时抛出异常，
+    progress（pid_progress.ProgressTracker）被取消时抛出ExtractionCancelled。
+    """
+    backend = resolve_backend(drawing_path, backend)
+    extractor = get_backend(backend, log=log, progress=progress, **backend_options)
+    if workers != 1:
+        records = extract_records(
+            extractor, drawing_path, cache,
+            lambda: extract_sharded(drawing_path, backend, backend_options, workers, shard_size, log,
+                                    progress))
+    else:
+        records = stream_records(extractor, drawing_path, cache)
+    for record in records:
+        if record.text:
+            yield record
+
+def extract_text_records(drawing_path, backend='auto', cache=None, workers=1, shard_size=None,
+                         **backend_options):
+    """按指定后端从图纸中提取非空的文本记录（TextRecord），参数同iter_text_records"""
     try:
-        from pyautocad import Autocad
-        
-        # 连接到AutoCAD
-        acad = Autocad(create_if_not_exists=True)
-        logger.info("成功连接到AutoCAD")
-        
-        # 打开文件
-        abs_path = os.path.abspath(dwg_path)
-        logger.info(f"打开文件: {abs_path}")
-        doc = acad.app.Documents.Open(abs_path)
-        logger.info(f"成功打开文件: {doc.Name}")
-        
-        # 获取模型空间
-        model_space = doc.ModelSpace
-        logger.info(f"模型空间实体数量: {model_space.Count}")
-        
-        # 提取文本实体
-        text_entities = []
-        
-        # 遍历实体
-        total_entities = model_space.Count
-        for i in range(total_entities):
-            try:
-                # 显示进度
-                if i % 10000 == 0:
-                    logger.info(f"处理进度: {i}/{total_entities} ({i/total_entities*100:.1f}%)")
-                
-                entity = model_space.Item(i)
-                entity_type = entity.ObjectName
-                
-                # 只处理文本相关的实体类型，提高效率
-                if entity_type in ["AcDbText", "AcDbMText", "AcDbBlockReference"]:
-                    # 提取文本
-                    text_content = None
-                    if entity_type == "AcDbText":
-                        text_content = entity.TextString
-                    elif entity_type == "AcDbMText":
-                        text_content = entity.TextString
-                    elif entity_type == "AcDbBlockReference":
-                        # 处理块参照中的属性
-                        try:
-                            if hasattr(entity, 'GetAttributes'):
-                                attributes = entity.GetAttributes()
-                                for attr in attributes:
-                                    if hasattr(attr, 'TextString'):
-                                        text_entities.append(attr.TextString)
-                        except:
-                            pass
-                    
-                    if text_content:
-                        text_entities.append(text_content)
-                    
-            except Exception:
-                continue
-        
-        logger.info(f"提取了 {len(text_entities)} 个文本")
-        
-        # 关闭文档
-        doc.Close(False)
-        logger.info("已关闭文档")
-        
-        return text_entities
-        
+        records = list(iter_text_records(drawing_path, backend, cache, workers, shard_size,
+                                         **backend_options))
+        logger.info(f"提取了 {len(records)} 个文本")
+        return records
+
     except Exception as e:
         logger.error(f"提取文本失败: {e}")
         return []
 
+def extract_text(drawing_path, backend='auto', cache=None, **options):
+    """按指定后端从图纸中提取文本字符串，参数同extract_text_records"""
+    return [record.text for record in extract_text_records(drawing_path, backend, cache, **options)]
+
+def extract_text_from_dwg(dwg_path):
+    """从DWG文件中提取文本"""
+    return extract_text(dwg_path, 'com')
+
+def extract_text_from_dxf(dxf_path):
+    """从DXF文件中流式提取文本（无需AutoCAD）"""
+    return extract_text(dxf_path, 'dxf')
+
+# 文本标准化转换表：清理控制字符（含NULL），Unicode连字符改为ASCII连字符
+_NORMALIZE_TABLE = dict.fromkeys([*range(0x00, 0x20), *range(0x7F, 0xA0)])
+_NORMALIZE_TABLE.update(dict.fromkeys(range(0x2010, 0x2016), '-'))
+
+# ASCII文本中需要删除的控制字符
+_ASCII_CONTROL_BYTES = bytes([*range(0x00, 0x20), 0x7F])
+
+@functools.lru_cache(maxsize=65536)
+def _normalize_unicode(s):
+    return unicodedata.normalize('NFKC', s).translate(_NORMALIZE_TABLE)
+
 def normalize_text(s):
-    """文本标准化，清理不可见字符"""
-    import unicodedata
+    """文本标准化，清理不可见字符
+
+    结果与依次执行strip、NFKC标准化、连字符替换和控制字符清理相同。
+    纯ASCII文本NFKC后不变，只需删除控制字符；非ASCII文本的结果按字符串缓存。
+    """
     s = str(s).strip()
-    s = unicodedata.normalize('NFKC', s)  # Unicode标准化
-    s = s.replace('\x00', '')  # 清理NULL字符
-    s = re.sub(r'[\u2010-\u2015]', '-', s)  # Unicode连字符改为ASCII连字符
-    s = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', s)  # 清理控制字符
-    return s
-
-def find_pipeline_numbers(text_entities):
-    """查找管道号"""
+    if s.isascii():
+        if s.isprintable():
+            return s
+        return s.encode('ascii').translate(None, _ASCII_CONTROL_BYTES).decode('ascii')
+    return _normalize_unicode(s)
+
+class PipelineIndex:
+    """管道号索引
+
+    按首次出现顺序保存管道号，并记录每个管道号的出现次数、来源实体，
+    以及首次出现时匹配的编号规则和字段。
+    来源为文本记录的句柄，没有句柄时为文本序号（如#12）；从拆分标注拼接得到的管道号另外标记。
+    查找和插入均为O(1)，可迭代得到去重后的管道号。
+    """
+
+    def __init__(self):
+        self._sources = {}  # 管道号 -> 来源列表，dict保持插入顺序
+        self._matches = {}  # 管道号 -> (编号规则, 字段字典)
+        self._merged = set()  # 从拼接文本中找到的管道号
+        self.stage_counts = Counter()  # 各阶段排除/通过的文本数量
+
+    def add(self, pipeline_number, source=None, grammar=None, fields=None):
+        """记录一次出现，首次出现时保存编号规则和字段并返回True"""
+        sources = self._sources.get(pipeline_number)
+        if sources is None:
+            self._sources[pipeline_number] = [source]
+            self._matches[pipeline_number] = (grammar, fields)
+            return True
+        sources.append(source)
+        return False
+
+    def grammar(self, pipeline_number):
+        """匹配的编号规则"""
+        return self._matches[pipeline_number][0]
+
+    def fields(self, pipeline_number):
+        """编号规则解析出的字段"""
+        return self._matches[pipeline_number][1]
+
+    def mark_merged(self, pipeline_number):
+        """标记管道号来自拆分标注的拼接"""
+        self._merged.add(pipeline_number)
+
+    def merged(self, pipeline_number):
+        """是否（至少一次）从拆分标注的拼接中找到"""
+        return pipeline_number in self._merged
+
+    def count(self, pipeline_number):
+        """出现次数"""
+        return len(self._sources[pipeline_number])
+
+    def sources(self, pipeline_number):
+        """来源实体（去重，保持出现顺序）"""
+        return list(dict.fromkeys(self._sources[pipeline_number]))
+
+    def text_count(self):
+        """已处理的文本数量"""
+        return sum(self.stage_counts.values())
+
+    def __iter__(self):
+        return iter(self._sources)
+
+    def __len__(self):
+        return len(self._sources)
+
+    def __contains__(self, pipeline_number):
+        return pipeline_number in self._sources
+
+def _resolve_prefilter(prefilter, recognizer):
+    if prefilter is True:
+        return recognizer.prefilter
+    return prefilter or None
+
+def _resolve_merger(merge, recognizer, log):
+    if merge is True:
+        return LabelMerger(recognizer, normalize_text, log)
+    return merge or None
+
+def _log_self_check(recognizer, log):
+    """用编号规则的示例自检并输出结果"""
+    failed = recognizer.self_check()
+    log(f"正则表达式自检结果: {not failed}" + (f"（未通过: {', '.join(failed)}）" if failed else ""))
+
+def _log_stage_counts(pipeline_index, log):
+    log("文本筛选统计: " + ", ".join(f"{name} {pipeline_index.stage_counts[stage]}"
+                                   for stage, name in TextPrefilter.STAGE_NAMES.items()))
+
+def iter_pipeline_numbers(text_entities, pipeline_index, recognizer=None, prefilter=None, log=None,
+                          state=None):
+    """逐个文本查找管道号，每次出现都记入pipeline_index，产出首次出现的管道号
+
+    text_entities为文本字符串或TextRecord的可迭代对象（可以是生成器），逐条处理，
+    不保留文本。prefilter为TextPrefilter，为None时不做预筛选。state为MatchState
+    （见pid_incremental）时，通过预筛选的文本中句柄和文本都未变化的实体复用上次的
+    匹配结果，不再标准化和匹配（预筛选比计算文本哈希更快，仍对每个文本执行）。
+    实体类型为MERGED_ENTITY_TYPE的拼接文本（见pid_spatial）中找到的管道号在索引中标记。
+    """
+    log = log or logger.info
+    recognizer = recognizer or DEFAULT_RECOGNIZER
+    
+    # 调试：前10个文本的详细信息写入详细日志（见pid_logsink）
+    logger.debug("开始分析前10个文本实体...")
+    
+    stage_counts = pipeline_index.stage_counts
+    reject = prefilter.reject if prefilter else None
+    finditer = recognizer.finditer
+    grammars = recognizer.grammars
+    grammar_numbers = {id(grammar): i for i, grammar in enumerate(grammars)}
+    for position, entity in enumerate(text_entities):
+        is_record = isinstance(entity, TextRecord)
+        text = entity.text if is_record else entity
+        if position < 10:
+            logger.debug(f"文本{position}: {repr(text)} | 十六进制: {[hex(ord(c)) for c in str(text)[:20]]}")
+
+        if reject is not None:
+            stage = reject(text)
+            if stage:
+                stage_counts[stage] += 1
+                continue
+
+        merged = is_record and entity.entity_type == MERGED_ENTITY_TYPE
+        if state is not None:
+            handle = is_record and entity.handle
+            digest = text_digest(text) if handle else None
+            found = state.lookup(handle, digest)
+            if found is not None:
+                # 复用上次的匹配结果
+                for pipeline_number, grammar_number, fields in found:
+                    if merged:
+                        pipeline_index.mark_merged(pipeline_number)
+                    if pipeline_number in pipeline_index:
+                        pipeline_index.add(pipeline_number, handle)
+                    else:
+                        pipeline_index.add(pipeline_number, handle, grammars[grammar_number], fields)
+                        yield pipeline_number
+                stage_counts['matched' if found else 'regex'] += 1
+                continue
+            matches = []
+
+        # 标准化文本后查找管道号
+        matched = False
+        for match in finditer(normalize_text(text)):
+            if not matched:
+                matched = True
+                source = (is_record and entity.handle) or f"#{position}"
+            pipeline_number = match.group(0)
+            if merged:
+                pipeline_index.mark_merged(pipeline_number)
+            if pipeline_number in pipeline_index:
+                pipeline_index.add(pipeline_number, source)
+                if state is not None:
+                    grammar, fields = recognizer.describe(match)
+            else:
+                grammar, fields = recognizer.describe(match)
+                pipeline_index.add(pipeline_number, source, grammar, fields)
+                logger.debug(f"找到管道号: {pipeline_number} [{grammar.name}] (原文本: {repr(text[:50])})")
+                yield pipeline_number
+            if state is not None:
+                matches.append((pipeline_number, grammar_numbers[id(grammar)], fields))
+        stage_counts['matched' if matched else 'regex'] += 1
+        if state is not None:
+            state.record(handle, digest, matches)
+
+def find_pipeline_numbers(text_entities, log=None, prefilter=True, recognizer=None):
+    """查找管道号
+
+    text_entities为文本字符串或TextRecord的可迭代对象，返回PipelineIndex。
+    recognizer为编号规则识别器（见pid_grammar），默认使用内置规则。
+    prefilter为True时使用识别器的预筛选，也可以传入TextPrefilter；
+    为None或False时不做预筛选，所有文本都经过标准化和正则匹配。
+    """
+    log = log or logger.info
+    recognizer = recognizer or DEFAULT_RECOGNIZER
     # 自检测试
-    test_string = '4101BRR-02457-200-03CBMB1-H'
-    pipeline_pattern = r'(\d{4}[A-Z0-9]{1,4})-([A-Z0-9]{4,6})-(\d{2,3})-(\d{2}[A-Z0-9]{3,6})-([A-Z]{1,2})'
-    self_check = bool(re.search(pipeline_pattern, test_string))
-    logger.info(f"正则表达式自检结果: {self_check}")
+    _log_self_check(recognizer, log)
     
-    pipeline_numbers = []
+    pipeline_index = PipelineIndex()
+    for _ in iter_pipeline_numbers(text_entities, pipeline_index, recognizer,
+                                   _resolve_prefilter(prefilter, recognizer), log):
+        pass
     
-    # 调试：打印前10个文本的详细信息
-    logger.info("开始分析前10个文本实体...")
-    for idx, text in enumerate(text_entities[:10]):
-        logger.info(f"文本{idx}: {repr(text)} | 十六进制: {[hex(ord(c)) for c in str(text)[:20]]}")
+    _log_stage_counts(pipeline_index, log)
+    return pipeline_index
+
+# 介质代码sidecar缓存格式版本，清洗逻辑变化时递增
+MEDIUM_CODES_CACHE_VERSION = 1
+
+def clean_medium_codes(df):
+    """按列清洗介质代码表（第一列代码，第二列名称），返回代码 -> 名称
+
+    代码为空且名称含“氢氧化钠溶液”时代码视为NA（pandas把单元格中的NA读成空值），
+    其余代码或名称为空的行跳过；重复代码以最后一行为准。
+    """
+    if df.shape[1] < 2:
+        return {}
+    # 与逐行读取一致：各列先转换为整表的公共类型（如全为数值时整数列转为浮点）
+    values = df.to_numpy()
+    codes, names = pd.Series(values[:, 0]), pd.Series(values[:, 1])
+    code_missing, name_missing = codes.isna(), names.isna()
     
-    for text in text_entities:
-        # 标准化文本
-        normalized_text = normalize_text(text)
-        
-        # 查找管道号
-        matches = re.findall(pipeline_pattern, normalized_text)
-        for match in matches:
-            pipeline_number = '-'.join(match)
-            if pipeline_number not in pipeline_numbers:
-                pipeline_numbers.append(pipeline_number)
-                logger.info(f"找到管道号: {pipeline_number} (原文本: {repr(text[:50])})")
+    names = names.astype(str)
+    codes = codes.astype(str).str.strip().where(~code_missing, 'NA')
+    keep = ~name_missing & (~code_missing | names.str.contains('氢氧化钠溶液', regex=False))
+    names = names.str.strip()
+    keep &= (codes != '') & (names != '') & (codes != 'nan') & (names != 'nan')
     
-    return pipeline_numbers
+    return dict(zip(codes[keep], names[keep]))
 
-def load_medium_codes(code_file_path):
-    """从Excel文件加载介质代码映射"""
+def _medium_codes_sidecar(code_file_path, sheet_name):
+    """介质代码sidecar缓存文件路径（与Excel文件同目录的隐藏文件）"""
+    directory, name = os.path.split(os.path.abspath(code_file_path))
+    suffix = 'all' if sheet_name is None else sheet_name
+    return os.path.join(directory, f".{name}.{suffix}.codes")
+
+def _read_medium_codes_sidecar(sidecar_path, stat, code_file_path):
+    """读取sidecar缓存，返回(代码映射, 内容哈希, 是否需要更新修改时间)
+
+    修改时间和大小一致时直接使用缓存；修改时间变化（如复制、重新保存）但
+    内容哈希一致时同样有效；否则代码映射为None。
+    """
+    try:
+        with open(sidecar_path, 'rb') as f:
+            data = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None, None, False
+    if not isinstance(data, dict) or data.get('version') != MEDIUM_CODES_CACHE_VERSION:
+        return None, None, False
+    if data.get('mtime_ns') == stat.st_mtime_ns and data.get('size') == stat.st_size:
+        return data['codes'], data['sha256'], False
+    digest = file_digest(code_file_path)
+    if data.get('sha256') == digest:
+        return data['codes'], digest, True
+    return None, digest, False
+
+def _write_medium_codes_sidecar(sidecar_path, stat, digest, medium_codes):
+    tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
     try:
-        df = pd.read_excel(code_file_path, header=None)
+        with open(tmp_path, 'wb') as f:
+            f.write(marshal.dumps({
+                'version': MEDIUM_CODES_CACHE_VERSION,
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sha256': digest,
+                'codes': medium_codes,
+            }))
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        # 目录只读等情况下不使用缓存
+        logger.debug(f"无法写入介质代码缓存 {sidecar_path}: {e}")
+
+def load_medium_codes(code_file_path, sheet_name=0, use_sidecar=True):
+    """从Excel文件加载介质代码映射
+
+    sheet_name为None时合并所有工作表（靠后的工作表覆盖重复代码）。
+    清洗后的映射保存在同目录的sidecar缓存中，以Excel文件的修改时间和内容哈希为键，
+    文件未变化时直接读取缓存，无需再次解析Excel。
+    """
+    try:
+        stat = os.stat(code_file_path)
+        sidecar_path = _medium_codes_sidecar(code_file_path, sheet_name)
+        digest = None
+        if use_sidecar:
+            medium_codes, digest, refresh = _read_medium_codes_sidecar(sidecar_path, stat, code_file_path)
+            if medium_codes is not None:
+                if refresh:
+                    _write_medium_codes_sidecar(sidecar_path, stat, digest, medium_codes)
+                logger.info(f"从缓存加载 {len(medium_codes)} 个介质代码")
+                return medium_codes
+        
+        sheets = pd.read_excel(code_file_path, header=None, sheet_name=sheet_name)
+        if sheet_name is not None:
+            sheets = {sheet_name: sheets}
         medium_codes = {}
+        for df in sheets.values():
+            medium_codes.update(clean_medium_codes(df))
         
-        for i, row in df.iterrows():
-            code = row.iloc[0]
-            name = row.iloc[1]
-            
-            # 处理代码列
-            if pd.isna(code):
-                # 特殊处理氢氧化钠溶液
-                if not pd.isna(name) and "氢氧化钠溶液" in str(name):
-                    code = "NA"
-                else:
-                    continue
-            else:
-                code = str(code).strip()
-            
-            # 处理名称列
-            if pd.isna(name):
-                continue
-            name = str(name).strip()
-            
-            if code and name and code != 'nan' and name != 'nan':
-                medium_codes[code] = name
-                
+        if use_sidecar:
+            _write_medium_codes_sidecar(sidecar_path, stat, digest or file_digest(code_file_path),
+                                        medium_codes)
         logger.info(f"成功加载 {len(medium_codes)} 个介质代码")
         return medium_codes
         
@@ -159,104 +387,188 @@ def load_medium_codes(code_file_path):
         logger.error(f"无法加载介质代码文件: {e}")
         return {}
 
-def determine_phase(medium_name):
-    """根据介质名称判断相态"""
-    # 气相关键词
-    gas_keywords = ['蒸汽', '气', '空气', '氢气', '氮气', '氧气', '二氧化碳', '天然气', '废气']
-    
-    # 液相关键词
-    liquid_keywords = ['水', '油', '液', '溶液', '酸', '碱', '汽油', '柴油', '凝结']
+def determine_phase(medium_name, classifier=None):
+    """根据介质名称判断相态（规则见pid_phase，默认使用内置规则）"""
+    return (classifier or DEFAULT_CLASSIFIER).classify_name(medium_name)
+
+def _pipeline_record(pipeline_number, fields, medium_codes, grammar):
+    """由编号规则解析出的字段生成管道记录（不含相态），规则中没有的字段为空"""
+    medium_code = fields.get('medium_code', '')
+    return PipelineRecord(
+        pipeline_number,
+        display_number=grammar.format_display(fields),
+        grammar=grammar.name,
+        unit_number=fields.get('unit_number', ''),
+        pipe_number=fields.get('pipe_number', ''),
+        nominal_diameter=fields.get('nominal_diameter', ''),
+        pipe_grade=fields.get('pipe_grade', ''),
+        insulation_grade=fields.get('insulation_grade', ''),
+        medium_code=medium_code,
+        medium_name=medium_codes.get(medium_code, f"未知介质({medium_code})"),
+    )
+
+def parse_pipeline_fields(pipeline_number, fields, medium_codes, grammar=None, classifier=None):
+    """由编号规则解析出的字段生成管道记录（PipelineRecord），规则中没有的字段为空"""
+    record = _pipeline_record(pipeline_number, fields, medium_codes, grammar or DEFAULT_GRAMMAR)
+    record.phase = (classifier or DEFAULT_CLASSIFIER).classify(record.medium_name, record.medium_code)
+    return record
+
+def parse_pipeline_number(pipeline_number, medium_codes, recognizer=None, classifier=None):
+    """解析管道号，不符合任何编号规则时返回None"""
+    found = (recognizer or DEFAULT_RECOGNIZER).match(pipeline_number)
+    if found is None:
+        return None
+    grammar, fields = found
+    return parse_pipeline_fields(pipeline_number, fields, medium_codes, grammar, classifier)
+
+def parse_pipeline_index(pipeline_index, medium_codes, classifier=None):
+    """解析索引中的全部管道号，返回管道记录列表，并附加出现次数和来源实体（见iter_pipeline_records）"""
+    return list(iter_pipeline_records(pipeline_index, pipeline_index, medium_codes, classifier))
+
+def iter_pipeline_records(pipeline_numbers, pipeline_index, medium_codes, classifier=None):
+    """逐个解析首次出现的管道号，产出管道记录
+
+    pipeline_numbers通常为iter_pipeline_numbers的输出。记录产出时出现次数、来源实体和
+    拼接标记只包含目前为止的出现；上游全部处理完后，再按pipeline_index更新已产出的记录。
+    相态逐条判断，判断器按介质名称缓存结果，每个不同的名称只匹配一次规则。
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    pipeline_data = []
+    for pipeline_number in pipeline_numbers:
+        grammar = pipeline_index.grammar(pipeline_number) or DEFAULT_GRAMMAR
+        record = _pipeline_record(pipeline_number, pipeline_index.fields(pipeline_number),
+                                  medium_codes, grammar)
+        record.phase = classifier.classify(record.medium_name, record.medium_code)
+        record.occurrences = pipeline_index.count(pipeline_number)
+        record.sources = pipeline_index.sources(pipeline_number)
+        record.merged = pipeline_index.merged(pipeline_number)
+        pipeline_data.append(record)
+        yield record
     
-    # 检查是否包含气相关键词
-    for keyword in gas_keywords:
-        if keyword in medium_name:
-            return '气相'
+    for record in pipeline_data:
+        record.occurrences = pipeline_index.count(record.pipeline_number)
+        record.sources = pipeline_index.sources(record.pipeline_number)
+        record.merged = pipeline_index.merged(record.pipeline_number)
+
+def stream_pipeline_records(text_entities, medium_codes, pipeline_index=None, recognizer=None,
+                            classifier=None, prefilter=True, meter=None, log=None, state=None,
+                            merge=True, tags=None):
+    """流式处理：文本 -> 管道号 -> 管道记录
+
+    各阶段串联为生成器，文本边提取边匹配和解析，不保留文本列表，内存只随管道号数量增长；
+    首个管道号找到后即可取得其记录。全部产出后出现次数和来源实体为最终结果（与
+    find_pipeline_numbers + parse_pipeline_index一致）。pipeline_index用于取得筛选统计，
+    meter为StageMeter时统计提取、拼接、匹配、解析各阶段的吞吐量，state为MatchState时增量匹配。
+    merge为True时拼接拆分的管道号标注（见pid_spatial），也可以传入LabelMerger；
+    拼接文本在全部文本之后产出，为None或False时不拼接。tags为TagCollector时记录管道号
+    标注的位置，用于之后估算管道长度（见pid_geometry）。
+    """
+    log = log or logger.info
+    recognizer = recognizer or DEFAULT_RECOGNIZER
+    if pipeline_index is None:
+        pipeline_index = PipelineIndex()
+    _log_self_check(recognizer, log)
     
-    # 检查是否包含液相关键词
-    for keyword in liquid_keywords:
-        if keyword in medium_name:
-            return '液相'
+    if meter is not None:
+        text_entities = meter.wrap('提取', text_entities)
+    merger = _resolve_merger(merge, recognizer, log)
+    if merger is not None:
+        text_entities = merger.merge(text_entities)
+        if meter is not None:
+            text_entities = meter.wrap('拼接', text_entities)
+    if tags is not None:
+        text_entities = tags.collect(text_entities)
+    numbers = iter_pipeline_numbers(text_entities, pipeline_index, recognizer,
+                                    _resolve_prefilter(prefilter, recognizer), log, state)
+    if meter is not None:
+        numbers = meter.wrap('匹配', numbers)
+    records = iter_pipeline_records(numbers, pipeline_index, medium_codes, classifier)
+    if meter is not None:
+        records = meter.wrap('解析', records)
+    yield from records
     
-    # 默认返回未知相态
-    return '未知相态'
-
-def parse_pipeline_number(pipeline_number, medium_codes):
-    """解析管道号"""
-    parts = pipeline_number.split('-')
-    if len(parts) >= 5:
-        # 新格式: 装置号和介质代码-管道号-管道尺寸-管道等级-保温等级
-        unit_and_medium = parts[0]  # 4101BRR
-        pipe_number = parts[1]      # 02457
-        pipe_size = parts[2]        # 200
-        pipe_grade = parts[3]       # 03CBMB1
-        insulation_grade = parts[4] # H
-        
-        # 从装置号和介质代码中提取介质代码（后1-4位字母数字）
-        unit_number = unit_and_medium[:4]  # 4101
-        medium_code = unit_and_medium[4:]  # BRR, D, S18, CSM
-        
-        medium_name = medium_codes.get(medium_code, f"未知介质({medium_code})")
-        phase = determine_phase(medium_name)
-        
-        return {
-            'pipeline_number': pipeline_number,
-            'unit_number': unit_number,
-            'pipe_number': pipe_number,
-            'nominal_diameter': pipe_size,
-            'pipe_grade': pipe_grade,
-            'insulation_grade': insulation_grade,
-            'medium_code': medium_code,
-            'medium_name': medium_name,
-            'phase': phase
-        }
-    return None
+    if merger is not None:
+        merger.log_stats(log)
+    _log_stage_counts(pipeline_index, log)
 
-def create_excel_output(pipeline_data, output_path):
-    """创建Excel输出"""
-    # 创建DataFrame
-    df_data = []
-    for data in pipeline_data:
-        if data:
-            # 简化的管道号：装置号和介质代码-管道编号
-            simplified_pipeline_number = f"{data['unit_number']}{data['medium_code']}-{data['pipe_number']}"
-            df_data.append([
-                simplified_pipeline_number,
-                data['nominal_diameter'],
-                data['pipe_grade'],
-                data['insulation_grade'],
-                data['medium_name'],
-                data['phase']
-            ])
-    
-    columns = ['管道号', '管径', '管道等级', '保温等级', '介质名称', '相态']
-    df = pd.DataFrame(df_data, columns=columns)
+# 报告列宽
+REPORT_COLUMN_WIDTHS = {'A': 20, 'B': 8, 'C': 15, 'D': 10, 'E': 15, 'F': 8, 'G': 10, 'H': 40, 'I': 12,
+                        'J': 10, 'K': 10}
+
+# 报告中每个管道号最多列出的来源实体数量
+MAX_REPORT_SOURCES = 20
+
+# 报告列
+REPORT_COLUMNS = ['管道号', '管径', '管道等级', '保温等级', '介质名称', '相态', '出现次数', '来源实体',
+                  '编号规则', '拼接标注', '管道长度']
+
+def merged_label(merged):
+    """拼接标注列内容：管道号来自拆分标注的拼接时为“是”"""
+    return '是' if merged else ''
+
+def pipe_length_value(length):
+    """管道长度列内容：保留1位小数，未估算时为None（各格式中为空值）"""
+    return None if length is None else round(length, 1)
+
+def format_sources(sources):
+    """来源实体列内容，超过MAX_REPORT_SOURCES个时截断"""
+    text = ', '.join(str(source) for source in sources[:MAX_REPORT_SOURCES])
+    if len(sources) > MAX_REPORT_SOURCES:
+        text += f" 等{len(sources)}个"
+    return text
+
+def build_report_frame(pipeline_data):
+    """将管道记录列表转换为报告DataFrame（按管道号排序，管道号相同时保持出现顺序）
+
+    逐列取值直接生成DataFrame，不经过中间的行列表。报告中的管道号按编号规则的
+    display格式简化（默认为装置号和介质代码-管道编号）。
+    """
+    df = pd.DataFrame({
+        '管道号': [record.display_number for record in pipeline_data],
+        '管径': [record.nominal_diameter for record in pipeline_data],
+        '管道等级': [record.pipe_grade for record in pipeline_data],
+        '保温等级': [record.insulation_grade for record in pipeline_data],
+        '介质名称': [record.medium_name for record in pipeline_data],
+        '相态': [record.phase for record in pipeline_data],
+        '出现次数': [record.occurrences for record in pipeline_data],
+        '来源实体': [format_sources(record.sources) for record in pipeline_data],
+        '编号规则': [record.grammar for record in pipeline_data],
+        '拼接标注': [merged_label(record.merged) for record in pipeline_data],
+        '管道长度': [pipe_length_value(record.pipe_length) for record in pipeline_data],
+    }, columns=REPORT_COLUMNS)
     
     # 按管道号排序
-    df = df.sort_values('管道号').reset_index(drop=True)
-    
-    # 保存为Excel
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='管道数据表', index=False)
-        
-        # 设置列宽
-        worksheet = writer.sheets['管道数据表']
-        column_widths = {'A': 20, 'B': 8, 'C': 15, 'D': 10, 'E': 15, 'F': 8}
-        for col, width in column_widths.items():
-            worksheet.column_dimensions[col].width = width
-        
-        # 设置表头样式
-        from openpyxl.styles import Font, PatternFill, Alignment
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        for cell in worksheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
+    return df.sort_values('管道号', kind='stable').reset_index(drop=True)
+
+def report_rows(pipeline_data):
+    """按管道号排序逐行产出报告内容（列同REPORT_COLUMNS，顺序与build_report_frame一致）"""
+    for record in sorted(pipeline_data, key=operator.attrgetter('display_number')):
+        yield [
+            record.display_number,
+            record.nominal_diameter,
+            record.pipe_grade,
+            record.insulation_grade,
+            record.medium_name,
+            record.phase,
+            record.occurrences,
+            format_sources(record.sources),
+            record.grammar,
+            merged_label(record.merged),
+            pipe_length_value(record.pipe_length),
+        ]
+
+def export_report(pipeline_data, output_path, fmt='auto'):
+    """按指定格式导出报告（格式见pid_export，auto时按扩展名选择），逐行写出，返回写出的管道号数量"""
+    exporter = get_exporter(resolve_format(output_path, fmt))
+    count = exporter.write(output_path, ('管道数据表', REPORT_COLUMNS, REPORT_COLUMN_WIDTHS,
+                                         report_rows(pipeline_data)))
     
-    logger.info(f"成功保存Excel文件: {output_path}")
-    return df
+    logger.info(f"成功保存{exporter.description}: {output_path}")
+    return count
+
+def create_excel_output(pipeline_data, output_path):
+    """创建Excel输出，不生成DataFrame，逐行流式写入，返回写入的管道号数量"""
+    return export_report(pipeline_data, output_path, 'xlsx')
 
 def get_resource_path(relative_path):
     """获取资源文件路径（支持打包后的exe）"""
@@ -269,44 +581,213 @@ def get_resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
-def main():
-    """主函数"""
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="P&ID管道数据提取工具")
+    parser.add_argument('drawing', nargs='?', default=get_resource_path("test/test.dwg"),
+                        help="DWG/DXF图纸文件（默认: test/test.dwg）")
+    parser.add_argument('-c', '--codes', default=get_resource_path("test/code.xlsx"),
+                        help="介质代码Excel文件（默认: test/code.xlsx）")
+    parser.add_argument('--all-code-sheets', action='store_true',
+                        help="合并介质代码文件的所有工作表（默认只读取第一个）")
+    parser.add_argument('-o', '--output', default="pipeline_data.xlsx",
+                        help="输出文件（默认: pipeline_data.xlsx）")
+    parser.add_argument('-f', '--format', choices=['auto'] + list(EXPORTERS), default='auto',
+                        help="输出格式: xlsx=带样式的Excel, csv, ndjson=JSON Lines, "
+                             "parquet=Parquet（需要pyarrow）, auto=按输出文件扩展名选择")
+    parser.add_argument('--store', help="同时写入管道号数据库（SQLite，见pid_store.py）")
+    parser.add_argument('--project', help="写入数据库时的项目名称（默认保留原有名称）")
+    parser.add_argument('--backend', choices=['auto', 'com', 'dxf'], default='auto',
+                        help="文本提取后端: com=AutoCAD COM, dxf=直接读取DXF文件, auto=按扩展名选择")
+    parser.add_argument('--mode', choices=['scan', 'select'], default='scan',
+                        help="COM遍历方式: scan=逐实体遍历, select=过滤选择集只读取文本实体")
+    parser.add_argument('--entity-types', nargs='+', default=['TEXT', 'MTEXT', 'INSERT'],
+                        help="选择集实体类型（TEXT MTEXT INSERT）")
+    parser.add_argument('--layers', nargs='+', help="选择集图层过滤，支持通配符，如 PIPE* LINE-NO")
+    parser.add_argument('--min-height', type=float, help="选择集最小文字高度")
+    parser.add_argument('--max-height', type=float, help="选择集最大文字高度")
+    parser.add_argument('--block-depth', type=int, default=DEFAULT_BLOCK_DEPTH,
+                        help=f"块定义中静态文本的嵌套展开层数（COM，默认{DEFAULT_BLOCK_DEPTH}，0=只读取块属性）")
+    parser.add_argument('-g', '--grammars',
+                        help="编号规则配置文件（JSON），默认使用内置的标准规则")
+    parser.add_argument('--phase-rules', help="相态规则文件（JSON），默认使用内置规则")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="不做预筛选，所有文本都经过标准化和正则匹配")
+    parser.add_argument('--no-merge', action='store_true',
+                        help="不拼接拆分的管道号标注（按插入点把同一基线上相邻的文本片段连接后匹配）")
+    parser.add_argument('--pipe-lengths', action='store_true',
+                        help="估算每个管道号的管道长度（读取管道图层上的LINE/LWPOLYLINE）")
+    parser.add_argument('--pipe-layers', nargs='+', default=list(DEFAULT_PIPE_LAYERS),
+                        help=f"管道图层（支持通配符，默认: {' '.join(DEFAULT_PIPE_LAYERS)}）")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="分片并行提取的工作进程数（默认1，不分片）")
+    parser.add_argument('--shard-size', type=int,
+                        help="每个分片的大小（COM: 实体数，默认50000；DXF: 字节数，默认32MB）")
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR),
+                        help=f"提取结果缓存目录（默认: {DEFAULT_CACHE_DIR}）")
+    parser.add_argument('--cache-size', type=int, default=500, help="缓存容量上限（MB，默认500）")
+    parser.add_argument('--no-cache', action='store_true', help="不使用提取结果缓存")
+    parser.add_argument('--invalidate-cache', action='store_true', help="提取前清除该图纸的缓存")
+    parser.add_argument('--clear-cache', action='store_true', help="清空缓存目录后退出")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量匹配：按实体句柄和文本哈希复用上次的匹配结果（保存在缓存目录）")
+    parser.add_argument('--log-file', help="详细日志文件（包括逐个管道号的匹配记录）")
+    parser.add_argument('--progress', action='store_true',
+                        help="显示进度行（已处理实体数、速度、预计剩余时间），Ctrl+C取消时照常关闭图纸")
+    parser.add_argument('--daemon', action='store_true',
+                        help="提交给常驻提取服务执行，复用已启动的AutoCAD（见pid_daemon.py）")
+    return parser.parse_args(argv)
+
+def cache_from_args(args):
+    """根据命令行参数创建提取缓存，--no-cache时返回None"""
+    if args.no_cache:
+        return None
+    return ExtractionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+def backend_options_from_args(args, drawing_path, session_pool=None):
+    """根据命令行参数生成后端构造参数，session_pool只用于单进程提取（分片时各进程自行连接）"""
+    if resolve_backend(drawing_path, args.backend) != 'com':
+        return {}
+    selection_filter = SelectionFilter(args.entity_types, args.layers, args.min_height, args.max_height)
+    options = {'mode': args.mode, 'selection_filter': selection_filter, 'block_depth': args.block_depth}
+    if session_pool is not None and args.workers == 1:
+        options['session_pool'] = session_pool
+    return options
+
+def submit_to_daemon(argv, progress=None):
+    """把命令行参数（去掉--daemon）提交给常驻提取服务，返回是否成功
+
+    progress为接收服务端进度事件的回调（如ProgressLine）；Ctrl+C时请求服务取消当前任务。
+    """
+    from pid_daemon import DaemonClient, DaemonUnavailable
+
+    argv = [arg for arg in (sys.argv[1:] if argv is None else argv) if arg != '--daemon']
+    client = DaemonClient()
+    try:
+        result = client.submit(argv, progress=progress)
+    except DaemonUnavailable as e:
+        logger.error(str(e))
+        return False
+    except KeyboardInterrupt:
+        try:
+            client.cancel()
+            logger.warning("已请求提取服务取消当前任务")
+        except DaemonUnavailable as e:
+            logger.error(str(e))
+        return False
+    if result['cancelled']:
+        logger.warning("提取已取消")
+        return False
+    if result['error']:
+        logger.error(f"提取服务执行失败: {result['error']}")
+    logger.info(f"提取服务耗时 {result['elapsed']:.2f} s")
+    return not result['error'] and result['code'] == 0
+
+def main(argv=None, session_pool=None, progress=None):
+    """主函数，session_pool为常驻服务的CAD会话池（见pid_daemon）
+
+    progress为ProgressTracker（常驻服务转发给客户端），不指定且有--progress时在命令行显示进度行。
+    """
+    args = parse_args(argv)
+    with progress_line() if args.progress and progress is None else nullcontext() as line:
+        if args.daemon:
+            return 0 if submit_to_daemon(argv, line) else 1
+        if line is not None:
+            progress = ProgressTracker(line)
+        with verbose_log(args.log_file):
+            return run(args, session_pool, progress)
+
+def run(args, session_pool=None, progress=None):
+    """按解析后的命令行参数提取并导出报告，返回退出码（成功为0，出错或取消为1）
+
+    progress被取消（或Ctrl+C）时停止提取，不导出报告。
+    """
+    if args.clear_cache:
+        ExtractionCache(args.cache_dir).clear()
+        return 0
+    
     logger.info("开始提取P&ID管道数据...")
     
     # 配置文件路径
-    dwg_file = get_resource_path("test/test.dwg")
-    code_file = get_resource_path("test/code.xlsx")
-    output_file = "pipeline_data.xlsx"
+    dwg_file = args.drawing
+    code_file = args.codes
+    output_file = args.output
+    recognizer = load_recognizer(args.grammars)
+    classifier = load_classifier(args.phase_rules)
+    output_format = resolve_format(output_file, args.format)
+    if not EXPORTERS[output_format].available():
+        logger.error(f"输出格式 {output_format} 所需的依赖未安装")
+        return 1
     
-    # 提取文本
-    text_entities = extract_text_from_dwg(dwg_file)
+    # 加载介质代码（解析与提取同步进行，需要先加载）
+    medium_codes = load_medium_codes(code_file, None if args.all_code_sheets else 0)
     
-    if not text_entities:
-        logger.error("未能提取到任何文本")
-        return
+    # 流式提取文本、查找并解析管道号
+    cache = cache_from_args(args)
+    if cache and args.invalidate_cache:
+        cache.invalidate(dwg_file)
+    meter = StageMeter()
+    pipeline_index = PipelineIndex()
+    state = None
+    if args.incremental:
+        state = MatchState(dwg_file, recognizer.cache_key(), args.cache_dir)
+    tags = TagCollector(recognizer.prefilter) if args.pipe_lengths else None
+    try:
+        text_entities = iter_text_records(dwg_file, args.backend, cache, args.workers,
+                                          args.shard_size, progress=progress,
+                                          **backend_options_from_args(args, dwg_file, session_pool))
+        pipeline_data = list(stream_pipeline_records(text_entities, medium_codes, pipeline_index,
+                                                     recognizer, classifier,
+                                                     prefilter=not args.no_prefilter, meter=meter,
+                                                     state=state, merge=not args.no_merge, tags=tags))
+    except (ExtractionCancelled, KeyboardInterrupt):
+        logger.warning("提取已取消")
+        return 1
+    except Exception as e:
+        logger.error(f"提取文本失败: {e}")
+        return 1
+    if cache:
+        cache.log_stats()
+    if state:
+        state.log_stats()
+        state.save()
     
-    # 查找管道号
-    pipeline_numbers = find_pipeline_numbers(text_entities)
-    logger.info(f"找到 {len(pipeline_numbers)} 个管道号")
+    if not pipeline_index.text_count():
+        logger.error("未能提取到任何文本")
+        return 1
     
-    # 加载介质代码
-    medium_codes = load_medium_codes(code_file)
+    logger.info(f"提取了 {pipeline_index.text_count()} 个文本")
+    logger.info(f"找到并解析了 {len(pipeline_data)} 个管道号")
     
-    # 解析管道号
-    pipeline_data = []
-    for pipeline_number in pipeline_numbers:
-        parsed_data = parse_pipeline_number(pipeline_number, medium_codes)
-        if parsed_data:
-            pipeline_data.append(parsed_data)
+    status = 0
+    if tags is not None:
+        try:
+            backend = get_backend(resolve_backend(dwg_file, args.backend), progress=progress,
+                                  **backend_options_from_args(args, dwg_file, session_pool))
+            with meter.measure('管道长度', len(pipeline_data)):
+                measure_pipe_lengths(pipeline_data, backend.iter_polylines(dwg_file, args.pipe_layers), tags)
+        except (ExtractionCancelled, KeyboardInterrupt):
+            logger.warning("提取已取消")
+            return 1
+        except Exception as e:
+            # 仍导出不含管道长度的报告
+            logger.error(f"估算管道长度失败: {e}")
+            status = 1
     
-    logger.info(f"成功解析 {len(pipeline_data)} 个管道号")
+    if args.store:
+        from pid_store import LineStore
+        with meter.measure('写入数据库', len(pipeline_data)), LineStore(args.store) as store:
+            store.upsert_drawing(dwg_file, pipeline_data, args.project)
     
-    # 创建Excel输出
-    df = create_excel_output(pipeline_data, output_file)
+    # 导出报告
+    with meter.measure('写入报告', len(pipeline_data)):
+        count = export_report(pipeline_data, output_file, output_format)
+    meter.log_stats()
     
     print(f"\n处理完成！")
-    print(f"提取到 {len(df)} 个管道号")
+    print(f"提取到 {count} 个管道号")
     print(f"结果已保存到: {output_file}")
+    return status
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -39,6 +39,16 @@ a = Analysis(
         'threading',
         'tkinterdnd2',
         'unicodedata',
+        'pid_dxf',
+        'pid_backends',
+        'pid_cache',
+        'pid_extractor',
+        'pid_shard',
+        'pid_grammar',
+        'pid_phase', 'pid_records', 'pid_stream', 'pid_export', 'pid_store', 'pid_diff', 'pid_incremental',
+        'pid_spatial',
+        'pid_geometry',
+        'pid_session', 'pid_daemon', 'pid_logsink', 'pid_progress',
     ],
     hookspath=[],
     hooksconfig={},
@@ -8,20 +8,51 @@ P&ID管道数据提取工具 - GUI版本
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
-import re
-import pandas as pd
+import queue
+import time
 import logging
 import os
 import sys
 import json
-from datetime import datetime
+from collections import Counter
 from pathlib import Path
 from PIL import Image, ImageTk
 
+from pid_backends import SelectionFilter, resolve_backend
+from pid_cache import ExtractionCache
+from pid_export import EXPORTERS, available_formats
+from pid_extractor import (PipelineIndex, export_report, iter_text_records, load_medium_codes,
+                           stream_pipeline_records)
+from pid_logsink import DEFAULT_LOG_FILE, DEFAULT_MAX_LINES, LogSink, enable_verbose_log
+from pid_progress import ExtractionCancelled, ProgressTracker, format_progress
+from pid_session import SessionPool
+from pid_stream import StageMeter
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 流式处理时在日志中逐条显示的管道号数量，之后每秒输出一次进度
+STREAM_PREVIEW_COUNT = 20
+
+# 日志队列和进度刷新到界面的间隔（毫秒）
+LOG_TICK_MS = 50
+
+# 输出格式（界面显示 -> 导出格式名称），只列出依赖已安装的格式
+EXPORT_CHOICES = {"按扩展名": "auto"}
+EXPORT_CHOICES.update((f"{EXPORTERS[name].description}（{EXPORTERS[name].extension}）", name)
+                      for name in available_formats())
+
+# 可拖入的输出文件扩展名
+OUTPUT_EXTENSIONS = ['.xls'] + [EXPORTERS[name].extension for name in available_formats()] + ['.jsonl']
+
+# 提取方式（界面显示 -> 后端名称）
+BACKEND_CHOICES = {
+    "自动（按扩展名）": "auto",
+    "AutoCAD (COM)": "com",
+    "DXF文件（无需AutoCAD）": "dxf",
+}
+
 class PIDExtractorGUI:
     def __init__(self, root):
         self.root = root
@@ -32,6 +63,26 @@ class PIDExtractorGUI:
         self.dwg_file = tk.StringVar()
         self.code_file = tk.StringVar()
         self.output_file = tk.StringVar()
+        self.backend = tk.StringVar(value=next(iter(BACKEND_CHOICES)))
+        self.output_format = tk.StringVar(value=next(iter(EXPORT_CHOICES)))
+        self.use_selection_set = tk.BooleanVar(value=False)
+        self.layer_filter = tk.StringVar()
+        self.use_cache = tk.BooleanVar(value=True)
+        self.use_daemon = tk.BooleanVar(value=False)
+        
+        # 当前提取的进度跟踪（取消按钮调用cancel()）；进度事件在后台线程中产生，
+        # 只保存最新的一个，由界面线程定时显示（见show_progress）
+        self.progress_tracker = None
+        self.progress_event = None
+        self.shown_event = None
+        
+        # 多次提取之间保留AutoCAD会话；COM对象只能在创建它的线程中使用，
+        # 提取任务都在同一个后台线程中依次执行
+        self.session_pool = SessionPool(log=self.log_message)
+        self.tasks = queue.Queue()
+        self.worker = threading.Thread(target=self.run_tasks, daemon=True)
+        self.worker.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # 设置默认值
         self.code_file.set("test/code.xlsx")
@@ -43,7 +94,18 @@ class PIDExtractorGUI:
         # 加载最近使用的文件
         self.load_recent_files()
         
+        # 日志先放入队列，界面线程定时批量显示，最多保留log_max_lines行；
+        # 完整日志（包括逐个管道号的匹配记录）写入详细日志文件
+        self.log_sink = LogSink(self.log_max_lines)
+        try:
+            enable_verbose_log(DEFAULT_LOG_FILE)
+            self.log_file = DEFAULT_LOG_FILE
+        except OSError as e:
+            print(f"无法写入日志文件: {e}")
+            self.log_file = None
+        
         self.create_widgets()
+        self.root.after(LOG_TICK_MS, self.refresh)
         # 延迟设置拖拽，等待窗口完全初始化
         self.root.after(100, self.setup_drag_drop)
         
@@ -62,7 +124,7 @@ class PIDExtractorGUI:
         title_label.grid(row=1, column=0, columnspan=3, pady=(0, 20))
         
         # DWG文件选择
-        ttk.Label(main_frame, text="DWG文件:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, text="DWG/DXF文件:").grid(row=2, column=0, sticky=tk.W, pady=5)
         dwg_frame = ttk.Frame(main_frame)
         dwg_frame.grid(row=2, column=1, columnspan=2, sticky=(tk.W, tk.E), padx=5, pady=5)
         
@@ -117,25 +179,57 @@ class PIDExtractorGUI:
         self.output_recent.grid(row=0, column=1, padx=(5,0))
         self.output_recent.bind('<<ComboboxSelected>>', lambda e: self.output_file.set(self.output_recent.get()))
         ttk.Button(output_frame, text="浏览", command=self.select_output_file).grid(row=0, column=2, padx=(5,0))
+        ttk.Combobox(output_frame, textvariable=self.output_format, values=list(EXPORT_CHOICES),
+                     state="readonly", width=18).grid(row=0, column=3, padx=(5,0))
         
         self.output_drop_frame.columnconfigure(0, weight=1)
         output_frame.columnconfigure(0, weight=1)
         
-        # 提取按钮
-        extract_button = ttk.Button(main_frame, text="开始提取", command=self.start_extraction)
-        extract_button.grid(row=5, column=0, columnspan=3, pady=20)
-        
-        # 进度条
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        # 提取选项
+        ttk.Label(main_frame, text="提取方式:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        options_frame = ttk.Frame(main_frame)
+        options_frame.grid(row=5, column=1, columnspan=2, sticky=(tk.W, tk.E), padx=5, pady=5)
+        self.options_frame = options_frame
+        
+        backend_combo = ttk.Combobox(options_frame, textvariable=self.backend,
+                                     values=list(BACKEND_CHOICES), state="readonly", width=22)
+        backend_combo.grid(row=0, column=0, sticky=tk.W)
+        
+        # COM选择集过滤：只读取指定图层的文本实体
+        ttk.Checkbutton(options_frame, text="选择集过滤", variable=self.use_selection_set).grid(
+            row=0, column=1, padx=(10, 0))
+        ttk.Label(options_frame, text="图层:").grid(row=0, column=2, padx=(10, 0))
+        ttk.Entry(options_frame, textvariable=self.layer_filter, width=15).grid(row=0, column=3, padx=(5, 0))
+        
+        # 提取结果缓存：未修改的图纸直接使用上次的结果
+        ttk.Checkbutton(options_frame, text="使用缓存", variable=self.use_cache).grid(
+            row=0, column=4, padx=(10, 0))
+        ttk.Button(options_frame, text="清空缓存", command=self.clear_cache).grid(row=0, column=5, padx=(5, 0))
+        
+        # 提交给常驻提取服务（pid_daemon.py serve）执行
+        ttk.Checkbutton(options_frame, text="常驻服务", variable=self.use_daemon).grid(
+            row=0, column=6, padx=(10, 0))
+        
+        # 提取和取消按钮
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=6, column=0, columnspan=3, pady=20)
+        self.extract_button = ttk.Button(button_frame, text="开始提取", command=self.start_extraction)
+        self.extract_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="取消", command=self.cancel_extraction,
+                                        state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
+        # 进度条：收到第一个进度事件前（连接AutoCAD、打开图纸）为不确定模式
+        self.progress = ttk.Progressbar(main_frame, mode='indeterminate', maximum=100)
+        self.progress.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
         
         # 状态标签
-        self.status_label = ttk.Label(main_frame, text="请选择DWG文件开始提取")
-        self.status_label.grid(row=7, column=0, columnspan=3, pady=10)
+        self.status_label = ttk.Label(main_frame, text="请选择DWG/DXF文件开始提取")
+        self.status_label.grid(row=8, column=0, columnspan=3, pady=10)
         
         # 结果显示区域
         result_frame = ttk.LabelFrame(main_frame, text="提取结果", padding="10")
-        result_frame.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        result_frame.grid(row=9, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         
         # 结果文本框
         self.result_text = tk.Text(result_frame, height=10, width=70)
@@ -149,7 +243,7 @@ class PIDExtractorGUI:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(8, weight=1)
+        main_frame.rowconfigure(9, weight=1)
         result_frame.columnconfigure(0, weight=1)
         result_frame.rowconfigure(0, weight=1)
         
@@ -191,19 +285,21 @@ class PIDExtractorGUI:
             'code': [],
             'output': []
         }
+        self.log_max_lines = DEFAULT_MAX_LINES
         
         try:
             if self.config_file.exists():
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
                     self.recent_files = config.get('recent_files', self.recent_files)
+                    self.log_max_lines = max(100, int(config.get('log_max_lines', DEFAULT_MAX_LINES)))
         except Exception as e:
             print(f"无法加载配置文件: {e}")
     
     def save_recent_files(self):
         """保存最近使用的文件"""
         try:
-            config = {'recent_files': self.recent_files}
+            config = {'recent_files': self.recent_files, 'log_max_lines': self.log_max_lines}
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=2)
         except Exception as e:
@@ -246,7 +342,7 @@ class PIDExtractorGUI:
             
             # 为DWG文件区域设置拖拽
             self.dwg_drop_frame.drop_target_register(DND_FILES)
-            self.dwg_drop_frame.dnd_bind('<<Drop>>', create_drop_handler(self.dwg_file, 'dwg', ['.dwg']))
+            self.dwg_drop_frame.dnd_bind('<<Drop>>', create_drop_handler(self.dwg_file, 'dwg', ['.dwg', '.dxf']))
             self.dwg_drop_frame.dnd_bind('<<DragEnter>>', on_drag_enter)
             self.dwg_drop_frame.dnd_bind('<<DragLeave>>', on_drag_leave)
             
@@ -258,7 +354,7 @@ class PIDExtractorGUI:
             
             # 为输出文件区域设置拖拽
             self.output_drop_frame.drop_target_register(DND_FILES)
-            self.output_drop_frame.dnd_bind('<<Drop>>', create_drop_handler(self.output_file, 'output', ['.xlsx', '.xls']))
+            self.output_drop_frame.dnd_bind('<<Drop>>', create_drop_handler(self.output_file, 'output', OUTPUT_EXTENSIONS))
             self.output_drop_frame.dnd_bind('<<DragEnter>>', on_drag_enter)
             self.output_drop_frame.dnd_bind('<<DragLeave>>', on_drag_leave)
             
@@ -303,8 +399,8 @@ class PIDExtractorGUI:
             initialdir = os.path.dirname(self.recent_files['dwg'][0])
         
         filename = filedialog.askopenfilename(
-            title="选择DWG文件",
-            filetypes=[("DWG files", "*.dwg"), ("All files", "*.*")],
+            title="选择DWG/DXF文件",
+            filetypes=[("CAD files", "*.dwg *.dxf"), ("DWG files", "*.dwg"), ("DXF files", "*.dxf"), ("All files", "*.*")],
             initialdir=initialdir
         )
         if filename:
@@ -337,7 +433,8 @@ class PIDExtractorGUI:
         filename = filedialog.asksaveasfilename(
             title="选择输出文件",
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            filetypes=[(EXPORTERS[name].description, f"*{EXPORTERS[name].extension}")
+                       for name in available_formats()] + [("All files", "*.*")],
             initialdir=initialdir
         )
         if filename:
@@ -354,7 +451,7 @@ class PIDExtractorGUI:
     def start_extraction(self):
         # 验证输入
         if not self.dwg_file.get():
-            messagebox.showerror("错误", "请选择DWG文件")
+            messagebox.showerror("错误", "请选择DWG/DXF文件")
             return
             
         if not self.code_file.get():
@@ -366,315 +463,219 @@ class PIDExtractorGUI:
             return
             
         # 在新线程中运行提取
+        self.progress_tracker = ProgressTracker(self.on_progress)
+        self.progress_event = self.shown_event = None
+        self.progress.config(mode='indeterminate', value=0)
         self.progress.start()
+        self.extract_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
         self.status_label.config(text="正在提取数据...")
         self.result_text.delete(1.0, tk.END)
         
-        thread = threading.Thread(target=self.extract_data)
-        thread.daemon = True
-        thread.start()
-        
+        self.tasks.put(self.extract_data)
+        
+    def cancel_extraction(self):
+        """取消按钮：请求停止提取，提取循环在下一个实体处停止并关闭图纸"""
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_label.config(text="正在取消...")
+        if self.progress_tracker is not None:
+            self.progress_tracker.cancel()
+        if self.use_daemon.get():
+            from pid_daemon import DaemonClient, DaemonUnavailable
+            try:
+                DaemonClient().cancel()
+            except DaemonUnavailable as e:
+                self.log_message(f"{e}")
+        
+    def on_progress(self, event):
+        """后台线程：保存最新的进度事件"""
+        self.progress_event = event
+        
+    def run_tasks(self):
+        """后台线程：依次执行提取任务，收到None时回收CAD会话后退出"""
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            task()
+        self.session_pool.close()
+        
+    def on_close(self):
+        """关闭窗口：取消正在进行的提取，等待后台线程关闭图纸、回收CAD会话（最多等待几秒）"""
+        if self.progress_tracker is not None:
+            self.progress_tracker.cancel()
+        self.tasks.put(None)
+        self.worker.join(timeout=5)
+        self.root.destroy()
+        
+    def clear_cache(self):
+        """清空提取结果缓存"""
+        try:
+            ExtractionCache(log=self.log_message).clear()
+            messagebox.showinfo("成功", "缓存已清空")
+        except Exception as e:
+            messagebox.showerror("错误", f"清空缓存失败: {e}")
+            
     def log_message(self, message):
-        """线程安全的日志记录"""
-        self.root.after(0, lambda: self.result_text.insert(tk.END, f"{datetime.now().strftime('%H:%M:%S')} - {message}\n"))
-        self.root.after(0, lambda: self.result_text.see(tk.END))
+        """线程安全的日志记录：放入队列，由界面线程定时显示（见flush_log），同时写入详细日志文件"""
+        self.log_sink(message)
+        logger.debug(message)
+        
+    def refresh(self):
+        """界面线程：定时显示日志和进度"""
+        self.flush_log()
+        self.show_progress()
+        self.root.after(LOG_TICK_MS, self.refresh)
+        
+    def show_progress(self):
+        """显示最新的进度事件：进度条、已处理数量、速度和预计剩余时间"""
+        event = self.progress_event
+        if event is None or event is self.shown_event or self.progress_tracker is None:
+            return
+        self.shown_event = event
+        if str(self.progress.cget('mode')) != 'determinate':
+            self.progress.stop()
+            self.progress.config(mode='determinate')
+        self.progress.config(value=event.fraction * 100)
+        if not self.progress_tracker.cancelled:
+            self.status_label.config(text=format_progress(event))
+        
+    def flush_log(self):
+        """界面线程：取出队列中的日志一次插入，超过log_max_lines行时删除最早的行"""
+        lines, dropped = self.log_sink.drain()
+        if lines:
+            if dropped:
+                lines.insert(0, f"…… 省略 {dropped} 行" + (f"（完整日志见 {self.log_file}）" if self.log_file else ""))
+            text = self.result_text
+            text.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(text.index("end-1c").split(".")[0]) - 1 - self.log_max_lines
+            if excess > 0:
+                text.delete("1.0", f"{excess + 1}.0")
+            text.see(tk.END)
         
     def extract_data(self):
+        if self.use_daemon.get():
+            self.extract_with_daemon()
+            return
         try:
             self.log_message("开始提取P&ID管道数据...")
             
-            # 提取文本
-            text_entities = self.extract_text_from_dwg(self.dwg_file.get())
+            # 加载介质代码（解析与提取同步进行，需要先加载）
+            medium_codes = load_medium_codes(self.code_file.get())
+            self.log_message(f"加载了 {len(medium_codes)} 个介质代码")
             
-            if not text_entities:
+            # 流式提取文本、查找并解析管道号，找到的管道号在提取过程中即显示
+            cache = ExtractionCache(log=self.log_message) if self.use_cache.get() else None
+            text_entities = self.extract_text(self.dwg_file.get(), cache)
+            meter = StageMeter()
+            pipeline_index = PipelineIndex()
+            pipeline_data = []
+            last_report = time.perf_counter()
+            for record in stream_pipeline_records(text_entities, medium_codes, pipeline_index,
+                                                  meter=meter, log=self.log_message):
+                pipeline_data.append(record)
+                if len(pipeline_data) <= STREAM_PREVIEW_COUNT:
+                    self.log_message(f"找到管道号: {record.display_number}（{record.medium_name}）")
+                elif time.perf_counter() - last_report >= 1.0:
+                    last_report = time.perf_counter()
+                    self.log_message(f"已处理 {pipeline_index.text_count()} 个文本, "
+                                     f"找到 {len(pipeline_data)} 个管道号...")
+            if cache:
+                cache.log_stats()
+            
+            if not pipeline_index.text_count():
                 self.log_message("未能提取到任何文本")
                 self.extraction_complete(False)
                 return
                 
-            self.log_message(f"提取了 {len(text_entities)} 个文本实体")
-            
-            # 查找管道号
-            pipeline_numbers = self.find_pipeline_numbers(text_entities)
-            self.log_message(f"找到 {len(pipeline_numbers)} 个管道号")
-            
-            # 加载介质代码
-            medium_codes = self.load_medium_codes(self.code_file.get())
-            self.log_message(f"加载了 {len(medium_codes)} 个介质代码")
-            
-            # 解析管道号
-            pipeline_data = []
-            for pipeline_number in pipeline_numbers:
-                parsed_data = self.parse_pipeline_number(pipeline_number, medium_codes)
-                if parsed_data:
-                    pipeline_data.append(parsed_data)
-                    
+            self.log_message(f"提取了 {pipeline_index.text_count()} 个文本实体")
             self.log_message(f"成功解析 {len(pipeline_data)} 个管道号")
             
-            # 创建Excel输出
-            df = self.create_excel_output(pipeline_data, self.output_file.get())
+            # 导出报告
+            output_format = EXPORT_CHOICES.get(self.output_format.get(), "auto")
+            with meter.measure('写入报告', len(pipeline_data)):
+                export_report(pipeline_data, self.output_file.get(), output_format)
+            meter.log_stats(self.log_message)
             
             # 统计相态
-            phase_counts = df['相态'].value_counts()
+            phase_counts = Counter(record.phase for record in pipeline_data)
             self.log_message("相态统计:")
-            for phase, count in phase_counts.items():
+            for phase, count in phase_counts.most_common():
                 self.log_message(f"  {phase}: {count}个")
             
             self.log_message(f"提取完成！结果已保存到: {self.output_file.get()}")
             self.extraction_complete(True)
             
+        except ExtractionCancelled:
+            self.log_message("提取已取消，未生成报告")
+            self.extraction_complete(False, cancelled=True)
         except Exception as e:
             self.log_message(f"提取过程中发生错误: {str(e)}")
             self.extraction_complete(False)
             
-    def extraction_complete(self, success):
+    def extract_with_daemon(self):
+        """按界面设置生成命令行参数，提交给常驻提取服务执行"""
+        from pid_daemon import DaemonClient, DaemonUnavailable
+        
+        argv = [self.dwg_file.get(), "-c", self.code_file.get(), "-o", self.output_file.get(),
+                "-f", EXPORT_CHOICES.get(self.output_format.get(), "auto"),
+                "--backend", BACKEND_CHOICES.get(self.backend.get(), "auto")]
+        if self.use_selection_set.get():
+            layers = [layer.strip() for layer in self.layer_filter.get().split(",") if layer.strip()]
+            argv += ["--mode", "select"] + (["--layers"] + layers if layers else [])
+        if not self.use_cache.get():
+            argv.append("--no-cache")
+        try:
+            self.log_message("提交给常驻提取服务...")
+            result = DaemonClient().submit(argv, log=self.log_message, progress=self.on_progress)
+        except DaemonUnavailable as e:
+            self.log_message(f"{e}")
+            self.extraction_complete(False)
+            return
+        if result['cancelled']:
+            self.log_message("提取已取消，未生成报告")
+            self.extraction_complete(False, cancelled=True)
+            return
+        if result['error']:
+            self.log_message(f"提取服务执行失败: {result['error']}")
+        else:
+            self.log_message(f"提取完成（{result['elapsed']:.1f} s）！结果已保存到: {self.output_file.get()}")
+        self.extraction_complete(not result['error'] and result['code'] == 0)
+            
+    def extraction_complete(self, success, cancelled=False):
         """提取完成后的处理"""
-        self.root.after(0, lambda: self.progress.stop())
-        if success:
+        self.root.after(0, self.reset_progress, success)
+        if cancelled:
+            self.root.after(0, lambda: self.status_label.config(text="已取消"))
+        elif success:
             self.root.after(0, lambda: self.status_label.config(text="提取完成！"))
             self.root.after(0, lambda: messagebox.showinfo("成功", "数据提取完成！"))
         else:
             self.root.after(0, lambda: self.status_label.config(text="提取失败"))
             self.root.after(0, lambda: messagebox.showerror("错误", "数据提取失败，请查看日志"))
             
-    def extract_text_from_dwg(self, dwg_path):
-        """从DWG文件中提取文本"""
-        try:
-            from pyautocad import Autocad
-            
-            # 连接到AutoCAD
-            acad = Autocad(create_if_not_exists=True)
-            self.log_message("成功连接到AutoCAD")
-            
-            # 打开文件
-            abs_path = os.path.abspath(dwg_path)
-            self.log_message(f"打开文件: {abs_path}")
-            doc = acad.app.Documents.Open(abs_path)
-            self.log_message(f"成功打开文件: {doc.Name}")
-            
-            # 获取模型空间
-            model_space = doc.ModelSpace
-            self.log_message(f"模型空间实体数量: {model_space.Count}")
-            
-            # 提取文本实体
-            text_entities = []
-            
-            # 遍历实体
-            total_entities = model_space.Count
-            for i in range(total_entities):
-                try:
-                    # 显示进度
-                    if i % 10000 == 0:
-                        self.log_message(f"处理进度: {i}/{total_entities} ({i/total_entities*100:.1f}%)")
-                    
-                    entity = model_space.Item(i)
-                    entity_type = entity.ObjectName
-                    
-                    # 只处理文本相关的实体类型，提高效率
-                    if entity_type in ["AcDbText", "AcDbMText", "AcDbBlockReference"]:
-                        # 提取文本
-                        text_content = None
-                        if entity_type == "AcDbText":
-                            text_content = entity.TextString
-                        elif entity_type == "AcDbMText":
-                            text_content = entity.TextString
-                        elif entity_type == "AcDbBlockReference":
-                            # 处理块参照中的属性
-                            try:
-                                if hasattr(entity, 'GetAttributes'):
-                                    attributes = entity.GetAttributes()
-                                    for attr in attributes:
-                                        if hasattr(attr, 'TextString'):
-                                            text_entities.append(attr.TextString)
-                            except:
-                                pass
-                        
-                        if text_content:
-                            text_entities.append(text_content)
-                        
-                except Exception:
-                    continue
-            
-            # 关闭文档
-            doc.Close(False)
-            self.log_message("已关闭文档")
-            
-            return text_entities
-            
-        except Exception as e:
-            self.log_message(f"提取文本失败: {e}")
-            return []
-            
-    def normalize_text(self, s):
-        """文本标准化，清理不可见字符"""
-        import unicodedata
-        s = str(s).strip()
-        s = unicodedata.normalize('NFKC', s)  # Unicode标准化
-        s = s.replace('\x00', '')  # 清理NULL字符
-        s = re.sub(r'[\u2010-\u2015]', '-', s)  # Unicode连字符改为ASCII连字符
-        s = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', s)  # 清理控制字符
-        return s
-
-    def find_pipeline_numbers(self, text_entities):
-        """查找管道号"""
-        # 自检测试
-        test_string = '4101BRR-02457-200-03CBMB1-H'
-        pipeline_pattern = r'(\d{4}[A-Z0-9]{1,4})-([A-Z0-9]{4,6})-(\d{2,3})-(\d{2}[A-Z0-9]{3,6})-([A-Z]{1,2})'
-        self_check = bool(re.search(pipeline_pattern, test_string))
-        self.log_message(f"正则表达式自检结果: {self_check}")
-        
-        pipeline_numbers = []
-        
-        # 调试：打印前10个文本的详细信息
-        self.log_message("开始分析前10个文本实体...")
-        for idx, text in enumerate(text_entities[:10]):
-            self.log_message(f"文本{idx}: {repr(text)} | 十六进制: {[hex(ord(c)) for c in str(text)[:20]]}")
-        
-        for text in text_entities:
-            # 标准化文本
-            normalized_text = self.normalize_text(text)
-            
-            # 查找管道号
-            matches = re.findall(pipeline_pattern, normalized_text)
-            for match in matches:
-                pipeline_number = '-'.join(match)
-                if pipeline_number not in pipeline_numbers:
-                    pipeline_numbers.append(pipeline_number)
-                    self.log_message(f"找到管道号: {pipeline_number} (原文本: {repr(text[:50])})")
-        
-        return pipeline_numbers
-        
-    def load_medium_codes(self, code_file_path):
-        """从Excel文件加载介质代码映射"""
-        try:
-            df = pd.read_excel(code_file_path, header=None)
-            medium_codes = {}
-            
-            for i, row in df.iterrows():
-                code = row.iloc[0]
-                name = row.iloc[1]
-                
-                # 处理代码列
-                if pd.isna(code):
-                    # 特殊处理氢氧化钠溶液
-                    if not pd.isna(name) and "氢氧化钠溶液" in str(name):
-                        code = "NA"
-                    else:
-                        continue
-                else:
-                    code = str(code).strip()
-                
-                # 处理名称列
-                if pd.isna(name):
-                    continue
-                name = str(name).strip()
-                
-                if code and name and code != 'nan' and name != 'nan':
-                    medium_codes[code] = name
-                    
-            return medium_codes
-            
-        except Exception as e:
-            self.log_message(f"无法加载介质代码文件: {e}")
-            return {}
-            
-    def determine_phase(self, medium_name):
-        """根据介质名称判断相态"""
-        # 气相关键词
-        gas_keywords = ['蒸汽', '气', '空气', '氢气', '氮气', '氧气', '二氧化碳', '天然气', '废气']
-        
-        # 液相关键词
-        liquid_keywords = ['水', '油', '液', '溶液', '酸', '碱', '汽油', '柴油', '凝结']
-        
-        # 检查是否包含气相关键词
-        for keyword in gas_keywords:
-            if keyword in medium_name:
-                return '气相'
-        
-        # 检查是否包含液相关键词
-        for keyword in liquid_keywords:
-            if keyword in medium_name:
-                return '液相'
-        
-        # 默认返回未知相态
-        return '未知相态'
-        
-    def parse_pipeline_number(self, pipeline_number, medium_codes):
-        """解析管道号"""
-        parts = pipeline_number.split('-')
-        if len(parts) >= 5:
-            # 新格式: 装置号和介质代码-管道号-管道尺寸-管道等级-保温等级
-            unit_and_medium = parts[0]  # 4101BRR
-            pipe_number = parts[1]      # 02457
-            pipe_size = parts[2]        # 200
-            pipe_grade = parts[3]       # 03CBMB1
-            insulation_grade = parts[4] # H
-            
-            # 从装置号和介质代码中提取介质代码（后1-4位字母数字）
-            unit_number = unit_and_medium[:4]  # 4101
-            medium_code = unit_and_medium[4:]  # BRR, D, S18, CSM
-            
-            medium_name = medium_codes.get(medium_code, f"未知介质({medium_code})")
-            phase = self.determine_phase(medium_name)
-            
-            # 简化的管道号：装置号和介质代码-管道编号
-            simplified_pipeline_number = f"{unit_number}{medium_code}-{pipe_number}"
-            
-            return {
-                'pipeline_number': simplified_pipeline_number,
-                'unit_number': unit_number,
-                'pipe_number': pipe_number,
-                'nominal_diameter': pipe_size,
-                'pipe_grade': pipe_grade,
-                'insulation_grade': insulation_grade,
-                'medium_code': medium_code,
-                'medium_name': medium_name,
-                'phase': phase
-            }
-        return None
-        
-    def create_excel_output(self, pipeline_data, output_path):
-        """创建Excel输出"""
-        # 创建DataFrame
-        df_data = []
-        for data in pipeline_data:
-            if data:
-                df_data.append([
-                    data['pipeline_number'],
-                    data['nominal_diameter'],
-                    data['pipe_grade'],
-                    data['insulation_grade'],
-                    data['medium_name'],
-                    data['phase']
-                ])
-        
-        columns = ['管道号', '管径', '管道等级', '保温等级', '介质名称', '相态']
-        df = pd.DataFrame(df_data, columns=columns)
-        
-        # 按管道号排序
-        df = df.sort_values('管道号').reset_index(drop=True)
-        
-        # 保存为Excel
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='管道数据表', index=False)
-            
-            # 设置列宽
-            worksheet = writer.sheets['管道数据表']
-            column_widths = {'A': 20, 'B': 8, 'C': 15, 'D': 10, 'E': 15, 'F': 8}
-            for col, width in column_widths.items():
-                worksheet.column_dimensions[col].width = width
-            
-            # 设置表头样式
-            from openpyxl.styles import Font, PatternFill, Alignment
-            header_font = Font(bold=True, color='FFFFFF')
-            header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-            header_alignment = Alignment(horizontal='center', vertical='center')
-            
-            for cell in worksheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-        
-        return df
+    def reset_progress(self, success):
+        """界面线程：停止进度条，恢复按钮"""
+        self.show_progress()
+        self.progress.stop()
+        done = self.shown_event.fraction * 100 if self.shown_event else 0
+        self.progress.config(mode='determinate', value=100 if success else done)
+        self.progress_tracker = None
+        self.extract_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+            
+    def extract_text(self, drawing_path, cache=None):
+        """按所选提取方式逐条产出图纸中非空的文本记录，提取失败时抛出异常"""
+        backend = resolve_backend(drawing_path, BACKEND_CHOICES.get(self.backend.get(), "auto"))
+        options = {}
+        if backend == "com" and self.use_selection_set.get():
+            # 图层以逗号分隔，支持AutoCAD通配符
+            layers = [layer.strip() for layer in self.layer_filter.get().split(",") if layer.strip()]
+            options = {"mode": "select", "selection_filter": SelectionFilter(layers=layers)}
+        if backend == "com":
+            options["session_pool"] = self.session_pool
+        return iter_text_records(drawing_path, backend, cache, log=self.log_message,
+                                 progress=self.progress_tracker, **options)
 
 def main():
     try:
@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟AutoCAD COM对象模型
+在没有AutoCAD的环境（如Linux）中对遍历策略做基准测试和回归测试
+
+实体按索引确定性生成，不占用与实体数量成正比的内存，可模拟上百万实体。
+每次属性读取或方法调用计为一次COM往返，并可设置每次往返的模拟延迟。
+"""
+
+import fnmatch
+import operator
+import time
+
+from pid_backends import DEFAULT_BLOCK_DEPTH, ComBackend
+
+# 非文本实体类型
+GEOMETRY_TYPES = ("AcDbLine", "AcDbArc", "AcDbPolyline", "AcDbHatch", "AcDbCircle")
+
+# 管道线实体类型：第i个实体从(i % 1000, i // 1000)沿x方向延伸1个单位，
+# 同一行中相邻的管道线首尾相连
+CURVE_TYPES = ("AcDbLine", "AcDbPolyline")
+
+# COM ObjectName -> DXF实体名（选择集过滤使用）
+DXF_NAMES = {
+    "AcDbText": "TEXT",
+    "AcDbMText": "MTEXT",
+    "AcDbBlockReference": "INSERT",
+    "AcDbLine": "LINE",
+    "AcDbArc": "ARC",
+    "AcDbPolyline": "LWPOLYLINE",
+    "AcDbHatch": "HATCH",
+    "AcDbCircle": "CIRCLE",
+}
+
+# 选择集过滤中-4组码的关系运算符
+_RELATIONAL_OPERATORS = {
+    "=": operator.eq, "!=": operator.ne, "<>": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+# 生成管道号时使用的介质代码和管径
+_MEDIUM_CODES = ("BRR", "BRC", "CL", "CSL", "D", "S18", "W")
+_PIPE_SIZES = ("50", "80", "100", "150", "200", "250")
+
+NOISE_TEXTS = ("P-101A", "FV-2001", "DN200", "NOTE 3", "VALVE", "1:50", "PIPE RACK")
+
+# 块定义中实体的索引起点（第k个块定义的第j个实体为DEFINITION_BASE + k * 16 + j），
+# 与ModelSpace实体及属性的索引不重叠
+DEFINITION_BASE = 1 << 40
+
+
+def _mix(i, seed):
+    """整数哈希，返回[0, 1)的伪随机数"""
+    h = (i * 2654435761 + seed * 40503 + 0x9E3779B9) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x45D9F3B) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h / 4294967296.0
+
+
+def fake_pipeline_number(n):
+    """生成第n个模拟管道号"""
+    return (f"{4101 + n % 5}{_MEDIUM_CODES[n % len(_MEDIUM_CODES)]}-{n % 100000:05d}-"
+            f"{_PIPE_SIZES[n % len(_PIPE_SIZES)]}-03CBMB1-H")
+
+
+class FakeComModel:
+    """模拟图纸内容及COM调用统计
+
+    参数:
+        entity_count: ModelSpace实体数量
+        text_ratio / mtext_ratio / block_ratio: 各类文本实体占比，其余为几何实体
+        attributes_per_block: 每个块参照的属性数量
+        block_count: 块定义数量，第i个实体为块参照时引用第i % block_count个块定义
+        definition_texts: 每个块定义中的静态文本数量（TEXT和常量属性定义交替，最多14个），
+            另有一个非常量属性定义（值不应被提取）
+        nested_ratio: 块定义中嵌套下一个块定义的块参照的比例
+        line_number_ratio: 文本中管道号所占比例
+        latency: 每次COM往返的模拟延迟（秒）
+        seed: 随机种子
+    """
+
+    def __init__(self, entity_count=100000, text_ratio=0.05, mtext_ratio=0.02, block_ratio=0.03,
+                 attributes_per_block=2, block_count=20, definition_texts=0, nested_ratio=0.0,
+                 line_number_ratio=0.3, latency=0.0, seed=0):
+        self.entity_count = entity_count
+        self.text_ratio = text_ratio
+        self.mtext_ratio = mtext_ratio
+        self.block_ratio = block_ratio
+        self.attributes_per_block = attributes_per_block
+        self.block_count = max(1, block_count)
+        self.definition_texts = min(definition_texts, 14)
+        self.nested_ratio = nested_ratio
+        self.line_number_ratio = line_number_ratio
+        self.latency = latency
+        self.seed = seed
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = 0
+        self.server_time = 0.0
+        self._owed_latency = 0.0
+
+    @property
+    def com_time(self):
+        """模拟COM往返消耗的总时间（秒）"""
+        return self.calls * self.latency
+
+    def call(self):
+        """记录一次COM往返
+
+        真实的COM调用是在等待AutoCAD进程，不占用客户端CPU，因此用sleep模拟；
+        time.sleep精度不足以表示微秒级延迟，累计满1毫秒后再统一休眠，
+        多睡的时间从后续延迟中扣除，使总延迟与calls * latency一致。
+        """
+        self.calls += 1
+        if self.latency:
+            self._owed_latency += self.latency
+            if self._owed_latency >= 0.001:
+                start = time.perf_counter()
+                time.sleep(self._owed_latency)
+                self._owed_latency -= time.perf_counter() - start
+
+    def entity_type(self, i):
+        r = _mix(i, self.seed)
+        if r < self.text_ratio:
+            return "AcDbText"
+        r -= self.text_ratio
+        if r < self.mtext_ratio:
+            return "AcDbMText"
+        r -= self.mtext_ratio
+        if r < self.block_ratio:
+            return "AcDbBlockReference"
+        return GEOMETRY_TYPES[int(_mix(i, self.seed + 1) * len(GEOMETRY_TYPES))]
+
+    def is_line_number(self, i):
+        return _mix(i, self.seed + 2) < self.line_number_ratio
+
+    def text_for(self, i):
+        if self.is_line_number(i):
+            return fake_pipeline_number(i)
+        return NOISE_TEXTS[i % len(NOISE_TEXTS)]
+
+    def layer_for(self, i, entity_type):
+        if entity_type in ("AcDbText", "AcDbMText", "AcDbAttribute"):
+            return "LINE-NO" if self.is_line_number(i) else "TEXT"
+        if entity_type == "AcDbBlockReference":
+            return "SYMBOL"
+        return "PIPE"
+
+    def height_for(self, i):
+        return 3.5 if self.is_line_number(i) else 2.5
+
+    def dxf_value(self, i, code):
+        """实体的DXF组码值，供选择集过滤使用"""
+        entity_type = self.entity_type(i)
+        if code == 0:
+            return DXF_NAMES[entity_type]
+        if code == 8:
+            return self.layer_for(i, entity_type)
+        if code == 40 and entity_type in ("AcDbText", "AcDbMText"):
+            return self.height_for(i)
+        if code == 66 and entity_type == "AcDbBlockReference":
+            return 1 if self.attributes_per_block else 0
+        return None
+
+    def matches_filter(self, i, filter_type, filter_data):
+        """按选择集过滤条件判断实体是否入选
+
+        支持顶层条件之间的隐式AND、逗号分隔和通配符的字符串匹配，
+        以及-4组码指定的关系运算符（作用于下一个数值条件）。
+        """
+        op = None
+        for code, expected in zip(filter_type, filter_data):
+            if code == -4:
+                op = _RELATIONAL_OPERATORS[expected]
+                continue
+            value = self.dxf_value(i, code)
+            if value is None:
+                return False
+            if isinstance(expected, str):
+                patterns = expected.upper().split(",")
+                if not any(fnmatch.fnmatchcase(value.upper(), pattern) for pattern in patterns):
+                    return False
+            elif not (op or operator.eq)(value, expected):
+                return False
+            op = None
+        return True
+
+    def entity(self, i):
+        entity_type = self.entity_type(i)
+        if entity_type == "AcDbBlockReference":
+            return FakeBlockReference(self, i)
+        if entity_type in ("AcDbText", "AcDbMText"):
+            return FakeTextEntity(self, i, entity_type)
+        if entity_type in CURVE_TYPES:
+            return FakeCurve(self, i, entity_type)
+        return FakeEntity(self, i, entity_type)
+
+    def block_name_for(self, i):
+        return f"BLK{i % self.block_count}"
+
+    def nested_block(self, k):
+        """第k个块定义中嵌套的块定义序号，没有嵌套时返回None"""
+        if _mix(k, self.seed + 3) < self.nested_ratio:
+            return (k + 1) % self.block_count
+        return None
+
+    def definition_entities(self, k):
+        """第k个块定义中的实体"""
+        base = DEFINITION_BASE + k * 16
+        entities = []
+        if self.definition_texts:
+            for j in range(self.definition_texts):
+                if j % 2 == 0:
+                    entities.append(FakeTextEntity(self, base + j, "AcDbText"))
+                else:
+                    entities.append(FakeAttributeDefinition(self, base + j, True))
+            entities.append(FakeAttributeDefinition(self, base + self.definition_texts, False))
+        nested = self.nested_block(k)
+        if nested is not None:
+            entities.append(FakeBlockReference(self, base + 15, f"BLK{nested}"))
+        return entities
+
+    def _definition_texts(self, k, depth, max_depth):
+        base = DEFINITION_BASE + k * 16
+        texts = [self.text_for(base + j) for j in range(self.definition_texts)]
+        nested = self.nested_block(k)
+        if nested is not None and depth < max_depth:
+            texts += [self.text_for((base + 15) * 16 + a) for a in range(self.attributes_per_block)]
+            texts += self._definition_texts(nested, depth + 1, max_depth)
+        return texts
+
+    def expected_texts(self, block_depth=0):
+        """不经过COM统计，直接返回应提取到的文本列表（用于回归校验）
+
+        block_depth为块定义的嵌套展开层数（同ComBackend），0表示只包括块参照的属性。
+        """
+        texts = []
+        definitions = {}
+        for i in range(self.entity_count):
+            entity_type = self.entity_type(i)
+            if entity_type in ("AcDbText", "AcDbMText"):
+                texts.append(self.text_for(i))
+            elif entity_type == "AcDbBlockReference":
+                for k in range(self.attributes_per_block):
+                    texts.append(self.text_for(i * 16 + k))
+                if block_depth > 0:
+                    k = i % self.block_count
+                    if k not in definitions:
+                        definitions[k] = self._definition_texts(k, 1, block_depth)
+                    texts.extend(definitions[k])
+        return texts
+
+
+class FakeEntity:
+    """模拟的非文本实体"""
+
+    def __init__(self, model, index, entity_type):
+        self._model = model
+        self._index = index
+        self._type = entity_type
+
+    @property
+    def ObjectName(self):
+        self._model.call()
+        return self._type
+
+    @property
+    def Handle(self):
+        self._model.call()
+        return format(self._index + 0x100, 'X')
+
+    @property
+    def Layer(self):
+        self._model.call()
+        return self._model.layer_for(self._index, self._type)
+
+    @property
+    def InsertionPoint(self):
+        self._model.call()
+        return (float(self._index % 1000), float(self._index // 1000), 0.0)
+
+
+class FakeTextEntity(FakeEntity):
+    """模拟的TEXT/MTEXT实体"""
+
+    @property
+    def Height(self):
+        self._model.call()
+        return self._model.height_for(self._index)
+
+    @property
+    def Rotation(self):
+        self._model.call()
+        return 0.0
+
+    @property
+    def TextString(self):
+        self._model.call()
+        return self._model.text_for(self._index)
+
+
+class FakeCurve(FakeEntity):
+    """模拟的LINE/LWPOLYLINE实体"""
+
+    def _origin(self):
+        return float(self._index % 1000), float(self._index // 1000)
+
+    @property
+    def StartPoint(self):
+        self._model.call()
+        x, y = self._origin()
+        return (x, y, 0.0)
+
+    @property
+    def EndPoint(self):
+        self._model.call()
+        x, y = self._origin()
+        return (x + 1.0, y, 0.0)
+
+    @property
+    def Coordinates(self):
+        self._model.call()
+        x, y = self._origin()
+        return (x, y, x + 0.5, y, x + 1.0, y)
+
+    @property
+    def Closed(self):
+        self._model.call()
+        return False
+
+
+class FakeAttribute(FakeTextEntity):
+    """模拟的块属性"""
+
+    def __init__(self, model, index):
+        super().__init__(model, index, "AcDbAttribute")
+
+
+class FakeAttributeDefinition(FakeTextEntity):
+    """模拟的属性定义，TextString为默认值"""
+
+    def __init__(self, model, index, constant):
+        super().__init__(model, index, "AcDbAttributeDefinition")
+        self._constant = constant
+
+    @property
+    def Constant(self):
+        self._model.call()
+        return self._constant
+
+
+class FakeBlockReference(FakeEntity):
+    """模拟的块参照"""
+
+    def __init__(self, model, index, name=None):
+        super().__init__(model, index, "AcDbBlockReference")
+        self._name = name
+
+    @property
+    def Name(self):
+        self._model.call()
+        return self._name or self._model.block_name_for(self._index)
+
+    def GetAttributes(self):
+        self._model.call()
+        return tuple(FakeAttribute(self._model, self._index * 16 + k)
+                     for k in range(self._model.attributes_per_block))
+
+
+class FakeModelSpace:
+    def __init__(self, model, app=None):
+        self._model = model
+        self._app = app
+
+    @property
+    def Count(self):
+        self._model.call()
+        return self._model.entity_count
+
+    def Item(self, i):
+        self._model.call()
+        if self._app is not None:
+            self._app.check_running()
+        if not 0 <= i < self._model.entity_count:
+            raise IndexError(i)
+        return self._model.entity(i)
+
+
+class FakeBlockDefinition:
+    def __init__(self, model, k):
+        self._model = model
+        self._entities = model.definition_entities(k)
+
+    @property
+    def Count(self):
+        self._model.call()
+        return len(self._entities)
+
+    def Item(self, i):
+        self._model.call()
+        return self._entities[i]
+
+
+class FakeBlocks:
+    def __init__(self, model):
+        self._model = model
+
+    def Item(self, name):
+        self._model.call()
+        k = int(name[3:]) if name.startswith("BLK") and name[3:].isdigit() else -1
+        if not 0 <= k < self._model.block_count:
+            raise KeyError(name)
+        return FakeBlockDefinition(self._model, k)
+
+
+class FakeSelectionSet:
+    """模拟的选择集，过滤在“服务端”完成，不计入COM往返"""
+
+    def __init__(self, model, sets, name):
+        self._model = model
+        self._sets = sets
+        self.Name = name
+        self._indices = []
+
+    def Select(self, mode, point1=None, point2=None, filter_type=(), filter_data=()):
+        self._model.call()
+        start = time.perf_counter()
+        model = self._model
+        self._indices = [i for i in range(model.entity_count)
+                         if model.matches_filter(i, filter_type, filter_data)]
+        model.server_time += time.perf_counter() - start
+
+    @property
+    def Count(self):
+        self._model.call()
+        return len(self._indices)
+
+    def Item(self, i):
+        self._model.call()
+        return self._model.entity(self._indices[i])
+
+    def Delete(self):
+        self._model.call()
+        self._sets.pop(self.Name, None)
+
+
+class FakeSelectionSets:
+    def __init__(self, model):
+        self._model = model
+        self._sets = {}
+
+    def Add(self, name):
+        self._model.call()
+        if name in self._sets:
+            raise ValueError(f"选择集已存在: {name}")
+        self._sets[name] = FakeSelectionSet(self._model, self._sets, name)
+        return self._sets[name]
+
+    def Item(self, name):
+        self._model.call()
+        return self._sets[name]
+
+
+class FakeDocument:
+    def __init__(self, model, path, app=None):
+        self._model = model
+        self._app = app
+        self.Name = path.replace('\\', '/').rsplit('/', 1)[-1]
+        self.closed = False
+        self._selection_sets = FakeSelectionSets(model)
+
+    @property
+    def ModelSpace(self):
+        self._model.call()
+        return FakeModelSpace(self._model, self._app)
+
+    @property
+    def SelectionSets(self):
+        self._model.call()
+        return self._selection_sets
+
+    @property
+    def Blocks(self):
+        self._model.call()
+        return FakeBlocks(self._model)
+
+    def Close(self, save_changes=False):
+        self._model.call()
+        if self._app is not None:
+            self._app.check_running()
+        self.closed = True
+
+
+class FakeDocuments:
+    """opened记录打开过的文档，用于检查提取结束（包括出错和取消）后是否都已关闭"""
+
+    def __init__(self, model, app=None):
+        self._model = model
+        self._app = app
+        self.opened = []
+
+    @property
+    def Count(self):
+        self._model.call()
+        if self._app is not None:
+            self._app.check_running()
+        return 0
+
+    def Open(self, path, read_only=False, *args):
+        self._model.call()
+        if self._app is not None:
+            self._app.check_running()
+        doc = FakeDocument(self._model, path, self._app)
+        self.opened.append(doc)
+        return doc
+
+
+class FakeComError(OSError):
+    """模拟的COM错误，hresult与comtypes.COMError一致"""
+
+    def __init__(self, hresult, text):
+        super().__init__(hresult, text)
+        self.hresult = hresult
+
+
+class FakeApplication:
+    """模拟的AutoCAD应用，running为False（进程已退出或崩溃）后调用抛出FakeComError"""
+
+    def __init__(self, model):
+        self._model = model
+        self.running = True
+        self.Documents = FakeDocuments(model, self)
+
+    def check_running(self):
+        if not self.running:
+            raise FakeComError(-0x7FF8F946, "RPC服务器不可用")  # RPC_S_SERVER_UNAVAILABLE
+
+    def Quit(self):
+        self._model.call()
+        self.running = False
+
+
+class FakeAutocad:
+    """与pyautocad.Autocad接口一致的模拟对象，startup为模拟的启动耗时（秒）"""
+
+    def __init__(self, model=None, startup=0.0, **model_options):
+        self.model = model or FakeComModel(**model_options)
+        if startup:
+            time.sleep(startup)
+        self.app = FakeApplication(self.model)
+
+
+class FakeComBackend(ComBackend):
+    """使用模拟COM模型的提取后端
+
+    mode、selection_filter、metadata、session、read_only、block_depth、progress同ComBackend，
+    其余参数传给FakeComModel。
+    """
+
+    name = 'fake'
+
+    def __init__(self, mode='scan', selection_filter=None, metadata=True, session='shared',
+                 read_only=False, block_depth=DEFAULT_BLOCK_DEPTH, log=None, progress=None, **model_options):
+        self.model = FakeComModel(**model_options)
+        super().__init__(acad_factory=lambda: FakeAutocad(self.model), mode=mode,
+                         selection_filter=selection_filter, metadata=metadata,
+                         session=session, read_only=read_only, block_depth=block_depth, log=log,
+                         progress=progress)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管道长度估算
+读取管道图层上的LINE和LWPOLYLINE，线段批量装入STR打包的R树；每个管道号标注吸附到
+最近的线段，再沿端点相连的线段网络把长度分配给最近的标注，按管道号汇总为报告中的
+管道长度（图纸单位）
+"""
+
+import heapq
+import logging
+import math
+import time
+from array import array
+
+from pid_backends import TextRecord
+
+logger = logging.getLogger(__name__)
+
+# R树每个节点的子节点数
+NODE_CAPACITY = 16
+
+# 标注吸附到线段的最大距离（以标注字高为单位），没有字高时使用DEFAULT_SNAP_DISTANCE
+SNAP_HEIGHTS = 5.0
+DEFAULT_SNAP_DISTANCE = 10.0
+
+# 端点相连的判断精度（图纸单位），端点坐标按此取整后相同即视为相连
+JOIN_TOLERANCE = 0.01
+
+# 估算标注中心时每个字符的宽度（以字高为单位）
+_CHAR_WIDTH = 0.8
+
+
+class SegmentIndex:
+    """线段的STR（Sort-Tile-Recursive）打包R树
+
+    线段按中心点先按x分为若干竖条、条内按y排序，每NODE_CAPACITY个装成一个叶节点，
+    上层节点以同样方式逐层打包，一次批量构建，节点几乎全满。nearest()按节点外接框
+    到查询点的最小距离做最佳优先搜索，找到的线段比堆中剩余节点都近时结束。
+    """
+
+    def __init__(self, polylines, node_capacity=NODE_CAPACITY):
+        self.node_capacity = node_capacity
+        self.x1, self.y1, self.x2, self.y2 = array('d'), array('d'), array('d'), array('d')
+        self.polyline_count = 0
+        for polyline in polylines:
+            self.polyline_count += 1
+            points = polyline.points
+            for (ax, ay), (bx, by) in zip(points, points[1:]):
+                if ax != bx or ay != by:
+                    self.x1.append(ax)
+                    self.y1.append(ay)
+                    self.x2.append(bx)
+                    self.y2.append(by)
+        self.root = self._build()
+
+    def __len__(self):
+        return len(self.x1)
+
+    def length(self, i):
+        """第i条线段的长度"""
+        return math.hypot(self.x2[i] - self.x1[i], self.y2[i] - self.y1[i])
+
+    def _pack(self, items, leaf=False):
+        """把(外接框, 子项)列表按STR打包为上一层节点(外接框, 子节点列表)的列表
+
+        leaf为True时items的子项为线段序号，叶节点只保存序号。
+        """
+        capacity = self.node_capacity
+        node_count = math.ceil(len(items) / capacity)
+        slab_size = capacity * math.ceil(math.sqrt(node_count))
+        items.sort(key=lambda item: item[0][0] + item[0][2])
+        nodes = []
+        for start in range(0, len(items), slab_size):
+            slab = sorted(items[start:start + slab_size], key=lambda item: item[0][1] + item[0][3])
+            for i in range(0, len(slab), capacity):
+                children = slab[i:i + capacity]
+                box = (min(child[0][0] for child in children), min(child[0][1] for child in children),
+                       max(child[0][2] for child in children), max(child[0][3] for child in children))
+                nodes.append((box, [child[1] for child in children] if leaf else children))
+        return nodes
+
+    def _build(self):
+        x1, y1, x2, y2 = self.x1, self.y1, self.x2, self.y2
+        # 叶节点的子项为线段序号（整数），上层节点的子项为节点
+        items = [((min(x1[i], x2[i]), min(y1[i], y2[i]), max(x1[i], x2[i]), max(y1[i], y2[i])), i)
+                 for i in range(len(x1))]
+        if not items:
+            return None
+        nodes = self._pack(items, leaf=True)
+        while len(nodes) > 1:
+            nodes = self._pack(nodes)
+        return nodes[0]
+
+    def _segment_distance(self, i, x, y):
+        """点到第i条线段的距离和投影位置（0~1，从起点算起）"""
+        ax, ay = self.x1[i], self.y1[i]
+        dx, dy = self.x2[i] - ax, self.y2[i] - ay
+        t = ((x - ax) * dx + (y - ay) * dy) / (dx * dx + dy * dy)
+        t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+        return math.hypot(ax + t * dx - x, ay + t * dy - y), t
+
+    def nearest(self, x, y, max_distance=math.inf):
+        """距离点(x, y)最近且不超过max_distance的线段，返回(线段序号, 距离, 投影位置)或None"""
+        if self.root is None:
+            return None
+        best = None
+        best_distance = max_distance
+        heap = [(0.0, 0, self.root)]
+        counter = 1
+        while heap:
+            box_distance, _, (box, children) = heapq.heappop(heap)
+            if box_distance > best_distance:
+                break
+            for child in children:
+                if isinstance(child, int):
+                    distance, t = self._segment_distance(child, x, y)
+                    if distance <= best_distance:
+                        best, best_distance = (child, distance, t), distance
+                    continue
+                cx1, cy1, cx2, cy2 = child[0]
+                dx = cx1 - x if x < cx1 else x - cx2 if x > cx2 else 0.0
+                dy = cy1 - y if y < cy1 else y - cy2 if y > cy2 else 0.0
+                distance = math.hypot(dx, dy)
+                if distance <= best_distance:
+                    heapq.heappush(heap, (distance, counter, child))
+                    counter += 1
+        return best
+
+
+class TagCollector:
+    """记录管道号标注的位置
+
+    collect()包装送入匹配阶段的文本流（见stream_pipeline_records），按与PipelineIndex
+    相同的来源（句柄，没有句柄时为文本序号）记录带插入点的文本的估算中心位置。只记录
+    通过预筛选的文本，内存只随可能包含管道号的文本数量增长。
+    """
+
+    def __init__(self, prefilter=None):
+        self.prefilter = prefilter
+        self.positions = {}  # 来源 -> (x, y, 吸附距离)
+
+    def collect(self, records):
+        reject = self.prefilter.reject if self.prefilter else None
+        positions = self.positions
+        for position, record in enumerate(records):
+            yield record
+            if not isinstance(record, TextRecord) or record.insertion_point is None:
+                continue
+            if reject is not None and reject(record.text):
+                continue
+            x, y = record.insertion_point[0], record.insertion_point[1]
+            height = record.height
+            snap_distance = DEFAULT_SNAP_DISTANCE
+            if height:
+                # 插入点为基线左端，中心约在半个文本宽度、半个字高处
+                angle = math.radians(record.rotation or 0.0)
+                half_width = len(record.text) * height * _CHAR_WIDTH / 2
+                x += half_width * math.cos(angle) - height / 2 * math.sin(angle)
+                y += half_width * math.sin(angle) + height / 2 * math.cos(angle)
+                snap_distance = SNAP_HEIGHTS * height
+            positions[record.handle or f"#{position}"] = (x, y, snap_distance)
+
+
+def _assign_lengths(index, seeds):
+    """沿端点相连的线段网络，把每条线段的长度分配给网络距离最近的种子
+
+    seeds为[(线段序号, 投影位置, 管道号)]。多源Dijkstra求每个端点到最近种子的网络距离；
+    两端属于不同管道号或其上有种子的线段按距离相等的点划分。与任何种子都不相连的线段不计入。
+    返回{管道号: 长度}。
+    """
+    x1, y1, x2, y2 = index.x1, index.y1, index.x2, index.y2
+    scale = 1 / JOIN_TOLERANCE
+    vertex_ids = {}
+    ends = array('l')  # 第i条线段的两个端点序号为ends[2i]、ends[2i+1]
+    for i in range(len(index)):
+        for x, y in ((x1[i], y1[i]), (x2[i], y2[i])):
+            key = (round(x * scale), round(y * scale))
+            vertex = vertex_ids.get(key)
+            if vertex is None:
+                vertex = vertex_ids[key] = len(vertex_ids)
+            ends.append(vertex)
+    adjacency = [[] for _ in range(len(vertex_ids))]
+    lengths = [index.length(i) for i in range(len(index))]
+    for i, length in enumerate(lengths):
+        a, b = ends[2 * i], ends[2 * i + 1]
+        adjacency[a].append((b, length))
+        adjacency[b].append((a, length))
+
+    distances = [math.inf] * len(vertex_ids)
+    labels = [None] * len(vertex_ids)
+    heap = []
+    for segment, t, label in seeds:
+        length = lengths[segment]
+        for vertex, distance in ((ends[2 * segment], t * length), (ends[2 * segment + 1], (1 - t) * length)):
+            if distance < distances[vertex]:
+                distances[vertex], labels[vertex] = distance, label
+                heapq.heappush(heap, (distance, vertex))
+    while heap:
+        distance, vertex = heapq.heappop(heap)
+        if distance > distances[vertex]:
+            continue
+        label = labels[vertex]
+        for neighbor, length in adjacency[vertex]:
+            candidate = distance + length
+            if candidate < distances[neighbor]:
+                distances[neighbor], labels[neighbor] = candidate, label
+                heapq.heappush(heap, (candidate, neighbor))
+
+    seeded = {}  # 线段序号 -> [(种子位置, 0.0, 管道号)]
+    for segment, t, label in seeds:
+        seeded.setdefault(segment, []).append((t * lengths[segment], 0.0, label))
+
+    totals = {}
+    for i, length in enumerate(lengths):
+        a, b = ends[2 * i], ends[2 * i + 1]
+        label_a, label_b = labels[a], labels[b]
+        if label_a == label_b and i not in seeded:
+            if label_a is not None:
+                totals[label_a] = totals.get(label_a, 0.0) + length
+            continue
+        sources = [(0.0, distances[a], label_a), (length, distances[b], label_b)] + seeded.get(i, [])
+        for label, part in _split_segment(length, sources):
+            totals[label] = totals.get(label, 0.0) + part
+    return totals
+
+
+def _split_segment(length, sources):
+    """按最近的来源划分一条线段，返回[(管道号, 长度)]
+
+    sources为[(位置, 该位置的网络距离, 管道号)]，线段上点s到来源的距离为距离 + |s - 位置|。
+    去掉被其他来源支配的来源后，按位置排序的相邻两个来源在距离相等处分界。
+    """
+    sources = [source for source in sources if source[2] is not None and source[1] < math.inf]
+    sources = [(p, d, label) for p, d, label in sources
+               if not any(d2 + abs(p - p2) < d or (d2 + abs(p - p2) == d and p2 < p)
+                          for p2, d2, _ in sources if (p2, d2) != (p, d))]
+    sources.sort()
+    parts = []
+    left = 0.0
+    for k, (p, d, label) in enumerate(sources):
+        if k + 1 < len(sources):
+            p2, d2, _ = sources[k + 1]
+            right = min(max((p + p2 + d2 - d) / 2, left), length)
+        else:
+            right = length
+        if right > left:
+            parts.append((label, right - left))
+        left = right
+    return parts
+
+
+def measure_pipe_lengths(pipeline_data, polylines, tags, log=None):
+    """估算每个管道号的管道长度，写入记录的pipe_length（没有吸附到管道的为None）
+
+    polylines为PolylineRecord的可迭代对象，tags为处理同一图纸文本流的TagCollector。
+    每个来源（同一管道号的多处标注）分别吸附到吸附距离内最近的线段，作为该管道号的
+    种子。返回{'segments', 'tags', 'snapped', 'measured'}统计。
+    """
+    log = log or logger.info
+    start = time.perf_counter()
+    index = SegmentIndex(polylines)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    seeds = []
+    tag_count = 0
+    positions = tags.positions
+    for record in pipeline_data:
+        for source in record.sources:
+            position = positions.get(source)
+            if position is None:
+                continue
+            tag_count += 1
+            found = index.nearest(position[0], position[1], position[2])
+            if found is not None:
+                seeds.append((found[0], found[2], record.pipeline_number))
+    snap_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    totals = _assign_lengths(index, seeds) if seeds else {}
+    for record in pipeline_data:
+        record.pipe_length = totals.get(record.pipeline_number)
+    assign_time = time.perf_counter() - start
+
+    stats = {'segments': len(index), 'tags': tag_count, 'snapped': len(seeds), 'measured': len(totals)}
+    log(f"管道长度: 多段线 {index.polyline_count}, 线段 {len(index)}（建索引 {build_time:.2f} s）, "
+        f"标注 {tag_count}, 吸附 {len(seeds)}（{snap_time:.2f} s）, "
+        f"有长度的管道号 {len(totals)}（分配 {assign_time:.2f} s）")
+    return stats
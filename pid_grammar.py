@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管道号编号规则
+支持在配置文件中定义多套命名的编号规则（正则表达式 + 字段映射），
+合并编译为一个扫描正则，每个文本只需匹配一次，并能区分匹配到的规则
+
+配置文件（JSON）格式:
+    {"grammars": [
+        {"name": "标准",
+         "pattern": "(?P<unit_number>\\d{4})(?P<medium_code>[A-Z0-9]{1,4})-...",
+         "fields": {"pipe_number": "no"},
+         "display": "{unit_number}{medium_code}-{pipe_number}",
+         "example": "4101BRR-02457-200-03CBMB1-H",
+         "prefilter": {"min_hyphens": 4, "digit_run": 4, "require_letter": true}}
+    ]}
+"""
+
+import json
+import logging
+import re
+from collections import defaultdict
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
+
+logger = logging.getLogger(__name__)
+
+# 报告字段：装置号、介质代码、管道号、管径、管道等级、保温等级
+FIELDS = ('unit_number', 'medium_code', 'pipe_number', 'nominal_diameter', 'pipe_grade',
+          'insulation_grade')
+
+# 报告中管道号列的默认格式：装置号和介质代码-管道编号
+DEFAULT_DISPLAY = "{unit_number}{medium_code}-{pipe_number}"
+
+# 命名分组及其引用
+_GROUP_NAME = re.compile(r'\(\?P([<=])(\w+)')
+
+
+class TextPrefilter:
+    """管道号预筛选
+
+    在标准化和正则匹配之前，用廉价的检查排除不可能包含管道号的文本：
+        min_length: 最小长度（编号规则能匹配的最短长度）
+        min_hyphens: 最少连字符数量
+        digit_run: 至少包含的连续数字位数，0表示不检查
+        require_letter: 是否要求包含大写字母
+
+    只检查纯ASCII文本：标准化对这类文本只会删除空白和控制字符，不会使文本变长
+    或产生新的连字符，因此不会误排除。删除控制字符可能把数字拼接起来，
+    所以数字和字母检查只用于可打印文本。含非ASCII字符的文本（全角数字、
+    Unicode连字符等）不做预筛选，直接进入标准化。
+    """
+
+    # 各阶段名称（用于统计日志）
+    STAGE_NAMES = {
+        'length': '长度不足',
+        'hyphens': '连字符不足',
+        'charset': '缺少数字/字母',
+        'regex': '正则未匹配',
+        'matched': '包含管道号',
+    }
+
+    def __init__(self, min_length=21, min_hyphens=4, digit_run=4, require_letter=True):
+        self.min_length = min_length
+        self.min_hyphens = min_hyphens
+        self.digit_run = re.compile(rf'\d{{{digit_run}}}') if digit_run else None
+        self.letter = re.compile(r'[A-Z]') if require_letter else None
+
+    def reject(self, text):
+        """返回排除文本的阶段名称，可能包含管道号时返回None"""
+        if not (isinstance(text, str) and text.isascii()):
+            return None
+        if len(text) < self.min_length:
+            return 'length'
+        if text.count('-') < self.min_hyphens:
+            return 'hyphens'
+        if text.isprintable():
+            if self.digit_run and not self.digit_run.search(text):
+                return 'charset'
+            if self.letter and not self.letter.search(text):
+                return 'charset'
+        return None
+
+
+class Grammar:
+    """一套管道号编号规则
+
+    name: 规则名称，写入报告的“编号规则”列
+    pattern: 正则表达式，用命名分组标出字段；不能使用数字反向引用和全局内联标志
+    fields: 报告字段 -> 分组名，未指定的报告字段取同名分组
+    display: 报告中管道号列的格式，缺少的字段为空
+    example: 示例管道号，用于自检
+    prefilter: 预筛选参数（同TextPrefilter），未指定的项不做检查，最小长度由pattern计算
+    """
+
+    def __init__(self, name, pattern, fields=None, display=DEFAULT_DISPLAY, example=None,
+                 prefilter=None):
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"编号规则 {name} 的正则表达式无效: {e}")
+
+        groups = set(compiled.groupindex)
+        mapping = {field: field for field in FIELDS if field in groups}
+        for field, group in (fields or {}).items():
+            if field not in FIELDS:
+                raise ValueError(f"编号规则 {name} 的未知字段: {field}（可用字段: {', '.join(FIELDS)}）")
+            if group not in groups:
+                raise ValueError(f"编号规则 {name} 的正则表达式中没有分组: {group}")
+            mapping[field] = group
+
+        self.name = name
+        self.pattern = pattern
+        self.fields = mapping
+        self.display = display
+        self.example = example
+
+        prefilter = dict(prefilter or {})
+        prefilter.setdefault('min_length', _sre_parse.parse(pattern).getwidth()[0])
+        self.prefilter = {
+            'min_length': prefilter['min_length'],
+            'min_hyphens': prefilter.get('min_hyphens', 0),
+            'digit_run': prefilter.get('digit_run', 0),
+            'require_letter': prefilter.get('require_letter', False),
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        try:
+            return cls(config['name'], config['pattern'], config.get('fields'),
+                       config.get('display', DEFAULT_DISPLAY), config.get('example'),
+                       config.get('prefilter'))
+        except KeyError as e:
+            raise ValueError(f"编号规则缺少配置项: {e}")
+
+    def format_display(self, fields):
+        """报告中的管道号"""
+        return self.display.format_map(defaultdict(str, fields))
+
+    def __repr__(self):
+        return f"Grammar({self.name!r})"
+
+
+# 内置编号规则：装置号和介质代码-管道号-管道尺寸-管道等级-保温等级
+DEFAULT_GRAMMAR = Grammar(
+    "标准",
+    r'(?P<unit_number>\d{4})(?P<medium_code>[A-Z0-9]{1,4})-(?P<pipe_number>[A-Z0-9]{4,6})-'
+    r'(?P<nominal_diameter>\d{2,3})-(?P<pipe_grade>\d{2}[A-Z0-9]{3,6})-(?P<insulation_grade>[A-Z]{1,2})',
+    example='4101BRR-02457-200-03CBMB1-H',
+    prefilter={'min_hyphens': 4, 'digit_run': 4, 'require_letter': True},
+)
+
+
+def _prefix_groups(pattern, prefix):
+    """给正则中的命名分组及其引用加前缀，避免合并后分组重名"""
+    return _GROUP_NAME.sub(lambda m: f"(?P{m.group(1)}{prefix}{m.group(2)}", pattern)
+
+
+class LineRecognizer:
+    """多规则管道号识别器
+
+    各规则合并为一个交替正则 (?:规则0)(?P<g0>)|(?:规则1)(?P<g1>)|...，规则内的命名分组
+    加上g0_等前缀。每个文本只扫描一次；分支末尾的空分组最后闭合，匹配对象的
+    lastgroup即为该分组名，由此确定匹配到的规则。标记分组放在末尾而不是包住整个
+    分支，是为了让正则引擎在分支首字符不符时直接跳过该分支，规则增多时扫描耗时
+    基本不变。同一位置多个规则都能匹配时，以配置中靠前的规则为准。
+    """
+
+    def __init__(self, grammars):
+        self.grammars = list(grammars)
+        if not self.grammars:
+            raise ValueError("至少需要一个编号规则")
+
+        parts = []
+        self._groups = {}  # 标记分组名 -> (规则, {字段: 合并后的分组名})
+        for i, grammar in enumerate(self.grammars):
+            prefix = f"g{i}_"
+            parts.append(f"(?:{_prefix_groups(grammar.pattern, prefix)})(?P<g{i}>)")
+            self._groups[f"g{i}"] = (grammar, {field: prefix + group
+                                               for field, group in grammar.fields.items()})
+        try:
+            self.scanner = re.compile('|'.join(parts))
+        except re.error as e:
+            raise ValueError(f"编号规则合并失败: {e}")
+
+        # 合并各规则的预筛选参数，取最宽松的条件
+        settings = [grammar.prefilter for grammar in self.grammars]
+        self.prefilter = TextPrefilter(
+            min_length=min(s['min_length'] for s in settings),
+            min_hyphens=min(s['min_hyphens'] for s in settings),
+            digit_run=min(s['digit_run'] for s in settings),
+            require_letter=all(s['require_letter'] for s in settings),
+        )
+
+    def cache_key(self):
+        """影响匹配结果的规则配置，作为增量匹配状态键的一部分"""
+        return json.dumps([[g.name, g.pattern, g.fields, g.display, g.prefilter] for g in self.grammars],
+                          ensure_ascii=False, sort_keys=True)
+
+    def finditer(self, text):
+        """扫描文本，返回匹配对象（group(0)为管道号）"""
+        return self.scanner.finditer(text)
+
+    def describe(self, match):
+        """返回匹配对象对应的(规则, 字段字典)"""
+        grammar, groups = self._groups[match.lastgroup]
+        return grammar, {field: match.group(group) or '' for field, group in groups.items()}
+
+    def match(self, text):
+        """完整匹配一个管道号，返回(规则, 字段字典)，不匹配时返回None"""
+        match = self.scanner.fullmatch(text)
+        return self.describe(match) if match else None
+
+    def self_check(self):
+        """用各规则的示例管道号自检，返回未通过的规则名称列表"""
+        failed = []
+        for grammar in self.grammars:
+            if grammar.example is None:
+                continue
+            found = self.match(grammar.example)
+            if found is None or found[0] is not grammar:
+                failed.append(grammar.name)
+        return failed
+
+
+def load_grammars(path):
+    """从JSON配置文件加载编号规则列表，配置无效时抛出ValueError"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if isinstance(config, dict):
+        config = config.get('grammars', [])
+    grammars = [Grammar.from_dict(item) for item in config]
+    logger.info(f"加载了 {len(grammars)} 个编号规则: {', '.join(g.name for g in grammars)}")
+    return grammars
+
+
+def load_recognizer(path=None):
+    """创建识别器，未指定配置文件时使用内置规则"""
+    if path is None:
+        return DEFAULT_RECOGNIZER
+    return LineRecognizer(load_grammars(path))
+
+
+DEFAULT_RECOGNIZER = LineRecognizer([DEFAULT_GRAMMAR])
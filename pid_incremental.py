@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量匹配
+保存上次处理图纸时每个文本实体的句柄、文本哈希和匹配结果。再次处理同一图纸时，
+句柄和文本哈希都未变化的实体直接复用上次的结果，只对新增或内容变化的实体重新
+标准化和匹配；本次未出现的句柄（已删除的实体）不再保存。
+只保存通过预筛选的文本：预筛选比计算文本哈希更快，被排除的文本每次重新筛选即可。
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from pid_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# 匹配状态格式版本，匹配逻辑或状态结构变化时递增，旧状态自动失效
+MATCH_STATE_VERSION = 1
+
+# 匹配状态保存在缓存目录下的子目录中，每张图纸一个文件
+MATCH_STATE_DIR = "match_state"
+
+
+def text_digest(text):
+    """文本内容哈希（64位BLAKE2b）"""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+
+
+class MatchState:
+    """一张图纸的增量匹配状态
+
+    每个句柄保存(文本哈希, 匹配结果)，匹配结果为[(管道号, 编号规则序号, 字段字典), ...]，
+    不包含管道号时为空列表。key为影响匹配结果的配置（编号规则，见LineRecognizer.cache_key），
+    与上次不同时不复用任何结果。
+    """
+
+    def __init__(self, drawing_path, key, cache_dir=None, log=None):
+        abs_path = os.path.abspath(drawing_path)
+        name = hashlib.sha256(abs_path.encode('utf-8')).hexdigest()
+        self.path = Path(cache_dir or DEFAULT_CACHE_DIR) / MATCH_STATE_DIR / f"{name}.json.gz"
+        self.drawing_path = abs_path
+        self.key = f"{MATCH_STATE_VERSION}|{key}"
+        self.log = log or logger.info
+        self.reused = 0
+        self.added = 0
+        self.changed = 0
+        self.unkeyed = 0
+        self._previous = self._load()
+        self._current = {}
+
+    def _load(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get('key') != self.key or state.get('path') != self.drawing_path:
+            return {}
+        return state['handles']
+
+    def lookup(self, handle, digest):
+        """句柄和文本哈希与上次相同时返回上次的结果，否则返回None（需要重新匹配）"""
+        if not handle:
+            self.unkeyed += 1
+            return None
+        entry = self._previous.get(handle)
+        if entry is not None and entry[0] == digest:
+            self._current[handle] = entry
+            self.reused += 1
+            return entry[1]
+        if entry is None:
+            self.added += 1
+        else:
+            self.changed += 1
+        return None
+
+    def record(self, handle, digest, outcome):
+        """保存重新匹配的结果，没有句柄的文本不保存"""
+        if handle:
+            self._current[handle] = (digest, outcome)
+
+    @property
+    def reprocessed(self):
+        return self.added + self.changed + self.unkeyed
+
+    @property
+    def dropped(self):
+        """上次保存、本次未出现的句柄数量（实体已删除，或修改后被预筛选排除）"""
+        return sum(1 for handle in self._previous if handle not in self._current)
+
+    def save(self):
+        """保存本次的状态（只包含本次出现的句柄），应在全部文本处理完成后调用"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'key': self.key, 'path': self.drawing_path, 'handles': self._current}, f,
+                      ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def log_stats(self, log=None):
+        """输出复用和重新处理的实体数量"""
+        log = log or self.log
+        total = self.reused + self.reprocessed
+        rate = self.reused / total * 100 if total else 0.0
+        log(f"增量匹配: 复用 {self.reused}, 重新处理 {self.reprocessed}（新增 {self.added}, "
+            f"变更 {self.changed}, 无句柄 {self.unkeyed}）, 删除 {self.dropped}, 复用率 {rate:.1f}%")
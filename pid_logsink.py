@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志队列与详细日志文件
+工作线程的日志先放入队列，界面线程按固定间隔批量取出显示，不再每条日志向Tk事件队列
+投递回调；逐个管道号的匹配记录等DEBUG日志写入文件。
+"""
+
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+# 界面最多保留的日志行数
+DEFAULT_MAX_LINES = 2000
+
+# 详细日志文件及轮转大小
+DEFAULT_LOG_FILE = Path.home() / ".pid_extractor.log"
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 2
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 本工具模块名的前缀，详细日志只记录这些模块的DEBUG日志
+APP_LOGGER_PREFIX = 'pid_'
+
+
+class LogSink:
+    """线程安全的日志队列
+
+    调用时只记录序号、时间和消息（deque.append，不加锁），drain()由界面线程定时调用，
+    批量取出并格式化。队列最多保留max_lines条，两次取出之间日志超过max_lines条时
+    较早的被丢弃（界面也只显示最后max_lines行），drain()返回丢弃的条数。
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        self.max_lines = max_lines
+        self._pending = deque(maxlen=max_lines)
+        self._sequence = itertools.count()
+        self._next = 0
+        self.received = 0
+        self.dropped = 0
+
+    def __call__(self, message):
+        self._pending.append((next(self._sequence), time.time(), message))
+
+    def drain(self):
+        """取出全部待显示的日志，返回(带时间的行列表, 丢弃的条数)"""
+        pending = self._pending
+        items = []
+        try:
+            while True:
+                items.append(pending.popleft())
+        except IndexError:
+            pass
+        if not items:
+            return [], 0
+        # 两个线程同时记录时序号可能稍有乱序，按最小和最大序号计算
+        first = min(item[0] for item in items)
+        last = max(item[0] for item in items)
+        dropped = max(first - self._next, 0) + (last - first + 1 - len(items))
+        self._next = last + 1
+        self.received += len(items) + dropped
+        self.dropped += dropped
+        lines = [f"{time.strftime('%H:%M:%S', time.localtime(t))} - {message}" for _, t, message in items]
+        return lines, dropped
+
+
+def _is_app_logger(name):
+    """是否为本工具的日志记录器（模块名以pid_开头，或作为脚本运行的__main__）"""
+    return name.startswith(APP_LOGGER_PREFIX) or name in ('__main__', '__mp_main__')
+
+
+def _app_loggers():
+    """已创建的本工具日志记录器"""
+    return [logging.getLogger(name) for name in list(logging.Logger.manager.loggerDict)
+            if _is_app_logger(name)]
+
+
+def _verbose_record(record):
+    """详细日志文件只记录本工具的日志，第三方库（comtypes、openpyxl等）只记录WARNING及以上"""
+    return _is_app_logger(record.name) or record.levelno >= logging.WARNING
+
+
+def enable_verbose_log(path=DEFAULT_LOG_FILE, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS):
+    """把本工具DEBUG及以上的日志写入文件（按大小轮转），返回文件处理器
+
+    只有本工具已创建的日志记录器降为DEBUG，根日志记录器和第三方库的级别不变；
+    根日志记录器上已有的未设置级别的处理器（如控制台）设为原来的级别，输出不变。
+    """
+    root = logging.getLogger()
+    level = root.getEffectiveLevel()
+    for existing in root.handlers:
+        if existing.level == logging.NOTSET:
+            existing.setLevel(level)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(_verbose_record)
+    root.addHandler(handler)
+    for app_logger in _app_loggers():
+        app_logger.setLevel(logging.DEBUG)
+    return handler
+
+
+@contextmanager
+def verbose_log(path):
+    """在with块内把详细日志写入path（为空时不写），退出时恢复原来的级别"""
+    if not path:
+        yield
+        return
+    root = logging.getLogger()
+    levels = ([(handler, handler.level) for handler in root.handlers]
+              + [(app_logger, app_logger.level) for app_logger in _app_loggers()])
+    handler = enable_verbose_log(path)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+        for target, level in levels:
+            target.setLevel(level)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+介质相态判断
+关键词规则（含优先级）和按介质代码的强制指定可以放在外部规则文件中，
+所有规则编译为一个正则，每个不同的介质名称只判断一次
+
+规则文件（JSON）格式:
+    {"default": "未知相态",
+     "rules": [
+        {"phase": "气相", "priority": 2, "keywords": ["蒸汽", "气"]},
+        {"phase": "液相", "priority": 1, "keywords": ["水", "油"]}
+     ],
+     "overrides": {"D": "气相"}}
+"""
+
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 内置规则：先判断气相关键词，再判断液相关键词
+DEFAULT_PHASE_RULES = {
+    'default': '未知相态',
+    'rules': [
+        {'phase': '气相', 'priority': 2,
+         'keywords': ['蒸汽', '气', '空气', '氢气', '氮气', '氧气', '二氧化碳', '天然气', '废气']},
+        {'phase': '液相', 'priority': 1,
+         'keywords': ['水', '油', '液', '溶液', '酸', '碱', '汽油', '柴油', '凝结']},
+    ],
+    'overrides': {},
+}
+
+
+class PhaseClassifier:
+    """按关键词规则判断介质相态
+
+    rules: [{'phase', 'priority', 'keywords'}, ...]，介质名称包含某条规则的任一关键词
+        即命中该规则；同时命中多条规则时取优先级最高的，优先级相同时取靠前的
+    default: 没有命中任何规则时的相态
+    overrides: 介质代码 -> 相态，优先于关键词规则
+
+    规则按优先级排序后编译为一个正则 (?=.*?(?:关键词...))(?P<r0>)|(?=.*?(?:...))(?P<r1>)|...，
+    从名称开头匹配一次即可得到命中的最高优先级规则（lastgroup）。
+    """
+
+    def __init__(self, rules, default='未知相态', overrides=None):
+        ordered = sorted((rule for rule in rules if rule.get('keywords')),
+                         key=lambda rule: -rule.get('priority', 0))
+        self.phases = {}
+        parts = []
+        for i, rule in enumerate(ordered):
+            keywords = '|'.join(re.escape(keyword) for keyword in rule['keywords'])
+            parts.append(f"(?=.*?(?:{keywords}))(?P<r{i}>)")
+            self.phases[f"r{i}"] = rule['phase']
+        self.matcher = re.compile('|'.join(parts), re.DOTALL) if parts else None
+        self.default = default
+        self.overrides = dict(overrides or {})
+        self._cache = {}  # 介质名称 -> 相态
+
+    @classmethod
+    def from_dict(cls, config):
+        try:
+            rules = [{'phase': rule['phase'], 'priority': rule.get('priority', 0),
+                      'keywords': list(rule['keywords'])} for rule in config['rules']]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"相态规则格式错误: {e}")
+        return cls(rules, config.get('default', '未知相态'), config.get('overrides'))
+
+    def classify_name(self, medium_name):
+        """按关键词判断介质名称的相态（结果按名称缓存）"""
+        phase = self._cache.get(medium_name)
+        if phase is None:
+            match = self.matcher.match(medium_name) if self.matcher else None
+            phase = self.phases[match.lastgroup] if match else self.default
+            self._cache[medium_name] = phase
+        return phase
+
+    def classify(self, medium_name, medium_code=None):
+        """判断单个介质的相态，介质代码有强制指定时以其为准"""
+        if medium_code is not None and medium_code in self.overrides:
+            return self.overrides[medium_code]
+        return self.classify_name(medium_name)
+
+
+def load_phase_rules(path):
+    """从JSON规则文件创建相态判断器，规则无效时抛出ValueError"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    classifier = PhaseClassifier.from_dict(config)
+    logger.info(f"加载了 {len(classifier.phases)} 条相态规则, {len(classifier.overrides)} 个介质代码指定")
+    return classifier
+
+
+def load_classifier(path=None):
+    """创建相态判断器，未指定规则文件时使用内置规则"""
+    if path is None:
+        return DEFAULT_CLASSIFIER
+    return load_phase_rules(path)
+
+
+DEFAULT_CLASSIFIER = PhaseClassifier.from_dict(DEFAULT_PHASE_RULES)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取进度与取消
+提取循环每处理一个实体（DXF为每读取一块）调用一次ProgressTracker.update()，按固定间隔
+产生进度事件（已完成数量、速度、预计剩余时间），界面显示进度条，命令行显示进度行。
+cancel()后下一次update()抛出ExtractionCancelled，提取在当前实体处停止，后端照常关闭文档。
+"""
+
+import logging
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# 进度事件的最小间隔（秒）
+DEFAULT_INTERVAL = 0.2
+
+# 速度的指数平滑系数（越大越接近最近一段时间的速度）
+RATE_SMOOTHING = 0.3
+
+# 进度单位：实体数量，或DXF文件的字节数
+UNIT_ENTITIES = '实体'
+UNIT_BYTES = 'bytes'
+
+
+class ExtractionCancelled(Exception):
+    """提取被取消"""
+
+
+class ProgressEvent(namedtuple('ProgressEvent', 'stage done total unit rate eta elapsed')):
+    """进度事件：阶段名称、已完成和总数量、单位、速度（每秒）、预计剩余秒数（未知时为None）、已用秒数"""
+
+    __slots__ = ()
+
+    @property
+    def fraction(self):
+        """完成比例（0~1）"""
+        return min(self.done / self.total, 1.0) if self.total else 1.0
+
+    @property
+    def finished(self):
+        return self.done >= self.total
+
+
+class ProgressTracker:
+    """提取进度跟踪与协作式取消
+
+    每个阶段（如遍历模型空间、一个选择集）先调用begin(stage, total)，循环中调用update(done)，
+    结束时调用finish()。callback(ProgressEvent)在begin、finish时以及循环中每interval秒最多
+    调用一次，在提取线程中执行，界面应只保存事件、由界面线程显示。
+
+    cancel()可在任意线程中调用，之后的begin()/update()抛出ExtractionCancelled。
+    """
+
+    def __init__(self, callback=None, interval=DEFAULT_INTERVAL, clock=time.monotonic):
+        self.callback = callback
+        self.interval = interval
+        self.clock = clock
+        self.cancelled = False
+        self.last_event = None
+        self.stage = None
+        self.total = 0
+        self.unit = UNIT_ENTITIES
+        self.done = 0
+        self.rate = 0.0
+        self._started = self._last = self._next = 0.0
+        self._last_done = 0
+
+    def cancel(self):
+        """请求取消，提取循环在下一次update()时停止"""
+        self.cancelled = True
+
+    def check(self):
+        """已请求取消时抛出ExtractionCancelled"""
+        if self.cancelled:
+            raise ExtractionCancelled("提取已取消")
+
+    def begin(self, stage, total, unit=UNIT_ENTITIES):
+        """开始一个阶段"""
+        self.check()
+        now = self.clock()
+        self.stage, self.total, self.unit = stage, max(0, total), unit
+        self.done = self._last_done = 0
+        self.rate = 0.0
+        self._started = self._last = now
+        self._emit(now)
+
+    def update(self, done):
+        """更新已完成数量，到达间隔时产生进度事件"""
+        if self.cancelled:
+            raise ExtractionCancelled("提取已取消")
+        self.done = done
+        now = self.clock()
+        if now >= self._next:
+            self._emit(now)
+
+    def finish(self):
+        """阶段结束（已完成数量设为总数）"""
+        if self.done >= self.total and self.last_event is not None and self.last_event.finished:
+            return  # 空阶段在begin时已产生结束事件
+        self.done = self.total
+        self._emit(self.clock())
+
+    def _emit(self, now):
+        elapsed = now - self._started
+        window = now - self._last
+        remaining = self.total - self.done
+        if remaining <= 0:
+            # 阶段结束时显示平均速度
+            self.rate = self.done / elapsed if elapsed > 0 else 0.0
+        elif window > 0:
+            instant = (self.done - self._last_done) / window
+            self.rate = instant if not self.rate else RATE_SMOOTHING * instant + (1 - RATE_SMOOTHING) * self.rate
+        self._last, self._last_done = now, self.done
+        self._next = now + self.interval
+        if remaining <= 0:
+            eta = 0.0
+        else:
+            eta = remaining / self.rate if self.rate > 0 else None
+        event = ProgressEvent(self.stage, self.done, self.total, self.unit, self.rate, eta, elapsed)
+        self.last_event = event
+        if self.callback is not None:
+            self.callback(event)
+
+
+def format_duration(seconds):
+    """秒数格式化为 m:ss 或 h:mm:ss"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_progress(event):
+    """进度事件格式化为一行文字，如：读取实体  45.2%  120,000/265,000 实体  3,250/s  剩余 0:44"""
+    if event.unit == UNIT_BYTES:
+        mb = 1024 * 1024
+        amount = f"{event.done / mb:,.1f}/{event.total / mb:,.1f} MB"
+        rate = f"{event.rate / mb:,.1f} MB/s"
+    else:
+        amount = f"{event.done:,}/{event.total:,} {event.unit}"
+        rate = f"{event.rate:,.0f}/s"
+    if event.finished:
+        tail = f"用时 {format_duration(event.elapsed)}"
+    else:
+        tail = f"剩余 {format_duration(event.eta) if event.eta is not None else '--:--'}"
+    return f"{event.stage} {event.fraction * 100:5.1f}%  {amount}  {rate}  {tail}"
+
+
+class ProgressLine:
+    """命令行进度行：在同一行刷新（写入stderr），阶段结束或切换到下一阶段时换行"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._stage = None
+        self._width = 0
+
+    def __call__(self, event):
+        if self._stage is not None and self._stage != event.stage:
+            self.close()
+        text = format_progress(event)
+        self.stream.write('\r' + text.ljust(self._width))
+        self._width = len(text)
+        self._stage = event.stage
+        if event.finished:
+            self.close()
+        else:
+            self.stream.flush()
+
+    def close(self):
+        """结束当前进度行（取消或出错时调用）"""
+        if self._stage is not None:
+            self.stream.write('\n')
+            self.stream.flush()
+        self._stage = None
+        self._width = 0
+
+
+@contextmanager
+def progress_line(stream=None):
+    """with块内使用的命令行进度行，写入同一流的日志先结束当前进度行，不与进度混在同一行"""
+    line = ProgressLine(stream)
+    handlers = [handler for handler in logging.getLogger().handlers
+                if getattr(handler, 'stream', None) is line.stream]
+
+    def end_line(record):
+        line.close()
+        return True
+
+    for handler in handlers:
+        handler.addFilter(end_line)
+    try:
+        yield line
+    finally:
+        for handler in handlers:
+            handler.removeFilter(end_line)
+        line.close()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管道数据记录
+解析结果使用__slots__记录而不是每条一个字典，报告按列直接生成DataFrame
+"""
+
+import sys
+
+
+class PipelineRecord:
+    """一个管道号的解析结果
+
+    字段与原管道数据字典的键相同；介质名称、管道等级等字段的字符串经过sys.intern，
+    大量管道号共用少数几个取值时只保留一份。merged表示管道号来自拆分标注的拼接（见pid_spatial），
+    pipe_length为估算的管道长度（见pid_geometry），未估算时为None。
+    """
+
+    __slots__ = ('pipeline_number', 'display_number', 'grammar', 'unit_number', 'pipe_number',
+                 'nominal_diameter', 'pipe_grade', 'insulation_grade', 'medium_code', 'medium_name',
+                 'phase', 'occurrences', 'sources', 'merged', 'pipe_length')
+
+    def __init__(self, pipeline_number, display_number='', grammar='', unit_number='',
+                 pipe_number='', nominal_diameter='', pipe_grade='', insulation_grade='',
+                 medium_code='', medium_name='', phase='', occurrences=1, sources=(),
+                 merged=False, pipe_length=None):
+        intern = sys.intern
+        self.pipeline_number = pipeline_number
+        self.display_number = display_number
+        self.grammar = intern(grammar)
+        self.unit_number = intern(unit_number)
+        self.pipe_number = pipe_number
+        self.nominal_diameter = intern(nominal_diameter)
+        self.pipe_grade = intern(pipe_grade)
+        self.insulation_grade = intern(insulation_grade)
+        self.medium_code = intern(medium_code)
+        self.medium_name = intern(medium_name)
+        self.phase = intern(phase)
+        self.occurrences = occurrences
+        self.sources = sources
+        self.merged = merged
+        self.pipe_length = pipe_length
+
+    def to_dict(self):
+        """转换为字典（字段名 -> 值）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, PipelineRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"PipelineRecord({self.pipeline_number!r}, grammar={self.grammar!r})"
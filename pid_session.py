@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAD会话池
+AutoCAD由自动化接口启动时，最后一个引用释放后即退出，每次提取都要重新启动（20~40秒）。
+会话池在多次提取之间保留应用对象：取用前做健康检查，处理一定数量的图纸后或出现COM错误时
+回收并在下次取用时重新启动。
+"""
+
+import logging
+import threading
+import time
+
+from pid_backends import _PrivateAcadSession, _default_acad_factory, _quit_application
+
+logger = logging.getLogger(__name__)
+
+# 每个会话处理多少张图纸后回收（AutoCAD长时间运行后内存占用持续增长）
+DEFAULT_MAX_DOCUMENTS = 50
+
+
+class CadSession:
+    """池中的一个CAD会话：与pyautocad.Autocad接口一致的对象及已处理的图纸数量"""
+
+    __slots__ = ('acad', 'documents', 'started')
+
+    def __init__(self, acad):
+        self.acad = acad
+        self.documents = 0
+        self.started = time.monotonic()
+
+
+class SessionPool:
+    """可复用的CAD会话池
+
+    factory返回与pyautocad.Autocad接口一致的对象（需提供app属性），默认按session选择：
+    shared=连接已运行的AutoCAD（没有时启动），private=启动独立的AutoCAD实例。
+    回收private会话时退出对应的AutoCAD，shared会话只释放引用。
+
+    acquire()取出空闲会话并检查app.Documents.Count能否读取，失败则丢弃重新启动；
+    所有会话都在使用中且已达到max_sessions时等待归还。release()归还会话，
+    failed为True（处理图纸时出现COM错误）或已处理max_documents张图纸时回收。
+
+    COM对象只能在创建它的线程中使用，同一个池应只在一个线程中取用（见pid_daemon）。
+    """
+
+    def __init__(self, factory=None, session='shared', max_sessions=1,
+                 max_documents=DEFAULT_MAX_DOCUMENTS, log=None):
+        if session not in ('shared', 'private'):
+            raise ValueError(f"未知的会话方式: {session}")
+        if factory is None:
+            factory = _PrivateAcadSession if session == 'private' else _default_acad_factory
+        self.factory = factory
+        self.session = session
+        self.max_sessions = max(1, max_sessions)
+        self.max_documents = max(1, max_documents)
+        self.log = log or logger.info
+        self._condition = threading.Condition()
+        self._idle = []
+        self._busy = 0
+        self.started = 0
+        self.reused = 0
+        self.recycled = 0
+        self.startup_time = 0.0
+
+    def acquire(self, timeout=None):
+        """取出一个可用的会话，timeout秒内没有可用会话时抛出TimeoutError"""
+        with self._condition:
+            while not self._idle and self._busy >= self.max_sessions:
+                if not self._condition.wait(timeout):
+                    raise TimeoutError("没有可用的CAD会话")
+            session = self._idle.pop() if self._idle else None
+            self._busy += 1
+        try:
+            if session is not None and not self._healthy(session):
+                self._recycle(session, "健康检查失败")
+                session = None
+            if session is None:
+                return self._start()
+            self.reused += 1
+            return session
+        except BaseException:
+            with self._condition:
+                self._busy -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, session, failed=False):
+        """归还会话，failed为True时回收"""
+        session.documents += 1
+        if failed:
+            self._recycle(session, "处理图纸时出错")
+        elif session.documents >= self.max_documents:
+            self._recycle(session, f"已处理 {session.documents} 张图纸")
+        with self._condition:
+            if not failed and session.documents < self.max_documents:
+                self._idle.append(session)
+            self._busy -= 1
+            self._condition.notify()
+
+    def close(self):
+        """回收全部空闲会话"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._recycle(session, "关闭会话池")
+
+    def _start(self):
+        start = time.perf_counter()
+        session = CadSession(self.factory())
+        elapsed = time.perf_counter() - start
+        self.started += 1
+        self.startup_time += elapsed
+        self.log(f"已启动CAD会话（{elapsed:.1f} s）")
+        return session
+
+    def _healthy(self, session):
+        try:
+            session.acad.app.Documents.Count
+            return True
+        except Exception:
+            return False
+
+    def _recycle(self, session, reason):
+        self.recycled += 1
+        self.log(f"回收CAD会话: {reason}")
+        if self.session == 'private':
+            _quit_application(session.acad.app)
+
+    def stats(self):
+        """会话池统计"""
+        with self._condition:
+            idle, busy = len(self._idle), self._busy
+        return {'session': self.session, 'idle': idle, 'busy': busy, 'started': self.started,
+                'reused': self.reused, 'recycled': self.recycled, 'startup_time': self.startup_time}
+
+    def log_stats(self, log=None):
+        """输出会话启动、复用和回收次数"""
+        (log or self.log)(f"CAD会话: 启动 {self.started} 次（共 {self.startup_time:.1f} s）, "
+                          f"复用 {self.reused} 次, 回收 {self.recycled} 次")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单张大图纸的分片并行提取
+按后端划分的分片（COM为实体索引范围，DXF为字节范围）分发到多个工作进程，
+结果按分片顺序拼接，与顺序提取的结果完全一致
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as ResultTimeout
+
+from pid_backends import ComBackend, get_backend
+from pid_progress import ExtractionCancelled
+
+logger = logging.getLogger(__name__)
+
+# 等待分片结果时检查是否已取消的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+
+def _extract_shard(job):
+    """在工作进程中提取一个分片，返回(文本记录列表, 耗时)"""
+    start = time.perf_counter()
+    extractor = get_backend(job['backend'], **job['options'])
+    records = list(extractor.iter_records(job['drawing'], job['shard']))
+    return records, time.perf_counter() - start
+
+
+def _wait_result(future, progress):
+    """等待分片结果，期间定时检查是否已取消"""
+    if progress is None:
+        return future.result()
+    while True:
+        progress.check()
+        try:
+            return future.result(timeout=CANCEL_POLL_INTERVAL)
+        except ResultTimeout:
+            continue
+
+
+def extract_sharded(drawing_path, backend, backend_options=None, workers=None, shard_size=None,
+                    log=None, progress=None):
+    """分片并行提取一张图纸的文本记录
+
+    backend为已解析的后端名称，shard_size含义由后端决定（COM: 每片实体数，DXF: 每片字节数）。
+    后端不支持分片或只划分出一个分片时，在当前进程中顺序提取。
+    progress（pid_progress.ProgressTracker）不传给工作进程：并行时按完成的分片数报告进度，
+    取消时不再启动新的分片，等待正在执行的分片完成（文档正常关闭）后抛出ExtractionCancelled。
+    """
+    log = log or logger.info
+    options = dict(backend_options or {})
+    extractor = get_backend(backend, log=log, progress=progress, **options)
+    shards = extractor.plan_shards(drawing_path, shard_size)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(shards)))
+    if workers == 1:
+        return [record for shard in shards for record in extractor.iter_records(drawing_path, shard)]
+
+    if isinstance(extractor, ComBackend):
+        # 每个工作进程启动独立的AutoCAD实例，以只读方式同时打开同一张图纸
+        options.setdefault('session', 'private')
+        options.setdefault('read_only', True)
+    jobs = [{'drawing': drawing_path, 'backend': backend, 'options': options, 'shard': shard}
+            for shard in shards]
+
+    log(f"分片提取: {len(shards)} 个分片, 工作进程数: {workers}")
+    if progress is not None:
+        progress.begin("分片提取", len(jobs), "分片")
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_extract_shard, job) for job in jobs]
+        try:
+            # 按提交顺序取结果，保证拼接顺序与顺序提取一致
+            for index, future in enumerate(futures, 1):
+                shard_records, elapsed = _wait_result(future, progress)
+                log(f"[{index}/{len(jobs)}] 分片 {shards[index - 1]}: "
+                    f"{len(shard_records)} 条文本记录, 耗时 {elapsed:.2f} s")
+                records.extend(shard_records)
+                if progress is not None:
+                    progress.update(index)
+        except ExtractionCancelled:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    if progress is not None:
+        progress.finish()
+    return records
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+拆分标注拼接
+绘图时一个管道号常被拆成并排的多个TEXT实体（如4101BRR-02457-200和-03CBMB1-H），
+逐个文本匹配时找不到。按插入点建立网格空间索引，把同一基线上首尾相邻、方向和
+字高相同的片段依次连接，连接处出现的管道号作为一条拼接文本记录参与匹配。
+"""
+
+import logging
+import math
+
+from pid_backends import GEOMETRY_TEXT, TextRecord
+from pid_grammar import DEFAULT_RECOGNIZER
+
+logger = logging.getLogger(__name__)
+
+# 拼接文本记录的实体类型
+MERGED_ENTITY_TYPE = "MergedText"
+
+# 参与拼接的片段最大长度，更长的文本不会是管道号的一部分
+MAX_FRAGMENT_LENGTH = 40
+
+# 一个管道号最多拆成的片段数
+MAX_CHAIN = 4
+
+# 相邻判断的容差，长度以前一片段的字高为单位
+CHAR_WIDTH_RANGE = (0.4, 1.2)  # 每个字符的宽度范围，用于估计片段的长度
+MAX_GAP = 2.0                  # 片段之间的最大间隙
+MAX_BASELINE_OFFSET = 0.5      # 基线的最大垂直偏移
+MAX_HEIGHT_RATIO = 1.25        # 两个片段字高之比的上限
+MAX_ANGLE_DIFF = 2.0           # 两个片段方向之差的上限（度）
+
+# 网格边长（以片段字高的中位数为单位）
+GRID_CELL_HEIGHTS = 4
+
+
+class _Fragment:
+    """候选片段：标准化后的文本和基线几何"""
+
+    __slots__ = ('record', 'text', 'x', 'y', 'rotation', 'height', 'ux', 'uy', 'right', 'has_left')
+
+    def __init__(self, record, text, x, y, rotation, height):
+        self.record = record
+        self.text = text
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.height = height
+        angle = math.radians(rotation)
+        self.ux = math.cos(angle)
+        self.uy = math.sin(angle)
+        self.right = None
+        self.has_left = False
+
+
+class LabelMerger:
+    """拆分管道号标注的拼接
+
+    merge()逐条转发文本记录，同时收集带插入点和字高、长度不超过MAX_FRAGMENT_LENGTH
+    且包含数字或连字符的文本作为候选片段；全部转发后再拼接，产出拼接文本记录。
+
+    网格边长为片段字高中位数的GRID_CELL_HEIGHTS倍，每个片段只查询其右侧沿基线方向的
+    矩形范围覆盖的网格，耗时与片段数量近似成线性关系。每个片段连到右侧最近的相邻片段，
+    沿连接形成的链查找由连续完整片段组成的管道号（见_merge_chain），每条链产出一条只
+    包含这些管道号的拼接文本记录。句柄为组成管道号的片段句柄以+连接，插入点、方向和字高取第一个片段。
+
+    插入点按TEXT的基线左端点处理，对齐方式为居中或右对齐的文本可能无法拼接。
+    """
+
+    def __init__(self, recognizer=None, normalize=None, log=None):
+        self.recognizer = recognizer or DEFAULT_RECOGNIZER
+        self.normalize = normalize or str.strip
+        self.log = log or logger.info
+        self.fragments = 0
+        self.links = 0
+        self.merged = 0
+
+    def _fragment(self, record):
+        """候选片段，不符合条件时返回None"""
+        if not isinstance(record, TextRecord):
+            return None
+        point, height = record.insertion_point, record.height
+        if point is None or not height or height <= 0:
+            return None
+        text = record.text
+        if not (0 < len(text) <= MAX_FRAGMENT_LENGTH) or not GEOMETRY_TEXT.search(text):
+            return None
+        text = self.normalize(text)
+        if not text:
+            return None
+        return _Fragment(record, text, point[0], point[1], record.rotation or 0.0, height)
+
+    def merge(self, records):
+        """逐条转发文本记录，全部转发后产出拼接文本记录"""
+        fragments = []
+        for record in records:
+            yield record
+            fragment = self._fragment(record)
+            if fragment is not None:
+                fragments.append(fragment)
+        self.fragments += len(fragments)
+        yield from self.merge_fragments(fragments)
+
+    def merge_fragments(self, fragments):
+        """连接相邻片段并拼接，返回拼接文本记录列表"""
+        if len(fragments) < 2:
+            return []
+        cell = sorted(fragment.height for fragment in fragments)[len(fragments) // 2] * GRID_CELL_HEIGHTS
+        grid = {}
+        for fragment in fragments:
+            grid.setdefault((math.floor(fragment.x / cell), math.floor(fragment.y / cell)), []).append(fragment)
+
+        for fragment in fragments:
+            right = self._right_neighbor(fragment, grid, cell)
+            if right is not None:
+                fragment.right = right
+                right.has_left = True
+                self.links += 1
+
+        merged = []
+        visited = set()
+        for head in fragments:
+            if head.has_left or head.right is None:
+                continue
+            chain = [head]
+            visited.add(id(head))
+            node = head.right
+            while node is not None and id(node) not in visited:
+                chain.append(node)
+                visited.add(id(node))
+                node = node.right
+            record = self._merge_chain(chain)
+            if record is not None:
+                merged.append(record)
+        self.merged += len(merged)
+        return merged
+
+    def _right_neighbor(self, fragment, grid, cell):
+        """沿基线方向右侧最近的相邻片段"""
+        height = fragment.height
+        x, y, ux, uy = fragment.x, fragment.y, fragment.ux, fragment.uy
+        min_along = len(fragment.text) * height * CHAR_WIDTH_RANGE[0]
+        max_along = len(fragment.text) * height * CHAR_WIDTH_RANGE[1] + MAX_GAP * height
+        max_offset = MAX_BASELINE_OFFSET * height
+
+        # 查询范围：基线方向[min_along, max_along]、垂直方向±max_offset的矩形的外接框
+        xs, ys = [], []
+        for along in (min_along, max_along):
+            for offset in (-max_offset, max_offset):
+                xs.append(x + along * ux - offset * uy)
+                ys.append(y + along * uy + offset * ux)
+        rows = range(math.floor(min(ys) / cell), math.floor(max(ys) / cell) + 1)
+        get = grid.get
+        best, best_along = None, max_along
+        for gx in range(math.floor(min(xs) / cell), math.floor(max(xs) / cell) + 1):
+            for gy in rows:
+                for other in get((gx, gy), ()):
+                    dx, dy = other.x - x, other.y - y
+                    along = dx * ux + dy * uy
+                    if not min_along <= along <= best_along:
+                        continue
+                    if abs(dy * ux - dx * uy) > max_offset:
+                        continue
+                    ratio = other.height / height
+                    if not 1 / MAX_HEIGHT_RATIO <= ratio <= MAX_HEIGHT_RATIO:
+                        continue
+                    if abs((other.rotation - fragment.rotation + 180) % 360 - 180) > MAX_ANGLE_DIFF:
+                        continue
+                    best, best_along = other, along
+        return best
+
+    def _merge_chain(self, chain):
+        """在片段链中查找由连续2~MAX_CHAIN个完整片段组成的管道号，返回拼接文本记录，没有时返回None
+
+        管道号必须恰好由若干个完整片段组成（完整匹配），避免把相邻文字的首尾字符并入
+        管道号（如保温等级-H后紧接NOTE时匹配成-HN）；自身已包含管道号的片段不参与拼接。
+        """
+        search = self.recognizer.scanner.search
+        fullmatch = self.recognizer.scanner.fullmatch
+        usable = [search(fragment.text) is None for fragment in chain]
+        numbers = []
+        handles = []
+        first = None
+        i = 0
+        while i < len(chain) - 1:
+            found = None
+            if usable[i]:
+                text = chain[i].text
+                for j in range(i + 1, min(len(chain), i + MAX_CHAIN)):
+                    if not usable[j]:
+                        break
+                    text += chain[j].text
+                    if fullmatch(text):
+                        found = j
+            if found is None:
+                i += 1
+                continue
+            numbers.append(''.join(fragment.text for fragment in chain[i:found + 1]))
+            handles.extend(fragment.record.handle for fragment in chain[i:found + 1])
+            first = first or chain[i].record
+            i = found + 1
+        if not numbers:
+            return None
+        return TextRecord(' '.join(numbers), MERGED_ENTITY_TYPE,
+                          '+'.join(handles) if all(handles) else None, first.layer,
+                          first.insertion_point, first.rotation, first.height)
+
+    def log_stats(self, log=None):
+        """输出候选片段、相邻连接和拼接结果的数量"""
+        (log or self.log)(f"标注拼接: 候选片段 {self.fragments}, 相邻连接 {self.links}, "
+                          f"拼接出管道号的文本 {self.merged}")
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管道号数据库
+把各图纸解析出的管道数据写入本地SQLite数据库（WAL模式），跨图纸、跨项目查询管道号
+出现在哪些图纸中，并可直接从数据库生成报告，无需重新提取
+
+用法:
+    python pid_store.py -d lines.db lookup 4101BRR-02457
+    python pid_store.py -d lines.db query --unit 4101 --medium BRR
+    python pid_store.py -d lines.db report -o project_lines.xlsx
+    python pid_store.py -d lines.db drawings
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from pid_export import EXPORTERS, get_exporter, resolve_format
+from pid_extractor import (REPORT_COLUMN_WIDTHS, REPORT_COLUMNS, format_sources, merged_label,
+                           pipe_length_value)
+from pid_records import PipelineRecord
+
+logger = logging.getLogger(__name__)
+
+# 默认数据库文件
+DEFAULT_STORE_PATH = "pipeline_lines.db"
+
+# 数据库结构版本，结构变化时递增
+SCHEMA_VERSION = 1
+
+# 每批写入的行数
+BATCH_ROWS = 10000
+
+# 管道记录中保存到数据库的字段（顺序与lines表的列一致）
+_RECORD_FIELDS = ('pipeline_number', 'display_number', 'grammar', 'unit_number', 'pipe_number',
+                  'nominal_diameter', 'pipe_grade', 'insulation_grade', 'medium_code', 'medium_name',
+                  'phase', 'occurrences', 'merged', 'pipe_length')
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS drawings (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    project TEXT NOT NULL DEFAULT '',
+    extracted_at REAL NOT NULL,
+    line_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS lines (
+    drawing_id INTEGER NOT NULL REFERENCES drawings(id) ON DELETE CASCADE,
+    pipeline_number TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    display_number TEXT NOT NULL,
+    grammar TEXT NOT NULL,
+    unit_number TEXT NOT NULL,
+    pipe_number TEXT NOT NULL,
+    nominal_diameter TEXT NOT NULL,
+    pipe_grade TEXT NOT NULL,
+    insulation_grade TEXT NOT NULL,
+    medium_code TEXT NOT NULL,
+    medium_name TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    occurrences INTEGER NOT NULL,
+    merged INTEGER NOT NULL DEFAULT 0,
+    pipe_length REAL,
+    sources TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    extracted_at REAL NOT NULL,
+    PRIMARY KEY (drawing_id, pipeline_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_lines_number ON lines(pipeline_number);
+CREATE INDEX IF NOT EXISTS idx_lines_display ON lines(display_number);
+CREATE INDEX IF NOT EXISTS idx_lines_unit ON lines(unit_number, medium_code, display_number);
+CREATE INDEX IF NOT EXISTS idx_lines_medium ON lines(medium_code, display_number);
+CREATE INDEX IF NOT EXISTS idx_drawings_name ON drawings(name);
+CREATE INDEX IF NOT EXISTS idx_drawings_project ON drawings(project);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+_UPSERT = f"""
+INSERT INTO lines (drawing_id, position, sources, first_seen, extracted_at, {', '.join(_RECORD_FIELDS)})
+VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(_RECORD_FIELDS))})
+ON CONFLICT (drawing_id, pipeline_number) DO UPDATE SET
+    position = excluded.position, sources = excluded.sources, extracted_at = excluded.extracted_at,
+    {', '.join(f'{field} = excluded.{field}' for field in _RECORD_FIELDS[1:])}
+"""
+
+_SELECT = f"""
+SELECT d.path, d.project, l.extracted_at, l.sources, {', '.join('l.' + field for field in _RECORD_FIELDS)}
+FROM lines l JOIN drawings d ON d.id = l.drawing_id
+"""
+
+
+def format_time(timestamp):
+    """数据库中的时间戳转换为可读时间"""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LineStore:
+    """管道号数据库
+
+    每张图纸（按绝对路径区分）的管道号以(图纸, 管道号)为主键保存，重新写入同一张图纸时
+    更新已有管道号、删除本次未出现的管道号，首次出现时间保持不变。来源实体句柄以逗号
+    分隔保存。管道号、报告管道号、装置号、介质代码和图纸均有索引，装置号和介质代码的
+    索引包含报告管道号，按条件查询时无需对全部结果排序。
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, log=None):
+        self.path = str(path)
+        self.log = log or logger.info
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"数据库结构版本 {version} 与当前版本 {SCHEMA_VERSION} 不一致: {self.path}")
+        self.conn.executescript(_SCHEMA)
+        # 本次写入的管道号（连接内的临时表），用于删除本次未出现的管道号
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS written (pipeline_number TEXT PRIMARY KEY)")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def upsert_drawing(self, drawing_path, pipeline_data, project=None, extracted_at=None):
+        """写入一张图纸的管道记录（一个事务，按BATCH_ROWS分批插入），返回写入的管道号数量
+
+        project为None时保留图纸原有的项目名称。
+        """
+        drawing_path = os.path.abspath(drawing_path)
+        extracted_at = time.time() if extracted_at is None else extracted_at
+        start = time.perf_counter()
+        count = 0
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO drawings (path, name, project, extracted_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET project = COALESCE(?, project), "
+                "extracted_at = excluded.extracted_at",
+                (drawing_path, os.path.basename(drawing_path), project or '', extracted_at, project))
+            drawing_id = self.conn.execute("SELECT id FROM drawings WHERE path = ?",
+                                           (drawing_path,)).fetchone()[0]
+
+            self.conn.execute("DELETE FROM temp.written")
+            batch = []
+            for position, record in enumerate(pipeline_data):
+                batch.append((drawing_id, position, ','.join(map(str, record.sources)), extracted_at,
+                              extracted_at, *(getattr(record, field) for field in _RECORD_FIELDS)))
+                if len(batch) >= BATCH_ROWS:
+                    count += self._write_batch(batch)
+                    batch = []
+            count += self._write_batch(batch)
+
+            # 删除本次未出现的管道号（按本次写入的管道号判断，同一提取时间重复写入时也正确）
+            removed = self.conn.execute(
+                "DELETE FROM lines WHERE drawing_id = ? "
+                "AND pipeline_number NOT IN (SELECT pipeline_number FROM temp.written)",
+                (drawing_id,)).rowcount
+            self.conn.execute("UPDATE drawings SET line_count = ? WHERE id = ?", (count, drawing_id))
+        self.log(f"已写入数据库: {os.path.basename(drawing_path)} {count} 个管道号"
+                 f"（删除 {removed} 个）, 耗时 {time.perf_counter() - start:.2f} s")
+        return count
+
+    def _write_batch(self, batch):
+        """写入一批管道记录，并记录写入的管道号"""
+        self.conn.executemany(_UPSERT, batch)
+        self.conn.executemany("INSERT OR IGNORE INTO temp.written VALUES (?)", ((row[5],) for row in batch))
+        return len(batch)
+
+    def remove_drawing(self, drawing_path):
+        """删除一张图纸及其管道号，返回是否存在"""
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM drawings WHERE path = ?",
+                                       (os.path.abspath(drawing_path),))
+        return cursor.rowcount > 0
+
+    def query(self, line=None, unit=None, medium_code=None, drawing=None, project=None, limit=None):
+        """按条件查询，逐行产出(图纸路径, 项目, 提取时间, PipelineRecord)，按报告管道号和图纸排序
+
+        line同时匹配完整管道号和报告管道号，以*结尾时按前缀匹配；drawing为图纸路径，
+        只给出文件名时匹配所有同名图纸。
+        """
+        conditions, params = [], []
+        if line:
+            if line.endswith('*'):
+                prefix = line[:-1]
+                conditions.append("(l.display_number >= ? AND l.display_number < ? "
+                                  "OR l.pipeline_number >= ? AND l.pipeline_number < ?)")
+                params += [prefix, prefix + '\U0010FFFF'] * 2
+            else:
+                conditions.append("(l.pipeline_number = ? OR l.display_number = ?)")
+                params += [line, line]
+        if unit:
+            conditions.append("l.unit_number = ?")
+            params.append(unit)
+        if medium_code:
+            conditions.append("l.medium_code = ?")
+            params.append(medium_code)
+        if drawing:
+            # 只给出文件名时按文件名匹配，否则按完整路径匹配
+            if os.path.basename(drawing) == drawing:
+                conditions.append("d.name = ?")
+            else:
+                conditions.append("d.path = ?")
+                drawing = os.path.abspath(drawing)
+            params.append(drawing)
+        if project is not None:
+            conditions.append("d.project = ?")
+            params.append(project)
+
+        sql = _SELECT
+        if conditions:
+            sql += "WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY l.display_number, d.name, l.position"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for path, project_name, extracted_at, sources, *values in self.conn.execute(sql, params):
+            fields = dict(zip(_RECORD_FIELDS, values))
+            fields['merged'] = bool(fields['merged'])
+            record = PipelineRecord(**fields, sources=sources.split(',') if sources else [])
+            yield path, project_name, extracted_at, record
+
+    def drawings(self, project=None):
+        """返回[(图纸路径, 项目, 提取时间, 管道号数量)]"""
+        sql = "SELECT path, project, extracted_at, line_count FROM drawings"
+        params = ()
+        if project is not None:
+            sql += " WHERE project = ?"
+            params = (project,)
+        return self.conn.execute(sql + " ORDER BY name", params).fetchall()
+
+    def stats(self):
+        """返回(图纸数, 管道号行数, 不同管道号数)"""
+        drawings = self.conn.execute("SELECT COUNT(*) FROM drawings").fetchone()[0]
+        lines = self.conn.execute("SELECT COUNT(*) FROM lines").fetchone()[0]
+        distinct = self.conn.execute(
+            "SELECT COUNT(*) FROM (SELECT DISTINCT pipeline_number FROM lines)").fetchone()[0]
+        return drawings, lines, distinct
+
+
+def _report_rows(rows, with_drawing):
+    """查询结果转换为报告行（列同REPORT_COLUMNS，with_drawing时第一列为图纸名）"""
+    for path, _, _, record in rows:
+        row = [record.display_number, record.nominal_diameter, record.pipe_grade,
+               record.insulation_grade, record.medium_name, record.phase, record.occurrences,
+               format_sources(record.sources), record.grammar, merged_label(record.merged),
+               pipe_length_value(record.pipe_length)]
+        if with_drawing:
+            row.insert(0, os.path.basename(path))
+        yield row
+
+
+def export_store_report(store, output_path, fmt='auto', drawing=None, project=None, **filters):
+    """从数据库生成报告，返回写出的行数
+
+    指定drawing时与单图报告相同；否则为汇总报告，第一列为图纸名（同批量模式）。
+    """
+    rows = store.query(drawing=drawing, project=project, **filters)
+    columns, column_widths = list(REPORT_COLUMNS), dict(REPORT_COLUMN_WIDTHS)
+    if drawing is None:
+        columns.insert(0, '图纸')
+        column_widths = {'A': 25}
+        for col, width in REPORT_COLUMN_WIDTHS.items():
+            column_widths[chr(ord(col) + 1)] = width
+    exporter = get_exporter(resolve_format(output_path, fmt))
+    count = exporter.write(output_path, ('管道数据表', columns, column_widths,
+                                         _report_rows(rows, drawing is None)))
+    logger.info(f"成功保存{exporter.description}: {output_path}")
+    return count
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="P&ID管道数据提取工具 - 管道号数据库")
+    parser.add_argument('-d', '--database', default=DEFAULT_STORE_PATH,
+                        help=f"数据库文件（默认: {DEFAULT_STORE_PATH}）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('lookup', help="查询管道号出现在哪些图纸中")
+    p.add_argument('line', help="管道号（完整管道号或报告中的管道号），以*结尾时按前缀匹配")
+
+    p = subparsers.add_parser('query', help="按条件查询管道号")
+    p.add_argument('--line', help="管道号，以*结尾时按前缀匹配")
+    p.add_argument('--unit', help="装置号")
+    p.add_argument('--medium', help="介质代码")
+    p.add_argument('--drawing', help="图纸路径或文件名")
+    p.add_argument('--project', help="项目")
+    p.add_argument('--limit', type=int, default=100, help="最多显示的行数（默认100，0为不限）")
+
+    p = subparsers.add_parser('report', help="从数据库生成报告（无需重新提取）")
+    p.add_argument('-o', '--output', required=True, help="输出文件")
+    p.add_argument('-f', '--format', choices=['auto'] + list(EXPORTERS), default='auto',
+                   help="输出格式（同pid_extractor.py），auto=按输出文件扩展名选择")
+    p.add_argument('--drawing', help="只输出一张图纸（格式同单图报告）")
+    p.add_argument('--project', help="只输出一个项目")
+
+    p = subparsers.add_parser('drawings', help="列出数据库中的图纸")
+    p.add_argument('--project', help="项目")
+
+    p = subparsers.add_parser('remove', help="从数据库中删除图纸")
+    p.add_argument('drawing', nargs='+', help="图纸路径")
+
+    subparsers.add_parser('stats', help="数据库统计")
+    return parser.parse_args(argv)
+
+
+def _print_rows(rows):
+    count = 0
+    for path, project, extracted_at, record in rows:
+        print(f"{record.display_number:<20}{record.pipeline_number:<32}{record.medium_name:<12}"
+              f"{record.occurrences:>4}  {os.path.basename(path)}"
+              f"{f' [{project}]' if project else ''}  {format_time(extracted_at)}")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    """数据库命令行主函数"""
+    args = parse_args(argv)
+    if not os.path.exists(args.database):
+        logger.error(f"数据库不存在: {args.database}")
+        return 1
+
+    with LineStore(args.database) as store:
+        start = time.perf_counter()
+        if args.command == 'lookup':
+            count = _print_rows(store.query(line=args.line))
+            print(f"{count} 条记录, 查询耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+            return 0 if count else 1
+        if args.command == 'query':
+            count = _print_rows(store.query(args.line, args.unit, args.medium, args.drawing,
+                                            args.project, args.limit))
+            print(f"{count} 条记录, 查询耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+        elif args.command == 'report':
+            count = export_store_report(store, args.output, args.format, args.drawing, args.project)
+            print(f"报告已保存到: {args.output}（{count} 行）")
+        elif args.command == 'drawings':
+            for path, project, extracted_at, line_count in store.drawings(args.project):
+                print(f"{path}{f' [{project}]' if project else ''}  {format_time(extracted_at)}  "
+                      f"{line_count} 个管道号")
+        elif args.command == 'remove':
+            for drawing in args.drawing:
+                if not store.remove_drawing(drawing):
+                    logger.warning(f"数据库中没有该图纸: {drawing}")
+        elif args.command == 'stats':
+            drawings, lines, distinct = store.stats()
+            print(f"图纸: {drawings} 张, 管道号记录: {lines} 条, 不同管道号: {distinct} 个")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式处理的阶段统计
+提取、匹配、解析各阶段串联为生成器，StageMeter记录每个阶段产出的数量和耗时，
+用于输出各阶段吞吐量
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StageMeter:
+    """流水线各阶段的数量和耗时统计
+
+    wrap()包装的生成器按串联顺序登记，每次取下一项的耗时包含上游各阶段的耗时，
+    报告时减去上游阶段的累计耗时得到本阶段的耗时。不以流式方式执行的阶段
+    （如写入报告）用measure()单独计时。
+    """
+
+    def __init__(self):
+        self._stages = {}  # 阶段名称 -> [产出数量, 累计耗时]，保持登记顺序
+        self._chain = []  # 串联的阶段名称
+
+    def wrap(self, name, iterable):
+        """包装串联在上一个wrap阶段之后的可迭代对象，统计产出数量和耗时"""
+        stat = self._stages.setdefault(name, [0, 0.0])
+        self._chain.append(name)
+        return self._iter(stat, iter(iterable))
+
+    @staticmethod
+    def _iter(stat, iterator):
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stat[1] += clock() - start
+                return
+            stat[1] += clock() - start
+            stat[0] += 1
+            yield item
+
+    @contextmanager
+    def measure(self, name, items=0):
+        """单独计时一个非流式阶段"""
+        stat = self._stages.setdefault(name, [0, 0.0])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stat[0] += items
+            stat[1] += time.perf_counter() - start
+
+    def count(self, name):
+        """阶段产出的数量"""
+        return self._stages.get(name, (0, 0.0))[0]
+
+    def stages(self):
+        """返回[(阶段名称, 输入数量, 产出数量, 本阶段耗时)]，串联阶段的输入为上游阶段的产出"""
+        result = []
+        upstream = None
+        for name, (items, elapsed) in self._stages.items():
+            inputs, own = items, elapsed
+            if name in self._chain and upstream is not None:
+                inputs = self._stages[upstream][0]
+                own = max(0.0, elapsed - self._stages[upstream][1])
+            if name in self._chain:
+                upstream = name
+            result.append((name, inputs, items, own))
+        return result
+
+    def log_stats(self, log=None):
+        """输出各阶段吞吐量"""
+        log = log or logger.info
+        for name, inputs, items, elapsed in self.stages():
+            rate = f"{inputs / elapsed:,.0f}/s" if elapsed > 0 else "-"
+            log(f"阶段 {name}: 输入 {inputs}, 产出 {items}, 耗时 {elapsed:.3f} s, 吞吐 {rate}")